@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Cold start time of fresh worker processes.
+
+Every module is imported in NUMBER_OF_RUNS new interpreters, as a spawned process-pool worker does; the median
+import time and the heavy optional modules (headless.HEAVY_MODULES) loaded by the import are reported. The
+interpreter start itself is measured separately ('python -c pass'). A second table gives the wall time of a
+spawn ProcessPoolExecutor whose workers import the module in their initializer and run one trivial task each.
+
+Usage:
+    python benchmarkImport.py [output directory]    # BenchmarkImport.csv, BenchmarkWorkerStart.csv (default: Results)
+"""
+
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from headless import HEAVY_MODULES
+
+MODULES = ('headless', 'simulationsmodel', 'scenarioBatch', 'multiLocation', 'topologySpec', 'getPVPowerprofile',
+           'pvLocalModel', 'siteScreening')
+NUMBER_OF_RUNS = 5
+PROBE = ("import importlib, json, sys, time\n"
+         "started = time.perf_counter()\n"
+         "importlib.import_module({module!r})\n"
+         "seconds = time.perf_counter() - started\n"
+         "print(json.dumps({{'seconds': seconds, 'heavy': [name for name in {heavy!r} if name in sys.modules]}}))")
+
+
+def _interpreterStart():
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True)
+    return time.perf_counter() - started
+
+
+def importTime(module, numberOfRuns=NUMBER_OF_RUNS):
+    """
+    Import time of a module in fresh interpreters.
+
+    Returns:
+    - Dictionary with the median 'importSeconds' and the 'heavyModules' loaded by the import.
+    """
+    runs = [json.loads(subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                                      check=True, capture_output=True, text=True).stdout.splitlines()[-1])
+            for _ in range(numberOfRuns)]
+    return {'module': module,
+            'importSeconds': statistics.median(run['seconds'] for run in runs),
+            'heavyModules': ' '.join(runs[0]['heavy'])}
+
+
+def _importModule(module):
+    __import__(module)
+
+
+def _task(_):
+    return None
+
+
+def workerStart(module, processes=4):
+    """Seconds until a spawn pool of processes workers, each importing module, has run one task per worker."""
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_importModule, initargs=(module,)) as executor:
+        list(executor.map(_task, range(processes)))
+    return time.perf_counter() - started
+
+
+def benchmarkImport(modules=MODULES, numberOfRuns=NUMBER_OF_RUNS, processes=4):
+    """
+    Import and worker start times of the model modules.
+
+    Returns:
+    - Tuple (import table with one row per module, worker start table with one row per module).
+    """
+    interpreter = statistics.median(_interpreterStart() for _ in range(numberOfRuns))
+    imports = pd.DataFrame([dict(importTime(module, numberOfRuns), interpreterSeconds=interpreter)
+                            for module in modules]).set_index('module')
+    imports['coldStartSeconds'] = imports['interpreterSeconds'] + imports['importSeconds']
+    workers = pd.DataFrame([{'module': module, 'processes': processes, 'seconds': workerStart(module, processes)}
+                            for module in modules]).set_index('module')
+    return imports, workers
+
+
+if __name__ == "__main__":
+    outputDirectory = sys.argv[1] if len(sys.argv) > 1 else "Results"
+    imports, workers = benchmarkImport()
+    print(imports)
+    print(workers)
+    os.makedirs(outputDirectory, exist_ok=True)
+    imports.to_csv(os.path.join(outputDirectory, "BenchmarkImport.csv"))
+    workers.to_csv(os.path.join(outputDirectory, "BenchmarkWorkerStart.csv"))
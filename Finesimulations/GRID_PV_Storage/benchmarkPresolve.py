@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Benchmark of the presolve (pass-through conversion elimination) on Validierungsbeispiel_5.
+
+The original and the reduced topology are built, aggregated to 7 typical days (as in the example script) and
+optimized. LP size, build and solve time, termination condition and the objective value of both models are
+compared, and the source/sink summary of the reduced model must equal the original one. Results are written to
+Results/BenchmarkPresolve.csv. verifyPresolve checks the reduction of Validierungsbeispiel_5 against the chains of
+its Description.
+
+Usage:
+    python benchmarkPresolve.py [topology file] [solver]
+"""
+
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyomo.environ as pyomo
+
+from presolve import expandConversionSummary, expandOperation, lpSize, presolveTopology, structureSize
+from topologySpec import buildModel, loadTopology
+
+TOPOLOGY = "../Validierungsbeispiel_5/topology.json"
+
+# presolve of Validierungsbeispiel_5: eliminated conversion -> (surviving conversion, scale of the operation)
+EXPECTED_ELIMINATED = {
+    'source_1_splitted_conversion_1': ('source_1_conversion_1', 1),
+    'source_1_splitted_conversion_2': ('source_1_conversion_1', 1),
+    'conversion_1': ('source_1_conversion_1', 1),
+    'conversion_4': ('source_1_conversion_1', 0.1),
+    'sink_1_conversion': ('source_1_conversion_1', 1),
+    'source_2_splitted_conversion_1': ('source_2_conversion', 1),
+    'conversion_3': ('source_2_conversion', 1),
+    'storage_1_input_conversion': ('source_2_conversion', 1)}
+EXPECTED_COMMODITIES = {'source_1_splitted_conversion_commodity_1', 'source_1_splitted_conversion_commodity_2',
+                        'conversion_1', 'conversion_4', 'sink_1_conversion',
+                        'source_2_splitted_conversion_commodity_1', 'conversion_3',
+                        'storage_1_input_conversion_commodity'}
+# merged factors of the surviving conversions, emissions of conversion_4 kept as side flow
+EXPECTED_FACTORS = {
+    'source_1_conversion_1': {'source_1_commodity': -1, 'sink_1_commodity': 1, 'environment_conversion': 0.1},
+    'source_2_conversion': {'source_1_commodity': -1, 'storage_commodity': 1,
+                            'source_2_splitted_conversion_commodity_2': 1}}
+
+
+def verifyPresolve(topology):
+    """
+    Compare the presolve of the Validierungsbeispiel_5 topology with the expected reduction.
+
+    Returns:
+    - True if eliminated conversions and scales, removed commodities and merged factors are as expected, all other
+      components are unchanged and expandOperation maps the operation back to the eliminated conversions.
+    """
+    reduced, reduction = presolveTopology(topology)
+    eliminated = reduction['eliminated']
+    identical = (set(eliminated) == set(EXPECTED_ELIMINATED)
+                 and all(eliminated[name][0] == survivor and np.isclose(eliminated[name][1], scale)
+                         for name, (survivor, scale) in EXPECTED_ELIMINATED.items())
+                 and set(reduction['commodities']) == EXPECTED_COMMODITIES
+                 and set(reduced.commodities) == set(topology.commodities) - EXPECTED_COMMODITIES)
+
+    originalComponents = {component['name']: component for component in topology.components}
+    for component in reduced.components:
+        if component['name'] in EXPECTED_FACTORS:
+            factors = component['arguments']['commodityConversionFactors']
+            expected = EXPECTED_FACTORS[component['name']]
+            identical &= set(factors) == set(expected) and all(np.isclose(factors[commodity], factor)
+                                                              for commodity, factor in expected.items())
+        else:
+            identical &= component == originalComponents[component['name']]
+
+    operation = pd.DataFrame({0: [2.0, 3.0]}, index=sorted(EXPECTED_FACTORS))
+    expanded = expandOperation(operation, reduction)
+    identical &= all(np.allclose(expanded.loc[name], operation.loc[survivor] * scale)
+                     for name, (survivor, scale) in EXPECTED_ELIMINATED.items())
+    return bool(identical)
+
+
+def benchmark(topology, numberOfTypicalPeriods=7, solver='glpk'):
+    started = time.perf_counter()
+    esM = buildModel(topology)
+    esM.aggregateTemporally(numberOfTypicalPeriods=numberOfTypicalPeriods)
+    buildSeconds = time.perf_counter() - started
+    started = time.perf_counter()
+    try:
+        esM.optimize(timeSeriesAggregation=True, solver=solver)
+    except RuntimeError as error:
+        # the appsi/HiGHS interfaces raise instead of reporting a model without feasible solution
+        warnings.warn(f"{topology.name}: {error}")
+    solveSeconds = time.perf_counter() - started
+    record = dict(structureSize(topology), **lpSize(esM), buildSeconds=buildSeconds, solveSeconds=solveSeconds,
+                  terminationCondition=esM.solverSpecs.get('terminationCondition', 'noFeasibleSolution'),
+                  objective=pyomo.value(esM.pyM.Obj, exception=False))
+    return record, esM
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else TOPOLOGY
+    solver = sys.argv[2] if len(sys.argv) > 2 else 'glpk'
+    original = loadTopology(path)
+    reduced, reduction = presolveTopology(original)
+    print(f"eliminated {len(reduction['eliminated'])} conversions: {reduction['eliminated']}")
+    if path == TOPOLOGY:
+        print("presolve as expected:", verifyPresolve(original))
+
+    originalRecord, originalModel = benchmark(original, solver=solver)
+    reducedRecord, reducedModel = benchmark(reduced, solver=solver)
+    table = pd.DataFrame([originalRecord, reducedRecord], index=['original', 'presolved'])
+    print(table.T)
+    table.to_csv("Results/BenchmarkPresolve.csv")
+    if not (originalRecord['terminationCondition'] == reducedRecord['terminationCondition'] == 'optimal'):
+        sys.exit("no optimal solution, summaries not compared")
+
+    srcSnkOriginal = originalModel.getOptimizationSummary("SourceSinkModel", outputLevel=1)
+    srcSnkReduced = reducedModel.getOptimizationSummary("SourceSinkModel", outputLevel=1)
+    print("source/sink summary identical:",
+          np.allclose(srcSnkOriginal.sort_index().to_numpy(dtype=float),
+                      srcSnkReduced.sort_index().to_numpy(dtype=float), rtol=1e-6, atol=1e-6))
+    convSummary = expandConversionSummary(reducedModel.getOptimizationSummary("ConversionModel", outputLevel=1),
+                                          reduction)
+    print(convSummary.xs('operation', level=1))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Benchmark of the time resolution: memory use and run time of energySystemsStats for hourly (8760 steps) and
+15-minute (35040 steps) models, with and without temporal aggregation.
+
+Every configuration runs in fresh spawned worker processes, so the peak values of one run do not carry over into
+the next: run time and peak resident memory of the worker and of its solver subprocess
+(resource.getrusage RUSAGE_SELF / RUSAGE_CHILDREN) are taken in one worker, peak Python memory (tracemalloc, which
+slows the run down) in a second one. Results are written to Results/BenchmarkResolution.csv.
+
+Usage:
+    python benchmarkResolution.py [path of a 15-minute load profile or '-' for sink_1] [solver]
+"""
+
+import multiprocessing
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from simulationsmodel import energySystemsStats
+from timeSeriesStore import loadTimeSeries
+
+DESIGN = dict(tilt=40, azimuth=110, fixCapacityST=5, maxCapacityST=5, fixCapacityPV=100, maxCapacityPV=100,
+              scale_sink=10, module_width=1.5, moduleRowSpacing=3)
+
+
+def _run(hoursPerTimeStep, timeSeriesAggregation, sinkProfile, traceMemory, solver):
+    """One energySystemsStats run in a fresh worker process, either timed or with tracemalloc."""
+    if traceMemory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    results = energySystemsStats(hoursPerTimeStep=hoursPerTimeStep, timeSeriesAggregation=timeSeriesAggregation,
+                                 sinkProfile=sinkProfile, exportResults=False, solver=solver, **DESIGN)
+    seconds = time.perf_counter() - started
+    if traceMemory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {'peakPythonMemoryMB': peak / 1024 ** 2}
+    return {'seconds': seconds,
+            'processMaxRSSMB': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'solverMaxRSSMB': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+            'TAC': results['tableview'].loc['TAC'].iloc[0],
+            'selfsufficiency': results['tableview'].loc['selfsufficiency'].iloc[0]}
+
+
+def _inFreshProcess(*args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(_run, *args).result()
+
+
+def benchmark(hoursPerTimeStep, timeSeriesAggregation, sinkProfile=None, solver='GLPK'):
+    timed = _inFreshProcess(hoursPerTimeStep, timeSeriesAggregation, sinkProfile, False, solver)
+    traced = _inFreshProcess(hoursPerTimeStep, timeSeriesAggregation, sinkProfile, True, solver)
+    return {'hoursPerTimeStep': hoursPerTimeStep,
+            'numberOfTimeSteps': int(round(8760 / hoursPerTimeStep)),
+            'timeSeriesAggregation': timeSeriesAggregation,
+            **timed,
+            **traced}
+
+
+if __name__ == "__main__":
+    sinkProfile = loadTimeSeries(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1] != '-' else None
+    solver = sys.argv[2] if len(sys.argv) > 2 else 'GLPK'
+    records = [benchmark(hoursPerTimeStep, timeSeriesAggregation, sinkProfile, solver)
+               for hoursPerTimeStep in (1, 0.25) for timeSeriesAggregation in (True, False)]
+    table = pd.DataFrame(records)
+    print(table.to_string(index=False))
+    table.to_csv("Results/BenchmarkResolution.csv", index=False)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Benchmark and check of the reusable EnergySystemModel (EnergySystemTemplate, energySystemsStats(reuseModel=True)).
+
+1. Build time: a population of designs (orientation, capacity bounds) is built with buildEnergySystemModel and
+   applied to one EnergySystemTemplate; the mean time per evaluation is compared.
+2. Exactness: a few designs are optimized with reuseModel=False and reuseModel=True; KPIs and optimization summaries
+   must be identical.
+
+Results are written to Results/BenchmarkTemplate.csv.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from pvLocalModel import getPVPowerProfiles
+from simulationsmodel import (EnergySystemTemplate, buildEnergySystemModel, energySystemsStats, toTimeSteps,
+                              variableComponents)
+from timeSeriesStore import getLoadProfile
+
+DESIGN = dict(fixCapacityST=5, maxCapacityST=5, fixCapacityPV=100, maxCapacityPV=100, scale_sink=10,
+              module_width=1.5, moduleRowSpacing=3)
+
+
+def _population(size, seed=0):
+    generator = np.random.default_rng(seed)
+    return pd.DataFrame({'tilt': generator.uniform(1, 85, size),
+                         'azimuth': generator.uniform(90, 270, size),
+                         'maxCapacityST': generator.uniform(5, 100, size),
+                         'investPerCapacityPV': generator.choice([700, 800, 900], size)})
+
+
+def benchmarkBuild(size=50, hoursPerTimeStep=1):
+    """Mean build time per evaluation of a fresh model and of the template."""
+    population = _population(size)
+    numberOfTimeSteps = int(round(8760 / hoursPerTimeStep))
+    profiles = getPVPowerProfiles(population['tilt'].to_numpy(), population['azimuth'].to_numpy())[:, :8760]
+    sinkProfile = toTimeSteps(getLoadProfile('DataForExample/sink_1.xlsx', DESIGN['scale_sink']), numberOfTimeSteps)
+    components = [variableComponents(sinkProfile, toTimeSteps(pd.Series(profile, name='location01'),
+                                                              numberOfTimeSteps),
+                                     fixCapacityPV=DESIGN['fixCapacityPV'], maxCapacityPV=DESIGN['maxCapacityPV'],
+                                     fixCapacityST=DESIGN['fixCapacityST'], maxCapacityST=design.maxCapacityST,
+                                     investPerCapacityPV=design.investPerCapacityPV)
+                  for profile, design in zip(profiles, population.itertuples())]
+
+    started = time.perf_counter()
+    for parameters in components:
+        buildEnergySystemModel(numberOfTimeSteps, hoursPerTimeStep, parameters)
+    fresh = (time.perf_counter() - started) / size
+
+    template = EnergySystemTemplate(numberOfTimeSteps, hoursPerTimeStep)
+    template.apply(components[0])
+    started = time.perf_counter()
+    for parameters in components[1:]:
+        template.apply(parameters)
+    reused = (time.perf_counter() - started) / (size - 1)
+    return {'evaluations': size, 'freshBuildSeconds': fresh, 'templateApplySeconds': reused,
+            'savedSecondsPerEvaluation': fresh - reused}
+
+
+def verifyTemplate(size=3, **kwargs):
+    """
+    Optimize designs with a fresh and a reused model and compare the results.
+
+    Returns:
+    - True if KPIs and optimization summaries of all designs are identical.
+    """
+    identical = True
+    for design in _population(size, seed=1).itertuples():
+        arguments = dict(DESIGN, tilt=design.tilt, azimuth=design.azimuth, maxCapacityST=design.maxCapacityST,
+                         investPerCapacityPV=design.investPerCapacityPV, exportResults=False, **kwargs)
+        fresh = energySystemsStats(reuseModel=False, **arguments)
+        reused = energySystemsStats(reuseModel=True, **arguments)
+        identical &= all(fresh[key].equals(reused[key])
+                         for key in ('tableview', 'srcSnkSummary', 'convSummary', 'storSummary'))
+    return identical
+
+
+if __name__ == "__main__":
+    record = benchmarkBuild()
+    record['identical'] = verifyTemplate()
+    table = pd.DataFrame([record])
+    print(table.to_string(index=False))
+    table.to_csv("Results/BenchmarkTemplate.csv", index=False)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Multi-year weather ensemble evaluation of one design.
+
+energySystemsStats evaluates a design for a single weather year. energySystemsStatsEnsemble evaluates it for every
+PVGIS year in parallel worker processes and returns the KPI distribution over the years (mean, P10, P90).
+The load profile is read once per worker process (timeSeriesStore.getLoadProfile); leap years are reduced to 8760 h in energySystemsStats.
+Every worker builds the FINE model once and only replaces the weather dependent components for the following years
+(energySystemsStats with reuseModel, EnergySystemTemplate).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from simulationsmodel import energySystemsStats
+from timeSeriesStore import getLoadProfile
+
+# PVGIS-SARAH2 provides hourly data for 2005 - 2020
+PVGIS_YEARS = range(2005, 2021)
+ENSEMBLE_KPIS = ('TAC', 'selfsufficiency', 'selfconsumption', 'operationTotCO2', 'capacityPVOptimum',
+                 'capacityStorageOptimum')
+
+
+def _initWorker(sinkPath, scale_sink):
+    getLoadProfile(sinkPath, scale_sink)
+
+
+def _evaluateYear(year, kwargs):
+    results = energySystemsStats(start=year, end=year, exportResults=False, **kwargs)
+    return year, results['tableview'].iloc[:, 0].to_dict()
+
+
+def energySystemsStatsEnsemble(years=PVGIS_YEARS, processes=None, sinkPath='DataForExample/sink_1.xlsx',
+                               kpis=ENSEMBLE_KPIS, reuseModel=True, **kwargs):
+    """
+    Evaluate a design for several weather years in parallel.
+
+    Args:
+        years (iterable, optional): Weather years. Defaults to 2005 - 2020.
+        processes (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        sinkPath (str, optional): Path of the electricity load demand profile. Defaults to DataForExample/sink_1.xlsx.
+        kpis (iterable, optional): KPIs of the summary table. Defaults to ENSEMBLE_KPIS.
+        reuseModel (bool, optional): Keep the model structure of a worker across the years and only update the
+            changed components (results identical to a fresh build). Pass False to build a new model for every
+            year. Defaults to True.
+        **kwargs: Further arguments of energySystemsStats (design and cost parameters), except start and end.
+
+    Returns:
+    - Tuple (DataFrame of all KPIs per year, DataFrame with mean, P10 and P90 of kpis over the years).
+    """
+    years = list(years)
+    kwargs = dict(kwargs, sinkPath=os.path.abspath(sinkPath), reuseModel=reuseModel)
+    with ProcessPoolExecutor(max_workers=processes, initializer=_initWorker,
+                             initargs=(kwargs['sinkPath'], kwargs.get('scale_sink', 1))) as executor:
+        results = dict(executor.map(_evaluateYear, years, [kwargs] * len(years)))
+
+    perYear = pd.DataFrame.from_dict(results, orient='index').sort_index()
+    perYear.index.name = 'year'
+    values = perYear[list(kpis)].astype(float)
+    summary = pd.DataFrame({'mean': values.mean(),
+                            'P10': values.quantile(0.1),
+                            'P90': values.quantile(0.9),
+                            'min': values.min(),
+                            'max': values.max()})
+    return perYear, summary
+
+
+if __name__ == "__main__":
+    perYear, summary = energySystemsStatsEnsemble(tilt=40, azimuth=110, fixCapacityST=5, maxCapacityST=5,
+                                                  fixCapacityPV=100, maxCapacityPV=100, scale_sink=10,
+                                                  module_width=1.5, moduleRowSpacing=3)
+    print(perYear)
+    print(summary)
+    summary.to_csv("Results/EnsembleSummary.csv")
@@ -1,12 +1,19 @@
 import numpy as np
-import pvlib
 import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
+from collections import OrderedDict
+from pvCache import getOrFetch, profileKey
+
+# lean frames shared between calls (see getPVPowerProfile(columns=..., dtype=...))
+MAX_SHARED_FRAMES = 256
+_sharedFrames = OrderedDict()
+_sharedIndexes = {}
+
 
 def getPVPowerProfile(latitude: object = 52, longitude: object = 13.5, start: object = 2014, end: object = 2014,
                          surface_tilt: object = 20,
-                         surface_azimuth: object = 180) -> object:
+                         surface_azimuth: object = 180, loss=10, pvtechchoice='crystSi', mountingplace='free',
+                         usehorizon=True, cache=None, mode='pvgis', snapResolution=None, reuseTolerance=None,
+                         reusePolicy='nearest', columns=None, dtype=None) -> object:
     """
     Fetches PV power profile data using the pvlib library.
 
@@ -17,7 +24,27 @@ def getPVPowerProfile(latitude: object = 52, longitude: object = 13.5, start: ob
         end (int or str): End year or timestamp for the data range.
         surface_tilt (float): Tilt angle of the PV panels.
         surface_azimuth (float): Azimuth angle of the PV panels.
-        f: area fraction (float, default: 0.3)
+        loss (float): Sum of PV system losses in percent (default: 10).
+        pvtechchoice (str): PV technology, one of 'crystSi', 'CIS', 'CdTe', 'Unknown' (default: 'crystSi').
+        mountingplace (str): 'free' for free-standing or 'building' for building-integrated (default: 'free').
+        usehorizon (bool): Include shading by the local horizon (default: True).
+        cache (PVProfileCache or False): Disk cache for the responses (default: pvCache.getDefaultCache()).
+            False disables caching. In offline mode a cache miss raises pvCache.OfflineCacheMiss.
+        mode (str): 'pvgis' lets PVGIS calculate the PV output for this orientation, 'local' fetches the horizontal
+            irradiance components once per site and years and calculates the PV output locally
+            (see pvLocalModel.getLocalPVPowerProfile).
+        snapResolution (float): Snap the coordinates to the PVGIS grid of this resolution in degrees, e.g. 0.05
+            (default: None, coordinates are used as given).
+        reuseTolerance (float): Reuse cached data of sites within this distance in km instead of fetching
+            (default: None, no reuse).
+        reusePolicy (str): 'nearest' cached site or 'bilinear' interpolation of the four cached grid points
+            around the site (default: 'nearest').
+        columns (list): Columns of the returned data frame, e.g. ['P', 'solar_elevation'] ('P' is always kept;
+            default: None, all columns).
+        dtype: Data type of the float columns, e.g. np.float32 (default: None, as delivered).
+            If columns or dtype is given, the lean frame is kept in process memory and the same frame object (with
+            a DatetimeIndex shared between all frames of the same period) is returned by repeated calls. It must
+            not be modified by the caller.
 
     Returns:
         pd.Series: PV power profile data.
@@ -25,6 +52,168 @@ def getPVPowerProfile(latitude: object = 52, longitude: object = 13.5, start: ob
     Note: API calls have a rate limit of 30 calls/second per IP address. Check: https://joint-research-centre.ec.europa.eu/photovoltaic-geographical-information-system-pvgis/getting-started-pvgis/api-non-interactive-service_en
 
     """
+    if mode not in ('pvgis', 'local'):
+        raise ValueError(f"Unknown mode '{mode}', expected 'pvgis' or 'local'.")
+
+    params = profileRequest(latitude, longitude, start, end, surface_tilt=surface_tilt,
+                            surface_azimuth=surface_azimuth, loss=loss, pvtechchoice=pvtechchoice,
+                            mountingplace=mountingplace, usehorizon=usehorizon)
+    lean = columns is not None or dtype is not None
+    data = None
+    if lean:
+        if columns is not None and 'P' not in columns:
+            columns = ['P'] + list(columns)
+        frameKey = (profileKey(dict(params, mode=mode, snapResolution=snapResolution, reuseTolerance=reuseTolerance,
+                                    reusePolicy=reusePolicy)),
+                    None if columns is None else tuple(columns), None if dtype is None else np.dtype(dtype).str)
+        data = _sharedFrames.get(frameKey)
+        if data is not None:
+            _sharedFrames.move_to_end(frameKey)
+
+    if data is None:
+        if mode == 'local':
+            from pvLocalModel import getLocalPVPowerProfile
+            _, data = getLocalPVPowerProfile(latitude, longitude, start, end, surface_tilt=surface_tilt,
+                                             surface_azimuth=surface_azimuth, loss=loss, pvtechchoice=pvtechchoice,
+                                             mountingplace=mountingplace, usehorizon=usehorizon, cache=cache,
+                                             snapResolution=snapResolution, reuseTolerance=reuseTolerance,
+                                             reusePolicy=reusePolicy)
+        else:
+            data = getOrFetch(params, fetchPVGIS, cache=cache, snapResolution=snapResolution,
+                              reuseTolerance=reuseTolerance, reusePolicy=reusePolicy)
+        if lean:
+            data = leanFrame(data, columns, dtype)
+            _sharedFrames[frameKey] = data
+            while len(_sharedFrames) > MAX_SHARED_FRAMES:
+                _sharedFrames.popitem(last=False)
+
+    dataP = data['P'].reset_index(drop=True)
+    return dataP / 1000, data  # return in kWh
+
+
+def orientationWeights(orientations):
+    """Capacity shares of (tilt, azimuth, weight) orientation groups, normalized to 1."""
+    weights = np.asarray(orientations, dtype=float).reshape(-1, 3)[:, 2]
+    if (weights < 0).any() or not weights.sum() > 0:
+        raise ValueError(f"Orientation weights must be non-negative with a positive sum, got {weights.tolist()}.")
+    return weights / weights.sum()
+
+
+def compositeProfile(orientations, latitude=52, longitude=13.5, start=2014, end=2014, mode='local', **kwargs):
+    """
+    PV profile of a source split into several orientations (e.g. east-west layouts).
+
+    The profile is the capacity weighted linear combination of the orientation profiles. In 'local' mode these are
+    computed in one vectorized pass from the cached weather components of the site (no PVGIS call per orientation),
+    in 'pvgis' mode they are taken from the cached PVGIS profiles.
+
+    Parameters:
+    - orientations: List of (tilt, azimuth, weight) tuples; weights are shares of the installed capacity and are
+      normalized to 1.
+    - latitude, longitude, start, end: Site and years.
+    - mode: 'local' or 'pvgis' (default: 'local').
+    - **kwargs: Further arguments of the profile calculation (loss, pvtechchoice, ...).
+
+    Returns:
+    - Tuple (pd.Series of the PV power in kW for 1 kWp, lean DataFrame with 'P' in W and 'solar_elevation').
+    """
+    tilts, azimuths, _ = np.asarray(orientations, dtype=float).reshape(-1, 3).T
+    weights = orientationWeights(orientations)
+    if mode == 'local':
+        from pvLocalModel import getPVPowerProfiles, getWeatherComponents
+        profiles = getPVPowerProfiles(tilts, azimuths, latitude=latitude, longitude=longitude, start=start,
+                                      end=end, **kwargs)
+        components = getWeatherComponents(latitude, longitude, start, end, usehorizon=kwargs.get('usehorizon', True),
+                                          cache=kwargs.get('cache'))
+        data = leanFrame(components, ['solar_elevation'], np.float32)
+    elif mode == 'pvgis':
+        frames = [getPVPowerProfile(latitude, longitude, start, end, surface_tilt=tilt, surface_azimuth=azimuth,
+                                    columns=['P', 'solar_elevation'], dtype=np.float32, **kwargs)[1]
+                  for tilt, azimuth in zip(tilts, azimuths)]
+        profiles = np.vstack([frame['P'].to_numpy() for frame in frames]) / 1000
+        data = frames[0][['solar_elevation']]
+    else:
+        raise ValueError(f"Unknown mode '{mode}', expected 'pvgis' or 'local'.")
+
+    profile = weights @ profiles  # kW for 1 kWp
+    data = pd.DataFrame({'P': (profile * 1000).astype(np.float32),
+                         'solar_elevation': data['solar_elevation'].to_numpy()}, index=data.index)
+    return pd.Series(profile), data
+
+
+def dropLeapDays(profile, data):
+    """
+    Remove 29 February from a PV profile and its data frame, so that leap years fit an 8760 h model.
+
+    Parameters:
+    - profile: pd.Series with a range index, aligned with the rows of data.
+    - data: DataFrame with a DatetimeIndex.
+
+    Returns:
+    - Tuple (profile with a new range index, data), unchanged if data contains no 29 February.
+    """
+    leapDay = (data.index.month == 2) & (data.index.day == 29)
+    if not leapDay.any():
+        return profile, data
+    return profile[~leapDay].reset_index(drop=True), data[~leapDay]
+
+
+def sharedIndex(index):
+    """Return one DatetimeIndex object per distinct time axis, so that lean frames of the same period share it."""
+    index = pd.DatetimeIndex(index)
+    key = (len(index), str(index.tz), int(index.asi8[0]) if len(index) else 0,
+           int(index.asi8[-1]) if len(index) else 0)
+    shared = _sharedIndexes.get(key)
+    if shared is None or not shared.equals(index):
+        _sharedIndexes[key] = shared = index
+    return shared
+
+
+def leanFrame(data, columns=None, dtype=None):
+    """
+    Project a PVGIS data frame to columns and cast its float columns to dtype.
+
+    Parameters:
+    - data: DataFrame with a DatetimeIndex.
+    - columns: Columns to keep (default: None, all columns).
+    - dtype: Data type of the float columns (default: None, unchanged).
+
+    Returns:
+    - New DataFrame on the shared DatetimeIndex of its period.
+    """
+    if columns is not None:
+        data = data[list(columns)]
+    arrays = {}
+    for column in data.columns:
+        values = data[column].to_numpy()
+        if dtype is not None and np.issubdtype(values.dtype, np.floating):
+            values = values.astype(dtype)
+        arrays[column] = values
+    return pd.DataFrame(arrays, index=sharedIndex(data.index), copy=False)
+
+
+def profileRequest(latitude=52, longitude=13.5, start=2014, end=2014, surface_tilt=20, surface_azimuth=180, loss=10,
+                   pvtechchoice='crystSi', mountingplace='free', usehorizon=True):
+    """Request parameters (cache key and fetchPVGIS arguments) of a PV profile, see getPVPowerProfile."""
+    return {'latitude': latitude, 'longitude': longitude, 'start': start, 'end': end,
+            'surface_tilt': surface_tilt, 'surface_azimuth': surface_azimuth, 'loss': loss,
+            'pvtechchoice': pvtechchoice, 'mountingplace': mountingplace, 'usehorizon': usehorizon}
+
+
+def fetchPVGIS(latitude, longitude, start, end, surface_tilt, surface_azimuth, loss=10, pvtechchoice='crystSi',
+               mountingplace='free', usehorizon=True, pvcalculation=True, url=None, timeout=30):
+    """
+    Request an hourly PV profile from PVGIS (no caching).
+
+    Parameters: see getPVPowerProfile. url overrides the PVGIS API base url (e.g. a local stand-in server).
+    With pvcalculation=False only the irradiance components on the plane, solar elevation, air temperature
+    and wind speed are returned.
+
+    Returns:
+        pd.DataFrame: PVGIS hourly data including the PV power 'P' in W for 1 kWp.
+    """
+    import pvlib
+
     # Convert start and end years to timestamps
     start = pd.Timestamp(f'{start}-01-01')
     end = pd.Timestamp(f'{end}-12-31')
@@ -33,29 +222,30 @@ def getPVPowerProfile(latitude: object = 52, longitude: object = 13.5, start: ob
 
     data: object
 
-    data, _, _ = pvlib.iotools.get_pvgis_hourly(latitude=latitude,
-                                                longitude=longitude,
-                                                start=start,
-                                                end=end,
-                                                surface_tilt=surface_tilt,
-                                                surface_azimuth=surface_azimuth,
-                                                usehorizon=True,
-                                                userhorizon=None,
-                                                peakpower=1,  # peakpower (float, default: None) – Nominal power of PV
-                                                # system in kW. Required if pvcalculation=True.
-                                                pvtechchoice='crystSi',  # ({'crystSi', 'CIS', 'CdTe', 'Unknown'},
-                                                # default: 'crystSi') – PV technology.
-                                                mountingplace='free', # ({'free', 'building'}, default: free) – Type
-                                                # of mounting for PV system. Options of ‘free’ for free-standing and
-                                                # ‘building’ for building-integrated.
-                                                loss=10,# Sum of PV system losses in percent. Required if pvcalculation=True
-                                                trackingtype=0,
-                                                pvcalculation=1,
-                                                timeout=30)# Time in seconds to wait for server response before timeout
-
-    dataP = data['P']
-    dataP.reset_index(drop=True, inplace=True)
-    return dataP / 1000, data  # return in kWh
+    kwargs = {} if url is None else {'url': url}
+    # (data, inputs, metadata) up to pvlib 0.12, (data, metadata) since 0.13
+    data = pvlib.iotools.get_pvgis_hourly(latitude=latitude,
+                                          longitude=longitude,
+                                          start=start,
+                                          end=end,
+                                          surface_tilt=surface_tilt,
+                                          surface_azimuth=surface_azimuth,
+                                          usehorizon=usehorizon,
+                                          userhorizon=None,
+                                          peakpower=1,  # peakpower (float, default: None) – Nominal power of PV
+                                          # system in kW. Required if pvcalculation=True.
+                                          pvtechchoice=pvtechchoice,  # ({'crystSi', 'CIS', 'CdTe', 'Unknown'},
+                                          # default: 'crystSi') – PV technology.
+                                          mountingplace=mountingplace, # ({'free', 'building'}, default: free) – Type
+                                          # of mounting for PV system. Options of ‘free’ for free-standing and
+                                          # ‘building’ for building-integrated.
+                                          loss=loss,# Sum of PV system losses in percent. Required if pvcalculation=True
+                                          trackingtype=0,
+                                          pvcalculation=int(pvcalculation),
+                                          components=True,
+                                          timeout=timeout,# Time in seconds to wait for server response before timeout
+                                          **kwargs)[0]
+    return data
 
 
 def plotSolarElevation(data):
@@ -69,6 +259,8 @@ def plotSolarElevation(data):
     Returns:
     - None (displays the plot).
     """
+    import matplotlib.pyplot as plt
+
     # Filter for December 21st
     december_21_data = data[(data.index.month == 12) & (data.index.day == 21)]
 
@@ -119,23 +311,98 @@ def calculate_moduleRowSpacing(data, time='10:00:00', surface_tilt=30, module_wi
     # Get elevation angles at specified times
     elevationAngleTime = elevation_values[index_time]
 
+    areaUsage, damping = _rowSpacingGeometry(elevationAngleTime, surface_tilt, module_width, moduleRowSpacing)
+    result = {
+        'elevationAngleTime': elevationAngleTime,
+        'moduleRowSpacingL': moduleRowSpacing,
+        'areaUsage': areaUsage,
+        'damping': damping,
+    }
+
+    return result
+
+
+def _rowSpacingGeometry(elevationAngle, surface_tilt, module_width, moduleRowSpacing):
+    """Area usage and damping of calculate_moduleRowSpacing for one elevation angle (all inputs broadcast)."""
     # Calculate Height_Difference
     height_difference = np.sin(np.radians(surface_tilt)) * module_width
 
     # Calculate moduleRowSpacing_L using the maximum of the two elevation angles
-    min_elevation_angle = elevationAngleTime
+    min_elevation_angle = elevationAngle
     moduleRowSpacing_no_shadow= height_difference / np.tan(np.radians(min_elevation_angle))
     # Calculate areaUsage
     areaUsage = module_width / (moduleRowSpacing+np.cos(np.radians(surface_tilt)) * module_width)
     damping = np.maximum((moduleRowSpacing_no_shadow+np.cos(np.radians(surface_tilt))-moduleRowSpacing)/(moduleRowSpacing_no_shadow+np.cos(np.radians(surface_tilt))+1e-6),0) #simple geometry
-    result = {
-        'elevationAngleTime': elevationAngleTime,
-        'moduleRowSpacingL': moduleRowSpacing,
-        'areaUsage': areaUsage,
-        'damping': damping,
-    }
+    return areaUsage, damping
 
-    return result
+
+def calculate_moduleRowSpacingBatch(elevationLow, elevationHigh, surface_tilt=30, module_width=2,
+                                    moduleRowSpacing=3):
+    """
+    Batch version of calculate_moduleRowSpacing for whole design populations.
+
+    Parameters:
+    - elevationLow, elevationHigh: Solar elevation in degrees at the reference time of 21 December and 21 June
+      (see solarPosition.getShadingElevations), scalars or arrays (e.g. one value per site).
+    - surface_tilt, module_width, moduleRowSpacing: Arrays of the design values (scalars are broadcast).
+
+    Returns:
+    - Dictionary of arrays with the broadcast shape of the inputs: 'elevationLow', 'elevationHigh', 'areaUsage',
+      'dampingLow', 'dampingHigh' and 'damping' (mean of both days, as used in energySystemsStats).
+    """
+    surface_tilt = np.asarray(surface_tilt, dtype=float)
+    module_width = np.asarray(module_width, dtype=float)
+    moduleRowSpacing = np.asarray(moduleRowSpacing, dtype=float)
+    areaUsage, dampingLow = _rowSpacingGeometry(np.asarray(elevationLow, dtype=float), surface_tilt, module_width,
+                                                moduleRowSpacing)
+    _, dampingHigh = _rowSpacingGeometry(np.asarray(elevationHigh, dtype=float), surface_tilt, module_width,
+                                         moduleRowSpacing)
+    shape = np.broadcast(areaUsage, dampingLow, dampingHigh).shape
+    return {'elevationLow': np.broadcast_to(elevationLow, shape),
+            'elevationHigh': np.broadcast_to(elevationHigh, shape),
+            'areaUsage': np.broadcast_to(areaUsage, shape),
+            'dampingLow': dampingLow,
+            'dampingHigh': dampingHigh,
+            'damping': (dampingLow + dampingHigh) / 2}
+
+
+def calculate_shadingTimeSeries(solar_elevation, solar_azimuth, surface_tilt=30, surface_azimuth=180, module_width=2,
+                                moduleRowSpacing=3, beamFraction=None):
+    """
+    Calculate the inter-row shading loss for every time step.
+
+    The top edge of a row casts a shadow on the next row if the shadow length in the direction of the row normal
+    (profile angle psi) exceeds the gap between the rows. The shaded fraction of the module width is
+    1 - pitch / (W * (cos(tilt) + sin(tilt) / tan(psi))), with pitch = moduleRowSpacing + W * cos(tilt) as in
+    calculate_moduleRowSpacing. Time steps with the sun below the horizon or behind the rows are not shaded.
+
+    Parameters:
+    - solar_elevation, solar_azimuth: Arrays of the solar position in degrees (e.g. solarPosition.getSolarPosition).
+    - surface_tilt, surface_azimuth: Orientation of the rows in degrees.
+    - module_width: Module width W in m (default: 2).
+    - moduleRowSpacing: Horizontal gap between the rows in m (default: 3).
+    - beamFraction: Share of the beam irradiance in the PV output per time step (default: None, the shaded fraction
+      is applied to the whole output as in the two-instant damping).
+    All parameters broadcast, e.g. (N, 1) design arrays against (T,) time arrays.
+
+    Returns:
+    - Array of the damping (power loss fraction, 0..1) per time step.
+    """
+    elevation = np.radians(np.asarray(solar_elevation, dtype=float))
+    relativeAzimuth = np.radians(np.asarray(solar_azimuth, dtype=float) - np.asarray(surface_azimuth, dtype=float))
+    tilt = np.radians(np.asarray(surface_tilt, dtype=float))
+    module_width = np.asarray(module_width, dtype=float)
+
+    cosRelativeAzimuth = np.cos(relativeAzimuth)
+    lit = (elevation > 0) & (cosRelativeAzimuth > 0)
+    # tan(psi) = tan(elevation) / cos(relative azimuth)
+    tanProfileAngle = np.where(lit, np.tan(elevation) / np.where(lit, cosRelativeAzimuth, 1), np.inf)
+    pitch = moduleRowSpacing + module_width * np.cos(tilt)
+    shadowReach = module_width * (np.cos(tilt) + np.sin(tilt) / np.maximum(tanProfileAngle, 1e-9))
+    damping = np.where(lit, np.clip(1 - pitch / shadowReach, 0, 1), 0)
+    if beamFraction is not None:
+        damping = damping * np.asarray(beamFraction, dtype=float)
+    return damping
 
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Headless core of the GRID_PV_Storage model for batch runs and process-pool workers.
+
+Importing this module loads numpy, pandas and the model modules only. FINE (and Pyomo) are imported when the first
+model is built, pvlib when a PV profile is calculated or requested from PVGIS, matplotlib only by the plot
+functions and the rate limited PVGIS prefetcher (requests) only by siteScreening with prefetchData. The matplotlib
+backend defaults to Agg, so a plot call in a worker does not need a display.
+
+Usage:
+    from headless import energySystemsStats, initWorker
+    ProcessPoolExecutor(initializer=initWorker, initargs=(('FINE',),))
+    python headless.py '{"tilt": 30, "azimuth": 160, "fixCapacityST": 5, "maxCapacityST": 5}'    # KPIs as JSON
+"""
+
+import importlib
+import json
+import os
+import sys
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+from scenarioBatch import energySystemsStatsBatch
+from simulationsmodel import energySystemsStats
+
+# optional modules with a noticeable import time, loaded on first use only
+HEAVY_MODULES = ('FINE', 'pyomo', 'pvlib', 'matplotlib', 'tabulate', 'requests')
+
+
+def loadedHeavyModules():
+    """HEAVY_MODULES imported in this process."""
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def initWorker(preload=()):
+    """
+    Process-pool initializer for headless workers.
+
+    Parameters:
+    - preload: Modules to import up front, e.g. ('FINE',) when every task builds a model anyway and the import
+      should not count towards the first task (default: none, everything is imported on first use).
+    """
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    for name in preload:
+        importlib.import_module(name)
+
+
+if __name__ == "__main__":
+    scenario = json.loads(sys.argv[1]) if len(sys.argv) > 1 else {}
+    results = energySystemsStats(**dict(scenario, exportResults=False))
+    print(results['tableview'].iloc[:, 0].to_json())
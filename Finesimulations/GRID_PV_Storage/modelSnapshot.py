@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+On-disk snapshots of built (and optionally temporally aggregated) EnergySystemModels.
+
+Building an EnergySystemModel and running aggregateTemporally can take longer than the solver for the larger
+examples. getOrBuildModel stores the model after construction (and clustering) as a gzip compressed pickle under
+the SHA-256 hash of all its inputs, including the source code of the functions that build it, so batch runs,
+restarts and new worker processes load it instead of rebuilding it. Snapshots are taken before the optimization
+(no Pyomo model inside).
+
+Usage:
+    esM = getOrBuildModel(lambda: buildModel(profile, bounds), inputs=(profile, bounds), numberOfTypicalPeriods=7)
+    esM.optimize(timeSeriesAggregation=True, solver='GLPK')
+"""
+
+import gzip
+import hashlib
+import inspect
+import os
+import pickle
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DIRECTORY = 'ModelSnapshots'
+
+
+def _update(digest, value):
+    """Feed a (nested) model input into the hash."""
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        digest.update(repr((type(value).__name__, getattr(value, 'name', None),
+                            list(getattr(value, 'columns', [])), repr(value.dtypes))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        digest.update(b'{')
+        for key in sorted(value, key=repr):
+            _update(digest, key)
+            _update(digest, value[key])
+        digest.update(b'}')
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        digest.update(b'[')
+        for item in (sorted(value, key=repr) if isinstance(value, (set, frozenset)) else value):
+            _update(digest, item)
+        digest.update(b']')
+    elif callable(value):
+        # builder functions by name and source: a changed construction must not load an old snapshot
+        digest.update(f'{getattr(value, "__module__", None)}.{getattr(value, "__qualname__", None)}'.encode())
+        try:
+            digest.update(inspect.getsource(value).encode())
+        except (OSError, TypeError):
+            code = getattr(value, '__code__', None)
+            if code is not None:
+                digest.update(code.co_code + repr(code.co_consts).encode())
+    else:
+        digest.update(repr(value).encode())
+    digest.update(b';')
+
+
+def snapshotKey(inputs, numberOfTypicalPeriods=None):
+    """
+    Content address of a model snapshot.
+
+    Parameters:
+    - inputs: All inputs of the model construction (nested dicts, lists, scalars, arrays, pandas objects, and the
+      building functions, hashed with their source code).
+    - numberOfTypicalPeriods: Number of typical periods of the temporal aggregation, None for an unclustered model.
+
+    Returns:
+    - Hex digest (str).
+    """
+    import FINE as fn
+
+    digest = hashlib.sha256()
+    _update(digest, (SNAPSHOT_VERSION, getattr(fn, '__version__', None), numberOfTypicalPeriods, inputs))
+    return digest.hexdigest()
+
+
+def saveModel(esM, key, directory=SNAPSHOT_DIRECTORY):
+    """Write a model snapshot (atomic, concurrent writers of the same key are safe)."""
+    os.makedirs(directory, exist_ok=True)
+    handle, tmpPath = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(handle, 'wb') as file, gzip.GzipFile(fileobj=file, mode='wb', compresslevel=3) as stream:
+        pickle.dump(esM, stream, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpPath, os.path.join(directory, key + '.pkl.gz'))
+
+
+def loadModel(key, directory=SNAPSHOT_DIRECTORY):
+    """Read a model snapshot; returns None if there is none for key."""
+    try:
+        with gzip.open(os.path.join(directory, key + '.pkl.gz'), 'rb') as stream:
+            return pickle.load(stream)
+    except FileNotFoundError:
+        return None
+
+
+def getOrBuildModel(build, inputs, numberOfTypicalPeriods=None, directory=SNAPSHOT_DIRECTORY):
+    """
+    Load a model snapshot or build, aggregate and store the model.
+
+    Parameters:
+    - build: Function without arguments returning the fn.EnergySystemModel.
+    - inputs: Everything build depends on (hashed with snapshotKey).
+    - numberOfTypicalPeriods: Run aggregateTemporally with this number of typical periods before the snapshot is
+      taken (default: None, no aggregation).
+    - directory: Snapshot directory (default: ModelSnapshots).
+
+    Returns:
+    - fn.EnergySystemModel, ready for optimize().
+    """
+    key = snapshotKey(inputs, numberOfTypicalPeriods)
+    esM = loadModel(key, directory)
+    if esM is None:
+        esM = build()
+        if numberOfTypicalPeriods is not None:
+            esM.aggregateTemporally(numberOfTypicalPeriods=numberOfTypicalPeriods)
+        saveModel(esM, key, directory)
+    return esM
+
+
+def clearSnapshots(directory=SNAPSHOT_DIRECTORY):
+    """Remove all snapshots of directory; returns the number of removed files."""
+    if not os.path.isdir(directory):
+        return 0
+    removed = 0
+    for fileName in os.listdir(directory):
+        if fileName.endswith('.pkl.gz'):
+            os.remove(os.path.join(directory, fileName))
+            removed += 1
+    return removed
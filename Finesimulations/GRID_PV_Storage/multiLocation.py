@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Multi-location variant of energySystemsStats: a portfolio of sites connected by a shared grid.
+
+Every site gets the components of energySystemsStats (load, grid purchase, PV, storage, spot market, conversions)
+with its own PV profile, load scaling, capacity bounds and costs. The PV electricity (source_2_commodity) can be
+exchanged between the sites over a transmission component ("shared grid") with distances from the site
+coordinates, as in Validierungsbeispiel_Transmission. The PV and shading inputs of the sites are prepared in
+parallel worker processes.
+
+Usage:
+    sites = pd.DataFrame({'name': ['Nord', 'Sued'], 'latitude': [53.5, 52.4], 'longitude': [10.0, 13.1],
+                          'scale_sink': [5, 10]})
+    results = energySystemsStatsMulti(sites, fixCapacityST=5, maxCapacityST=5)
+    results['sites'], results['total']
+    python multiLocation.py [solver]    # build, cluster and solve time versus the number of locations
+"""
+
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pvCache import haversineDistance
+from scenarioBatch import completeScenarios, prepareScenario
+from simulationsmodel import SOURCE_2, buildEnergySystemModel, mergeComponents, summarizeResults
+from transmissionNetwork import transmissionArguments
+
+# KPIs that add up over the sites
+ADDITIVE_KPIS = ('capacityPVOptimum', 'capacityStorageOptimum', 'operationTotOptimumGrid', 'operationTotOptimumPV',
+                 'operationTotOptimumStorageCharge', 'operationTotOptimumStorageDischarge', 'operationTotSink',
+                 'operationTotCO2', 'TAC')
+
+
+def _addTransmission(esM, **arguments):
+    import FINE as fn
+
+    # shared grid: exchange of PV electricity between the sites
+    esM.add(fn.Transmission(esM=esM,
+                            name='SHARED_GRID',
+                            commodity=SOURCE_2,
+                            hasCapacityVariable=True,
+                            **arguments))
+
+
+def siteDistances(sites, locations):
+    """Symmetric great circle distance matrix of the sites in km (DataFrame locations x locations)."""
+    latitude = sites['latitude'].to_numpy(dtype=float)
+    longitude = sites['longitude'].to_numpy(dtype=float)
+    distances = haversineDistance(latitude[:, np.newaxis], longitude[:, np.newaxis], latitude[np.newaxis, :],
+                                  longitude[np.newaxis, :])
+    return pd.DataFrame(distances, index=locations, columns=locations)
+
+
+def _totalKPIs(table, profiles, hoursPerTimeStep):
+    """Portfolio KPIs: sums of the additive KPIs, self-consumption and self-sufficiency of the sums."""
+    total = table.loc[list(ADDITIVE_KPIS)].sum(axis=1)
+    selfConsumed = (total['operationTotOptimumPV'] - total['operationTotOptimumStorageCharge']
+                    + total['operationTotOptimumStorageDischarge'])
+    availablePV = sum(profiles[location].sum() * table.loc['capacityPVOptimum', location] * hoursPerTimeStep
+                      for location in table.columns)
+    total['selfconsumption'] = selfConsumed / availablePV if availablePV else np.nan
+    total['selfsufficiency'] = selfConsumed / (total['operationTotOptimumGrid'] + total['operationTotOptimumPV']
+                                               + total['operationTotOptimumStorageDischarge'])
+    return total
+
+
+def energySystemsStatsMulti(sites, processes=None, hoursPerTimeStep=1, timeSeriesAggregation=True,
+                            numberOfTypicalPeriods=7, transmissionCapacityMax=100, transmissionLosses=0.001,
+                            transmissionEdges=None, solver='GLPK', **common):
+    """
+    Optimize a portfolio of sites connected by a shared grid in one EnergySystemModel.
+
+    Args:
+        sites (pd.DataFrame): One row per site with 'latitude' and 'longitude', optionally 'name' (location name)
+            and further per-site energySystemsStats arguments (tilt, azimuth, scale_sink, capacity bounds, costs,
+            pvProfile, ...).
+        processes (int, optional): Worker processes for the PV and shading preparation. 1 prepares the sites in
+            this process. Defaults to the number of CPUs.
+        hoursPerTimeStep, timeSeriesAggregation, numberOfTypicalPeriods: Model wide settings, see energySystemsStats.
+        transmissionCapacityMax (float or pd.DataFrame, optional): Maximal transmission capacity in kW between every
+            pair of sites, or a symmetric locations x locations matrix (0 = no connection). Defaults to 100.
+        transmissionLosses (float, optional): Relative transmission losses per km. Defaults to 0.001.
+        transmissionEdges (pd.DataFrame or list, optional): Lines of the shared grid as an edge list ('from', 'to'
+            location names, optionally 'capacityMax', 'distance' and 'losses' per line, see
+            transmissionNetwork.edgeList) instead of connections between all pairs of sites. Missing capacities and
+            losses are taken from transmissionCapacityMax (scalar) and transmissionLosses, missing distances from the
+            site coordinates.
+        solver (str, optional): Solver of esM.optimize, see energySystemsStats. Defaults to 'GLPK'.
+        **common: energySystemsStats arguments shared by all sites (overridden by the site table). maxCapacityST
+            must be equal for all sites (the storage charge rate is model wide).
+
+    Returns:
+    - Dictionary with
+        - 'sites': KPIs per site (rows as energySystemsStats 'tableview', one column per location).
+        - 'total': Portfolio KPIs (sums, and self-consumption / self-sufficiency of the portfolio).
+        - 'srcSnkSummary', 'convSummary', 'storSummary', 'transSummary': Optimization summaries.
+        - 'esM': Energy system model.
+        - 'timings': Seconds of the phases 'prepare', 'build', 'cluster' and 'solve'.
+    """
+    sites = sites.reset_index(drop=True)
+    locations = ([str(name) for name in sites['name']] if 'name' in sites
+                 else [f'site{position:02d}' for position in range(len(sites))])
+    scenarios = completeScenarios(sites.drop(columns=['name'], errors='ignore'), common)
+    if len({scenario['maxCapacityST'] for scenario in scenarios}) > 1:
+        raise ValueError("maxCapacityST must be equal for all sites (the storage charge rate is model wide).")
+    timings = {}
+
+    started = time.perf_counter()
+    if processes == 1:
+        prepared = [prepareScenario(scenario, location, hoursPerTimeStep)
+                    for scenario, location in zip(scenarios, locations)]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            prepared = list(executor.map(prepareScenario, scenarios, locations, [hoursPerTimeStep] * len(locations)))
+    profiles = {location: profile for location, (profile, _) in zip(locations, prepared)}
+    components = {location: siteComponents for location, (_, siteComponents) in zip(locations, prepared)}
+    timings['prepare'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    esM = buildEnergySystemModel(int(round(8760 / hoursPerTimeStep)), hoursPerTimeStep, mergeComponents(components),
+                                 locations=locations)
+    if transmissionEdges is not None:
+        edges = pd.DataFrame(transmissionEdges)
+        for column, default in (('capacityMax', transmissionCapacityMax), ('losses', transmissionLosses)):
+            edges[column] = edges[column].fillna(default) if column in edges else default
+        coordinates = pd.DataFrame({'latitude': sites['latitude'].to_numpy(dtype=float),
+                                    'longitude': sites['longitude'].to_numpy(dtype=float)}, index=locations)
+        _addTransmission(esM, **transmissionArguments(edges, locations, coordinates=coordinates))
+    elif len(locations) > 1:
+        if np.ndim(transmissionCapacityMax) == 0:
+            transmissionCapacityMax = pd.DataFrame(transmissionCapacityMax * (1 - np.eye(len(locations))),
+                                                   index=locations, columns=locations)
+        _addTransmission(esM, capacityMax=transmissionCapacityMax, distances=siteDistances(sites, locations),
+                         losses=transmissionLosses)
+    timings['build'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if timeSeriesAggregation:
+        esM.aggregateTemporally(numberOfTypicalPeriods=numberOfTypicalPeriods)
+    timings['cluster'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    esM.optimize(timeSeriesAggregation=timeSeriesAggregation, solver=solver)
+    timings['solve'] = time.perf_counter() - started
+
+    siteTables = [summarizeResults(esM, profiles[location], hoursPerTimeStep, location) for location in locations]
+    table = pd.concat([siteTable.iloc[:, 0].rename(location) for location, (siteTable, *_) in
+                       zip(locations, siteTables)], axis=1)
+    _, srcSnkSummary, convSummary, storSummary = siteTables[0]
+    return {'sites': table,
+            'total': _totalKPIs(table, profiles, hoursPerTimeStep),
+            'srcSnkSummary': srcSnkSummary,
+            'convSummary': convSummary,
+            'storSummary': storSummary,
+            'transSummary': esM.getOptimizationSummary("TransmissionModel", outputLevel=1)
+            if 'SHARED_GRID' in esM.componentNames else None,
+            'esM': esM,
+            'timings': timings}
+
+
+def benchmarkLocations(numbersOfLocations=(1, 2, 4, 8, 16, 32), seed=0, **kwargs):
+    """
+    Prepare, build, cluster and solve time of energySystemsStatsMulti versus the number of locations.
+
+    Returns:
+    - DataFrame with one row per number of locations and the seconds of every phase.
+    """
+    generator = np.random.default_rng(seed)
+    records = []
+    for numberOfLocations in numbersOfLocations:
+        sites = pd.DataFrame({'latitude': generator.uniform(51.5, 53.5, numberOfLocations),
+                              'longitude': generator.uniform(12.0, 14.5, numberOfLocations),
+                              'tilt': generator.uniform(10, 50, numberOfLocations),
+                              'azimuth': generator.uniform(120, 240, numberOfLocations),
+                              'scale_sink': generator.uniform(5, 15, numberOfLocations)})
+        results = energySystemsStatsMulti(sites, **kwargs)
+        records.append(dict(results['timings'], locations=numberOfLocations, TAC=results['total']['TAC']))
+    return pd.DataFrame(records).set_index('locations')
+
+
+if __name__ == "__main__":
+    table = benchmarkLocations(fixCapacityST=5, maxCapacityST=5, solver=sys.argv[1] if len(sys.argv) > 1 else 'GLPK')
+    print(table)
+    table.to_csv("Results/BenchmarkLocations.csv")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Presolve of compiled topologies: elimination of pass-through conversions.
+
+Validierungsbeispiel_5 routes its flows through chains of conversions without capacity variable or costs that
+consume one commodity with factor -1 and emit it with factor +1 (e.g. source_1_splitted_conversion_1 -->
+conversion_1 --> sink_1_conversion). Every such conversion adds an intermediate commodity (one balance constraint
+per location and time step) and an operation variable per location and time step.
+
+An intermediate commodity m that is produced by exactly one conversion P (factor p) and consumed by exactly one
+conversion C (factor -c), and touched by no other component, fixes the ratio of their operations:
+p * x_P = c * x_C. If C is a pass-through conversion (c = 1), it is eliminated and P takes over its other factors
+scaled by p (x_C = p * x_P); if P is a pass-through conversion (p = 1), it is eliminated into C with its factors
+scaled by c (x_P = c * x_C). Side flows of the eliminated conversion (e.g. emissions to environment_commodity) are
+kept this way. The elimination is exact, the reduced model has the same optimum.
+
+Usage:
+    reduced, reduction = presolveTopology(loadTopology("../Validierungsbeispiel_5/topology.json"))
+    esM = buildModel(reduced)
+    ...
+    convSummary = expandConversionSummary(esM.getOptimizationSummary("ConversionModel", outputLevel=1), reduction)
+"""
+
+import hashlib
+
+import pandas as pd
+
+from topologySpec import CompiledTopology
+
+# arguments a conversion may have to be eliminated
+PASS_THROUGH_ARGUMENTS = {'physicalUnit', 'commodityConversionFactors', 'hasCapacityVariable'}
+
+
+def _numericFactors(component):
+    factors = component['arguments'].get('commodityConversionFactors', {})
+    if all(isinstance(factor, (int, float)) and not isinstance(factor, bool) for factor in factors.values()):
+        return factors
+    return None
+
+
+def _isPassThrough(component):
+    """Conversion without capacity variable, costs or bounds with exactly one input factor of -1."""
+    if component['type'] != 'Conversion' or set(component['arguments']) - PASS_THROUGH_ARGUMENTS:
+        return False
+    if component['arguments'].get('hasCapacityVariable', True):
+        return False
+    factors = _numericFactors(component)
+    return factors is not None and [factor for factor in factors.values() if factor < 0] == [-1]
+
+
+def _touching(components):
+    """Commodity -> list of (component position, factor or None for non-conversions)."""
+    touching = {}
+    for position, component in enumerate(components):
+        if component['type'] == 'Conversion':
+            for commodity, factor in component['arguments'].get('commodityConversionFactors', {}).items():
+                touching.setdefault(commodity, []).append((position, factor))
+        else:
+            touching.setdefault(component['arguments'].get('commodity'), []).append((position, None))
+    return touching
+
+
+def _findElimination(components):
+    """Next (commodity, eliminated position, survivor position, scale) or None."""
+    for commodity, entries in _touching(components).items():
+        if len(entries) != 2 or any(factor is None or not isinstance(factor, (int, float)) for _, factor in entries):
+            continue
+        (first, firstFactor), (second, secondFactor) = entries
+        if first == second or firstFactor * secondFactor >= 0:
+            continue
+        (producer, p), (consumer, c) = (((first, firstFactor), (second, -secondFactor)) if firstFactor > 0
+                                        else ((second, secondFactor), (first, -firstFactor)))
+        # x_C = p / c * x_P
+        if _isPassThrough(components[consumer]) and c == 1:
+            return commodity, consumer, producer, p
+        if _isPassThrough(components[producer]) and p == 1:
+            return commodity, producer, consumer, c
+    return None
+
+
+def presolveTopology(topology):
+    """
+    Eliminate pass-through conversions of a compiled topology.
+
+    Parameters:
+    - topology: CompiledTopology (topologySpec.compileTopology / loadTopology).
+
+    Returns:
+    - Tuple (reduced CompiledTopology, reduction) with reduction a dictionary
+        - 'eliminated': {eliminated conversion: (surviving conversion, scale)}, operation of the eliminated
+          conversion = scale * operation of the surviving conversion
+        - 'commodities': list of the removed intermediate commodities
+        - 'physicalUnits': {eliminated conversion: physicalUnit}
+    """
+    components = [dict(component, arguments=dict(component['arguments'],
+                                                 commodityConversionFactors=dict(
+                                                     component['arguments']['commodityConversionFactors'])))
+                  if component['type'] == 'Conversion' else component
+                  for component in topology.components]
+    eliminated, removedCommodities, physicalUnits = {}, [], {}
+
+    while True:
+        found = _findElimination(components)
+        if found is None:
+            break
+        commodity, eliminatedPosition, survivorPosition, scale = found
+        removed, survivor = components[eliminatedPosition], components[survivorPosition]
+        factors = survivor['arguments']['commodityConversionFactors']
+        del factors[commodity]
+        for other, factor in removed['arguments']['commodityConversionFactors'].items():
+            if other == commodity:
+                continue
+            merged = factors.get(other, 0) + factor * scale
+            if merged == 0:
+                factors.pop(other, None)
+            else:
+                factors[other] = merged
+
+        for name, (target, targetScale) in eliminated.items():
+            if target == removed['name']:
+                eliminated[name] = (survivor['name'], targetScale * scale)
+        eliminated[removed['name']] = (survivor['name'], scale)
+        physicalUnits[removed['name']] = removed['arguments'].get('physicalUnit')
+        removedCommodities.append(commodity)
+        del components[eliminatedPosition]
+
+    key = hashlib.sha256((topology.key + ':presolved').encode()).hexdigest()
+    reduced = CompiledTopology(key, topology.name, topology.locations,
+                               {commodity: unit for commodity, unit in topology.commodities.items()
+                                if commodity not in removedCommodities},
+                               topology.model, topology.parameters, components, topology.baseDirectory,
+                               topology.warnings)
+    return reduced, {'eliminated': eliminated, 'commodities': removedCommodities, 'physicalUnits': physicalUnits}
+
+
+def expandConversionSummary(convSummary, reduction):
+    """
+    Add the operation rows of the eliminated conversions to a ConversionModel optimization summary.
+
+    Parameters:
+    - convSummary: esM.getOptimizationSummary("ConversionModel", outputLevel=1) of the reduced model.
+    - reduction: Second result of presolveTopology.
+
+    Returns:
+    - Summary with an ('<name>', 'operation', '[<physicalUnit>*h/a]') row for every eliminated conversion.
+    """
+    rows = []
+    for name, (survivor, scale) in reduction['eliminated'].items():
+        operation = convSummary.loc[survivor].xs('operation', level=0)
+        rows.append(pd.DataFrame(operation.to_numpy() * scale, columns=convSummary.columns,
+                                 index=pd.MultiIndex.from_tuples(
+                                     [(name, 'operation', f"[{reduction['physicalUnits'][name]}*h/a]")],
+                                     names=convSummary.index.names)))
+    return pd.concat([convSummary] + rows).sort_index()
+
+
+def expandOperation(operation, reduction):
+    """
+    Add the operation time series of the eliminated conversions.
+
+    Parameters:
+    - operation: DataFrame of conversion operation time series with the component names in the first index level
+      (e.g. esM.componentModelingDict['ConversionModel'].operationVariablesOptimum).
+    - reduction: Second result of presolveTopology.
+
+    Returns:
+    - DataFrame with scaled copies of the surviving rows for every eliminated conversion.
+    """
+    expanded = [operation]
+    for name, (survivor, scale) in reduction['eliminated'].items():
+        rows = operation.loc[[survivor]] * scale
+        if isinstance(rows.index, pd.MultiIndex):
+            rows.index = pd.MultiIndex.from_tuples([(name,) + index[1:] for index in rows.index],
+                                                   names=rows.index.names)
+        else:
+            rows.index = [name]
+        expanded.append(rows)
+    return pd.concat(expanded)
+
+
+def lpSize(esM):
+    """Number of variables and constraints of the optimization problem of an optimized model."""
+    import pyomo.environ as pyomo
+
+    return {'variables': sum(1 for _ in esM.pyM.component_data_objects(pyomo.Var, active=True)),
+            'constraints': sum(1 for _ in esM.pyM.component_data_objects(pyomo.Constraint, active=True))}
+
+
+def structureSize(topology):
+    """Components, commodities and operation variables / commodity balances per location and time step."""
+    operationVariables = {'Source': 1, 'Sink': 1, 'Conversion': 1, 'Storage': 3, 'Transmission': 2}
+    return {'components': len(topology.components),
+            'conversions': sum(component['type'] == 'Conversion' for component in topology.components),
+            'commodities': len(topology.commodities),
+            'operationVariablesPerTimeStep': sum(operationVariables[component['type']]
+                                                 for component in topology.components),
+            'balancesPerTimeStep': len(topology.commodities)}
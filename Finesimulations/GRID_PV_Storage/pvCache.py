@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Content-addressed disk cache for PVGIS responses.
+
+Every entry is stored under the SHA-256 hash of the request parameters as a pair of files:
+    <key>.npz   the PVGIS data frame (DatetimeIndex + one array per column, uncompressed)
+    <key>.json  the request parameters and the entry size (used for lookups without loading data)
+
+The cache is bounded in size. Reading an entry refreshes its modification time, and when the total size
+exceeds maxBytes the least recently used entries are removed first.
+
+PVGIS serves radiation data on a fixed grid (PVGIS-SARAH2: 0.05°, ERA5: 0.25°). Coordinates can be snapped to that
+grid (snapCoordinates) and near-duplicate sites can reuse cached data of the nearest cached site or a bilinear
+interpolation of the four surrounding grid points (getOrFetch).
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import warnings
+
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 1
+
+GRID_RESOLUTION = 0.05  # degrees, PVGIS-SARAH2 radiation database
+EARTH_RADIUS = 6371.0  # km
+
+# parameters that define a PVGIS profile request (see getPVPowerProfile)
+KEY_PARAMETERS = ('latitude', 'longitude', 'start', 'end', 'surface_tilt', 'surface_azimuth', 'loss',
+                  'pvtechchoice', 'mountingplace', 'usehorizon')
+
+
+class OfflineCacheMiss(LookupError):
+    """Raised when a profile is requested in offline mode but is not in the cache."""
+
+
+def _normalize(value):
+    """Make parameter values hash stable (2014 == 2014.0 == '2014', 52.50000001 == 52.5)."""
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        value = round(float(value), 6)
+        return int(value) if value.is_integer() else value
+    if isinstance(value, str):
+        try:
+            return _normalize(float(value))
+        except ValueError:
+            return value
+    return str(value)
+
+
+def profileKey(params):
+    """
+    Calculate the content address of a profile request.
+
+    Parameters:
+    - params: Dictionary with the request parameters (all of KEY_PARAMETERS, further keys are included too).
+
+    Returns:
+    - Hex digest (str) identifying the request.
+    """
+    normalized = {name: _normalize(value) for name, value in params.items()}
+    normalized['version'] = CACHE_VERSION
+    payload = json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def snapCoordinates(latitude, longitude, resolution=GRID_RESOLUTION):
+    """
+    Snap coordinates to the PVGIS data grid.
+
+    Parameters:
+    - latitude, longitude: Coordinates in degrees.
+    - resolution: Grid resolution in degrees (default: 0.05).
+
+    Returns:
+    - Tuple (latitude, longitude) of the nearest grid point.
+    """
+    decimals = max(0, int(np.ceil(-np.log10(resolution))) + 1)
+    return (round(round(latitude / resolution) * resolution, decimals),
+            round(round(longitude / resolution) * resolution, decimals))
+
+
+def haversineDistance(latitude1, longitude1, latitude2, longitude2):
+    """Great circle distance in km (inputs in degrees, array-likes broadcast)."""
+    phi1, phi2 = np.radians(latitude1), np.radians(latitude2)
+    dPhi = phi2 - phi1
+    dLambda = np.radians(np.asarray(longitude2) - np.asarray(longitude1))
+    a = np.sin(dPhi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dLambda / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+class PVProfileCache:
+    """
+    Size-bounded LRU disk cache for PVGIS data frames.
+
+    Parameters:
+    - directory: Directory of the cache files (created if missing).
+    - maxBytes: Upper bound for the total size of all entries in bytes (default: 2 GB).
+    - offline: If True, getPVPowerProfile never contacts PVGIS and raises OfflineCacheMiss on a miss.
+    """
+
+    def __init__(self, directory, maxBytes=2 * 1024 ** 3, offline=False):
+        self.directory = os.path.abspath(directory)
+        self.maxBytes = int(maxBytes)
+        self.offline = bool(offline)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _paths(self, key):
+        return os.path.join(self.directory, key + '.npz'), os.path.join(self.directory, key + '.json')
+
+    def __contains__(self, params):
+        return os.path.exists(self._paths(profileKey(params))[0])
+
+    def get(self, params):
+        """Return the cached data frame for the request parameters or None on a miss."""
+        dataPath, _ = self._paths(profileKey(params))
+        try:
+            with np.load(dataPath, allow_pickle=False) as archive:
+                columns = [str(column) for column in archive['columns']]
+                index = pd.DatetimeIndex(archive['index'].view('datetime64[ns]'))
+                tz = str(archive['tz'])
+                if tz:
+                    index = index.tz_localize('UTC').tz_convert(tz)
+                data = pd.DataFrame({column: archive[f'c{i}'] for i, column in enumerate(columns)}, index=index)
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            return None
+        os.utime(dataPath)  # mark as recently used
+        return data
+
+    def put(self, params, data):
+        """
+        Store a data frame for the request parameters and evict old entries if the cache is too large.
+
+        Entries larger than maxBytes are not stored (with a warning).
+        """
+        key = profileKey(params)
+        dataPath, metaPath = self._paths(key)
+        index = pd.DatetimeIndex(data.index)
+        tz = '' if index.tz is None else str(index.tz)
+        if tz:
+            index = index.tz_convert('UTC').tz_localize(None)
+        arrays = {f'c{i}': np.ascontiguousarray(data[column].to_numpy()) for i, column in enumerate(data.columns)}
+        arrays['columns'] = np.array([str(column) for column in data.columns])
+        arrays['index'] = index.asi8
+        arrays['tz'] = np.array(tz)
+
+        # write to a temporary file first, so readers in other processes never see half written entries
+        handle, tmpPath = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as file:
+            np.savez(file, **arrays)
+        size = os.path.getsize(tmpPath)
+        if size > self.maxBytes:
+            # the entry would be evicted right away (and every later request fetched again)
+            os.remove(tmpPath)
+            warnings.warn(f"PV cache entry of {size} bytes exceeds maxBytes={self.maxBytes}, not cached; "
+                          f"increase maxBytes (AMDO_PV_CACHE_MAXBYTES) to keep it.")
+            return
+        os.replace(tmpPath, dataPath)
+
+        meta = {'key': key, 'bytes': os.path.getsize(dataPath),
+                'params': {name: _normalize(value) for name, value in params.items()}}
+        handle, tmpPath = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(handle, 'w') as file:
+            json.dump(meta, file)
+        os.replace(tmpPath, metaPath)
+
+        self.evict()
+
+    def entries(self):
+        """
+        List all cache entries.
+
+        Returns:
+        - List of dictionaries with 'key', 'params', 'bytes' and 'lastUsed' (mtime), oldest first.
+        """
+        entries = []
+        for fileName in os.listdir(self.directory):
+            if not fileName.endswith('.json'):
+                continue
+            dataPath, metaPath = self._paths(fileName[:-5])
+            try:
+                with open(metaPath) as file:
+                    meta = json.load(file)
+                meta['lastUsed'] = os.path.getmtime(dataPath)
+            except (OSError, ValueError):
+                continue
+            entries.append(meta)
+        entries.sort(key=lambda entry: entry['lastUsed'])
+        return entries
+
+    def findNearby(self, params, tolerance):
+        """
+        Find cached entries of the same request at other coordinates.
+
+        Parameters:
+        - params: Request parameters.
+        - tolerance: Maximal distance in km.
+
+        Returns:
+        - List of (distance in km, entry params) within tolerance, nearest first.
+        """
+        spatial = ('latitude', 'longitude')
+        reference = {name: _normalize(value) for name, value in params.items() if name not in spatial}
+        candidates = [entry['params'] for entry in self.entries()
+                      if {name: value for name, value in entry['params'].items() if name not in spatial} == reference]
+        if not candidates:
+            return []
+        distances = haversineDistance(params['latitude'], params['longitude'],
+                                      [candidate['latitude'] for candidate in candidates],
+                                      [candidate['longitude'] for candidate in candidates])
+        order = np.argsort(distances)
+        return [(float(distances[i]), candidates[i]) for i in order if distances[i] <= tolerance]
+
+    def getNearest(self, params, tolerance):
+        """Return the data frame of the nearest cached site within tolerance (km) or None."""
+        for _, nearbyParams in self.findNearby(params, tolerance):
+            data = self.get(nearbyParams)
+            if data is not None:
+                return data
+        return None
+
+    def getBilinear(self, params, resolution=GRID_RESOLUTION, tolerance=None):
+        """
+        Interpolate bilinearly between the four cached grid points surrounding the coordinates.
+
+        Parameters:
+        - params: Request parameters including 'latitude' and 'longitude'.
+        - resolution: Grid resolution in degrees.
+        - tolerance: Maximal distance of every grid point from the coordinates in km (default: None, no limit).
+
+        Returns:
+        - Interpolated data frame (non-float columns are taken from the nearest grid point) or None if not all
+          four grid points are cached or within tolerance.
+        """
+        latitude, longitude = float(params['latitude']), float(params['longitude'])
+        latitude0 = np.floor(latitude / resolution) * resolution
+        longitude0 = np.floor(longitude / resolution) * resolution
+        u = (latitude - latitude0) / resolution
+        v = (longitude - longitude0) / resolution
+        corners = []
+        for i, j, weight in ((0, 0, (1 - u) * (1 - v)), (1, 0, u * (1 - v)), (0, 1, (1 - u) * v), (1, 1, u * v)):
+            cornerLatitude, cornerLongitude = snapCoordinates(latitude0 + i * resolution,
+                                                              longitude0 + j * resolution, resolution)
+            if tolerance is not None and haversineDistance(latitude, longitude, cornerLatitude,
+                                                           cornerLongitude) > tolerance:
+                return None
+            data = self.get(dict(params, latitude=cornerLatitude, longitude=cornerLongitude))
+            if data is None:
+                return None
+            corners.append((weight, data))
+
+        nearest = max(corners, key=lambda corner: corner[0])[1]
+        result = nearest.copy()
+        for column in result.columns:
+            if np.issubdtype(result[column].dtype, np.floating):
+                result[column] = sum(weight * data[column].to_numpy() for weight, data in corners)
+        return result
+
+    def totalBytes(self):
+        return sum(entry['bytes'] for entry in self.entries())
+
+    def evict(self):
+        """Remove least recently used entries until the total size is below maxBytes."""
+        entries = self.entries()
+        total = sum(entry['bytes'] for entry in entries)
+        for entry in entries:
+            if total <= self.maxBytes:
+                break
+            for path in self._paths(entry['key']):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= entry['bytes']
+
+    def clear(self):
+        for entry in self.entries():
+            for path in self._paths(entry['key']):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def getOrFetch(params, fetch, cache=None, snapResolution=None, reuseTolerance=None, reusePolicy='nearest'):
+    """
+    Look up a request in the cache, reuse data of nearby sites or fetch and store it.
+
+    Parameters:
+    - params: Request parameters including 'latitude' and 'longitude'.
+    - fetch: Callable fetching the data frame for the request parameters (keyword arguments).
+    - cache: PVProfileCache (default: getDefaultCache()), False disables caching.
+    - snapResolution: Snap the coordinates to a grid of this resolution in degrees before the lookup
+      (default: None, no snapping).
+    - reuseTolerance: On a miss, reuse data of cached sites within this distance in km (default: None, no reuse).
+    - reusePolicy: 'nearest' (nearest cached site) or 'bilinear' (interpolation of the four surrounding grid points,
+      all within reuseTolerance, falling back to 'nearest').
+
+    Returns:
+    - Data frame of the request.
+    """
+    if reusePolicy not in ('nearest', 'bilinear'):
+        raise ValueError(f"Unknown reusePolicy '{reusePolicy}', expected 'nearest' or 'bilinear'.")
+    if cache is None:
+        cache = getDefaultCache()
+    if snapResolution:
+        latitude, longitude = snapCoordinates(params['latitude'], params['longitude'], snapResolution)
+        params = dict(params, latitude=latitude, longitude=longitude)
+    if not cache:
+        return fetch(**params)
+
+    data = cache.get(params)
+    if data is None and reuseTolerance:
+        if reusePolicy == 'bilinear':
+            data = cache.getBilinear(params, snapResolution or GRID_RESOLUTION, reuseTolerance)
+        if data is None:
+            data = cache.getNearest(params, reuseTolerance)
+    if data is None:
+        if cache.offline:
+            raise OfflineCacheMiss(f"Request not cached and offline mode is active: {params}")
+        data = fetch(**params)
+        cache.put(params, data)
+    return data
+
+
+_defaultCache = None
+
+
+def getDefaultCache():
+    """
+    Return the process wide cache used by getPVPowerProfile.
+
+    Configured by environment variables:
+    - AMDO_PV_CACHE: cache directory (default: PVCache next to this file).
+    - AMDO_PV_CACHE_MAXBYTES: size bound in bytes (default: 2 GB).
+    - AMDO_PV_OFFLINE: '1'/'true'/'yes' to never contact PVGIS.
+    """
+    global _defaultCache
+    if _defaultCache is None:
+        directory = os.environ.get('AMDO_PV_CACHE', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                 'PVCache'))
+        maxBytes = int(os.environ.get('AMDO_PV_CACHE_MAXBYTES', 2 * 1024 ** 3))
+        offline = os.environ.get('AMDO_PV_OFFLINE', '').lower() in ('1', 'true', 'yes')
+        _defaultCache = PVProfileCache(directory, maxBytes=maxBytes, offline=offline)
+    return _defaultCache
+
+
+def setDefaultCache(cache):
+    """Replace the process wide cache (e.g. PVProfileCache(..., offline=True) for runs without PVGIS)."""
+    global _defaultCache
+    _defaultCache = cache
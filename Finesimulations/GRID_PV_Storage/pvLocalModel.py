@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Local PV model: fetch the horizontal irradiance and weather data once per site and year from PVGIS, then calculate
+plane-of-array irradiance and PV power for any tilt/azimuth without further network calls.
+
+The model follows the PVGIS assumptions as closely as the horizontal components allow:
+    - Hay-Davies transposition of beam and sky diffuse irradiance (pvlib.irradiance.haydavies),
+      isotropic ground reflection with albedo 0.2
+    - Martin-Ruiz angular reflection losses of the beam component (a_r = 0.16)
+    - Faiman module temperature model with the PVGIS coefficients for the mounting place
+    - Huld et al. (2011) power model with the PVGIS coefficients for the PV technology
+    - system losses in percent as in getPVPowerProfile
+PVGIS additionally models spectral effects and uses the Muneer sky model, so the local profile deviates slightly from
+the PVGIS 'P' output. validateAgainstPVGIS checks the deviation of the annual yield against a stated tolerance
+(default: 5 %).
+"""
+
+import numpy as np
+import pandas as pd
+
+from pvCache import getOrFetch
+from solarPosition import solarPosition
+
+# Huld et al. (2011) coefficients k1..k6 as used by PVGIS
+HULD_COEFFICIENTS = {'crystSi': (-0.017237, -0.040465, -0.004702, 0.000149, 0.000170, 0.000005),
+                     'CIS': (-0.005554, -0.038724, -0.003723, -0.000905, -0.001256, 0.000001),
+                     'CdTe': (-0.046689, -0.072844, -0.002262, 0.000276, 0.000159, -0.0000006)}
+HULD_COEFFICIENTS['Unknown'] = HULD_COEFFICIENTS['crystSi']
+
+# Faiman coefficients (u0 in W/(°C m^2), u1 in W s/(°C m^3)) as used by PVGIS
+FAIMAN_COEFFICIENTS = {'free': (26.9, 6.2),
+                       'building': (20.0, 0.0)}
+
+ALBEDO = 0.2
+VALIDATION_TOLERANCE = 0.05  # accepted relative deviation of the annual yield from PVGIS
+
+
+def componentsRequest(latitude=52, longitude=13.5, start=2014, end=2014, usehorizon=True):
+    """Request parameters (cache key and fetchPVGIS arguments) of the horizontal components of a site."""
+    return {'latitude': latitude, 'longitude': longitude, 'start': start, 'end': end,
+            'surface_tilt': 0, 'surface_azimuth': 180, 'usehorizon': usehorizon, 'pvcalculation': False}
+
+
+def getWeatherComponents(latitude=52, longitude=13.5, start=2014, end=2014, usehorizon=True, cache=None,
+                         snapResolution=None, reuseTolerance=None, reusePolicy='nearest'):
+    """
+    Get the horizontal irradiance components and weather data of a site (one PVGIS request per site and years).
+
+    Parameters:
+    - latitude, longitude: Coordinates of the location.
+    - start, end: Start and end year.
+    - usehorizon: Include shading by the local horizon (default: True).
+    - cache: PVProfileCache (default: pvCache.getDefaultCache()), False disables caching.
+    - snapResolution, reuseTolerance, reusePolicy: Spatial reuse of cached sites, see pvCache.getOrFetch.
+
+    Returns:
+    - DataFrame with 'poa_direct' (beam on the horizontal), 'poa_sky_diffuse' (diffuse on the horizontal),
+      'solar_elevation', 'temp_air' and 'wind_speed'.
+    """
+    from getPVPowerprofile import fetchPVGIS
+
+    params = componentsRequest(latitude, longitude, start, end, usehorizon=usehorizon)
+    return getOrFetch(params, fetchPVGIS, cache=cache, snapResolution=snapResolution, reuseTolerance=reuseTolerance,
+                      reusePolicy=reusePolicy)
+
+
+def solarAzimuth(index, latitude, longitude):
+    """Solar azimuth in degrees (north = 0, east = 90) for the timestamps of index."""
+    return solarPosition(index, latitude, longitude)[1]
+
+
+def siteArrays(components, latitude, longitude):
+    """
+    Precompute the orientation independent arrays of a site (solar position, irradiance components, weather).
+
+    Parameters:
+    - components: DataFrame from getWeatherComponents.
+    - latitude, longitude: Coordinates of the location (for the solar azimuth).
+
+    Returns:
+    - Dictionary of 1-D arrays shared by all orientations of the site.
+    """
+    import pvlib
+
+    elevation = components['solar_elevation'].to_numpy(dtype=float)
+    zenith = 90 - elevation
+    beamHorizontal = components['poa_direct'].to_numpy(dtype=float)
+    dhi = components['poa_sky_diffuse'].to_numpy(dtype=float)
+    return {'elevation': elevation,
+            'zenith': zenith,
+            'azimuth': solarAzimuth(components.index, latitude, longitude),
+            'dni': np.where(elevation > 0, beamHorizontal / np.maximum(np.cos(np.radians(zenith)), 0.01745), 0),
+            'dhi': dhi,
+            'ghi': beamHorizontal + dhi,
+            'dniExtra': pvlib.irradiance.get_extra_radiation(components.index).to_numpy(),
+            'temp_air': components['temp_air'].to_numpy(dtype=float),
+            'wind_speed': components['wind_speed'].to_numpy(dtype=float)}
+
+
+def _pvPower(site, surface_tilt, surface_azimuth, loss=10, pvtechchoice='crystSi', mountingplace='free',
+             albedo=ALBEDO):
+    """
+    Vectorized PV model core. surface_tilt and surface_azimuth broadcast against the time axis of the site arrays,
+    i.e. scalars give 1-D results and (N, 1) arrays give (N, T) results.
+
+    Returns:
+    - Tuple (P in W for 1 kWp, poa_direct, poa_sky_diffuse, poa_ground_diffuse).
+    """
+    import pvlib
+
+    aoi = pvlib.irradiance.aoi(surface_tilt, surface_azimuth, site['zenith'], site['azimuth'])
+    poaDirect = np.maximum(site['dni'] * np.cos(np.radians(aoi)), 0)
+    poaSkyDiffuse = pvlib.irradiance.haydavies(surface_tilt, surface_azimuth, site['dhi'], site['dni'],
+                                               site['dniExtra'], site['zenith'], site['azimuth'])
+    poaGroundDiffuse = pvlib.irradiance.get_ground_diffuse(surface_tilt, site['ghi'], albedo=albedo)
+
+    effectiveIrradiance = poaDirect * pvlib.iam.martin_ruiz(aoi, a_r=0.16) + poaSkyDiffuse + poaGroundDiffuse
+    u0, u1 = FAIMAN_COEFFICIENTS[mountingplace]
+    moduleTemperature = pvlib.temperature.faiman(effectiveIrradiance, site['temp_air'], site['wind_speed'],
+                                                 u0=u0, u1=u1)
+    power = huldPower(effectiveIrradiance, moduleTemperature, pvtechchoice) * (1 - loss / 100)
+    return power, poaDirect, poaSkyDiffuse, poaGroundDiffuse
+
+
+def pvPowerFromComponents(components, latitude, longitude, surface_tilt=20, surface_azimuth=180, loss=10,
+                          pvtechchoice='crystSi', mountingplace='free', albedo=ALBEDO):
+    """
+    Calculate plane-of-array irradiance and PV power of 1 kWp from horizontal components.
+
+    Parameters:
+    - components: DataFrame from getWeatherComponents.
+    - latitude, longitude: Coordinates of the location (for the solar azimuth).
+    - surface_tilt, surface_azimuth: Orientation of the PV panels in degrees.
+    - loss: Sum of PV system losses in percent (default: 10).
+    - pvtechchoice: 'crystSi', 'CIS', 'CdTe' or 'Unknown' (default: 'crystSi').
+    - mountingplace: 'free' or 'building' (default: 'free').
+    - albedo: Ground reflectance (default: 0.2).
+
+    Returns:
+    - DataFrame with the index of components and the columns 'P' (W for 1 kWp, as in PVGIS), 'poa_direct',
+      'poa_sky_diffuse', 'poa_ground_diffuse', 'solar_elevation', 'temp_air' and 'wind_speed'.
+    """
+    site = siteArrays(components, latitude, longitude)
+    power, poaDirect, poaSkyDiffuse, poaGroundDiffuse = _pvPower(site, surface_tilt, surface_azimuth, loss=loss,
+                                                                 pvtechchoice=pvtechchoice,
+                                                                 mountingplace=mountingplace, albedo=albedo)
+
+    return pd.DataFrame({'P': power,
+                         'poa_direct': poaDirect,
+                         'poa_sky_diffuse': poaSkyDiffuse,
+                         'poa_ground_diffuse': poaGroundDiffuse,
+                         'solar_elevation': site['elevation'],
+                         'temp_air': site['temp_air'],
+                         'wind_speed': site['wind_speed']},
+                        index=components.index)
+
+
+def getPVPowerProfiles(tilts, azimuths, latitude=52, longitude=13.5, start=2014, end=2014, loss=10,
+                       pvtechchoice='crystSi', mountingplace='free', usehorizon=True, cache=None, chunkSize=256,
+                       snapResolution=None, reuseTolerance=None, reusePolicy='nearest'):
+    """
+    Batch version of getLocalPVPowerProfile for many orientations of one site.
+
+    Solar position and irradiance components are computed once and shared; the orientations are evaluated by
+    broadcasting in blocks of chunkSize designs to bound the size of the intermediate arrays.
+
+    Parameters:
+    - tilts, azimuths: Array-likes of length N with the orientations in degrees (scalars are broadcast).
+    - chunkSize: Number of designs evaluated per vectorized block (default: 256).
+    - Further parameters: see getLocalPVPowerProfile.
+
+    Returns:
+    - C-contiguous float64 array of shape (N, T) with the PV power in kW for 1 kWp (row i belongs to design i).
+    """
+    tilts, azimuths = np.broadcast_arrays(np.atleast_1d(np.asarray(tilts, dtype=float)),
+                                          np.atleast_1d(np.asarray(azimuths, dtype=float)))
+    components = getWeatherComponents(latitude, longitude, start, end, usehorizon=usehorizon, cache=cache,
+                                      snapResolution=snapResolution, reuseTolerance=reuseTolerance,
+                                      reusePolicy=reusePolicy)
+    site = siteArrays(components, latitude, longitude)
+
+    profiles = np.empty((tilts.size, len(components)), dtype=float)
+    for first in range(0, tilts.size, chunkSize):
+        block = slice(first, first + chunkSize)
+        power, _, _, _ = _pvPower(site, tilts[block, np.newaxis], azimuths[block, np.newaxis], loss=loss,
+                                  pvtechchoice=pvtechchoice, mountingplace=mountingplace)
+        profiles[block] = power / 1000  # kW for 1 kWp
+    return profiles
+
+
+def huldPower(effectiveIrradiance, moduleTemperature, pvtechchoice='crystSi'):
+    """
+    DC power in W of 1 kWp according to Huld et al. (2011).
+
+    Parameters:
+    - effectiveIrradiance: Irradiance reaching the cells in W/m^2.
+    - moduleTemperature: Module temperature in °C.
+    - pvtechchoice: PV technology (key of HULD_COEFFICIENTS).
+
+    Returns:
+    - Array of the DC power in W.
+    """
+    k1, k2, k3, k4, k5, k6 = HULD_COEFFICIENTS[pvtechchoice]
+    irradiance = np.asarray(effectiveIrradiance, dtype=float) / 1000
+    temperature = np.asarray(moduleTemperature, dtype=float) - 25
+    logIrradiance = np.log(np.where(irradiance > 0, irradiance, 1))
+    efficiency = (1 + k1 * logIrradiance + k2 * logIrradiance ** 2
+                  + temperature * (k3 + k4 * logIrradiance + k5 * logIrradiance ** 2) + k6 * temperature ** 2)
+    return np.where(irradiance > 0, 1000 * irradiance * np.maximum(efficiency, 0), 0)
+
+
+def getLocalPVPowerProfile(latitude=52, longitude=13.5, start=2014, end=2014, surface_tilt=20, surface_azimuth=180,
+                           loss=10, pvtechchoice='crystSi', mountingplace='free', usehorizon=True, cache=None,
+                           snapResolution=None, reuseTolerance=None, reusePolicy='nearest'):
+    """
+    Drop-in replacement of getPVPowerProfile that calculates the PV output locally.
+
+    Returns:
+    - Tuple (pd.Series of the PV power in kW for 1 kWp, DataFrame as returned by pvPowerFromComponents).
+    """
+    components = getWeatherComponents(latitude, longitude, start, end, usehorizon=usehorizon, cache=cache,
+                                      snapResolution=snapResolution, reuseTolerance=reuseTolerance,
+                                      reusePolicy=reusePolicy)
+    data = pvPowerFromComponents(components, latitude, longitude, surface_tilt=surface_tilt,
+                                 surface_azimuth=surface_azimuth, loss=loss, pvtechchoice=pvtechchoice,
+                                 mountingplace=mountingplace)
+    dataP = data['P'].reset_index(drop=True)
+    return dataP / 1000, data
+
+
+def validateAgainstPVGIS(latitude=52, longitude=13.5, start=2014, end=2014, surface_tilt=20, surface_azimuth=180,
+                         tolerance=VALIDATION_TOLERANCE, cache=None):
+    """
+    Compare the local PV profile with the PVGIS 'P' output (taken from the cache if available).
+
+    Parameters:
+    - tolerance: Accepted relative deviation of the annual yield (default: 0.05).
+
+    Returns:
+    - Dictionary with the annual yields in kWh/kWp, the relative yield deviation, the RMSE of the hourly power
+      normalized by the peak power and 'passed' (relative yield deviation within tolerance).
+    """
+    from getPVPowerprofile import getPVPowerProfile
+
+    profilePVGIS, _ = getPVPowerProfile(latitude, longitude, start, end, surface_tilt=surface_tilt,
+                                        surface_azimuth=surface_azimuth, cache=cache)
+    profileLocal, _ = getLocalPVPowerProfile(latitude, longitude, start, end, surface_tilt=surface_tilt,
+                                             surface_azimuth=surface_azimuth, cache=cache)
+    yieldPVGIS = profilePVGIS.sum()
+    yieldLocal = profileLocal.sum()
+    relativeDeviation = (yieldLocal - yieldPVGIS) / yieldPVGIS
+    nRMSE = np.sqrt(np.mean((profileLocal.to_numpy() - profilePVGIS.to_numpy()) ** 2))  # peak power is 1 kW
+
+    return {'annualYieldPVGIS': yieldPVGIS,
+            'annualYieldLocal': yieldLocal,
+            'relativeDeviation': relativeDeviation,
+            'nRMSE': nRMSE,
+            'tolerance': tolerance,
+            'passed': abs(relativeDeviation) <= tolerance}
+
+
+if __name__ == "__main__":
+    for tilt, azimuth in [(20, 180), (40, 110), (60, 250)]:
+        print(tilt, azimuth, validateAgainstPVGIS(52.5, 13.5, surface_tilt=tilt, surface_azimuth=azimuth))
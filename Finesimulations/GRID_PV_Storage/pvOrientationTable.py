@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Precomputed orientation lookup table of PV profiles.
+
+The PV profiles of one site are computed once on a coarse (tilt, azimuth) grid with the local PV model
+(pvLocalModel.getPVPowerProfiles) and stored as a memory-mapped float32 array of shape (tilts, azimuths, time steps).
+Profiles of arbitrary orientations are then interpolated bilinearly from the four surrounding grid profiles, which
+replaces a PV model evaluation (or PVGIS request) per design with a few array reads.
+
+Usage:
+    table = getOrientationTable(52.5, 13.5, 2014, 2014)
+    profile = table.profile(tilt=37.2, azimuth=151.0)   # kW/kWp
+    print(table.errorReport())
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from pvCache import getDefaultCache, profileKey
+from pvLocalModel import getPVPowerProfiles
+
+# grid covering the design bounds tilt in [1, 85] and azimuth in [90, 270]
+DEFAULT_TILTS = np.arange(0, 91, 5)
+DEFAULT_AZIMUTHS = np.arange(90, 271, 10)
+
+
+class OrientationTable:
+    """
+    Memory-mapped table of PV profiles on a (tilt, azimuth) grid.
+
+    Parameters:
+    - path: Path of the .npy file (the grid is stored in a .json file of the same name).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.splitext(path)[0] + '.json') as file:
+            self.meta = json.load(file)
+        self.tilts = np.asarray(self.meta['tilts'], dtype=float)
+        self.azimuths = np.asarray(self.meta['azimuths'], dtype=float)
+        self.values = np.load(path, mmap_mode='r')
+
+    @classmethod
+    def build(cls, path, latitude=52, longitude=13.5, start=2014, end=2014, tilts=DEFAULT_TILTS,
+              azimuths=DEFAULT_AZIMUTHS, **kwargs):
+        """
+        Compute the profiles of all grid orientations and write the table.
+
+        Parameters:
+        - path: Path of the .npy file.
+        - latitude, longitude, start, end: Site and years.
+        - tilts, azimuths: Ascending grid values in degrees.
+        - **kwargs: Further arguments of pvLocalModel.getPVPowerProfiles (loss, pvtechchoice, ...).
+
+        Returns:
+        - OrientationTable
+        """
+        tilts = np.asarray(tilts, dtype=float)
+        azimuths = np.asarray(azimuths, dtype=float)
+        tiltGrid, azimuthGrid = np.meshgrid(tilts, azimuths, indexing='ij')
+
+        first = getPVPowerProfiles(tiltGrid[0], azimuthGrid[0], latitude=latitude, longitude=longitude, start=start,
+                                   end=end, **kwargs)
+        directory = os.path.dirname(os.path.abspath(path))
+        handle, tmpPath = tempfile.mkstemp(dir=directory, suffix='.npy.tmp')
+        os.close(handle)
+        values = np.lib.format.open_memmap(tmpPath, mode='w+', dtype=np.float32,
+                                           shape=(tilts.size, azimuths.size, first.shape[1]))
+        values[0] = first
+        for i in range(1, tilts.size):
+            values[i] = getPVPowerProfiles(tiltGrid[i], azimuthGrid[i], latitude=latitude, longitude=longitude,
+                                           start=start, end=end, **kwargs)
+        values.flush()
+        del values
+
+        # the grid goes in place before the table: a reader that finds the .npy always finds its .json
+        meta = {'latitude': latitude, 'longitude': longitude, 'start': start, 'end': end,
+                'tilts': tilts.tolist(), 'azimuths': azimuths.tolist(),
+                'options': {name: value for name, value in kwargs.items() if name != 'cache'}}
+        handle, tmpMetaPath = tempfile.mkstemp(dir=directory, suffix='.json.tmp')
+        with os.fdopen(handle, 'w') as file:
+            json.dump(meta, file)
+        os.replace(tmpMetaPath, os.path.splitext(path)[0] + '.json')
+        os.replace(tmpPath, path)
+        return cls(path)
+
+    def _weights(self, grid, values):
+        """Lower grid indices and interpolation weights of values (clipped to the grid bounds)."""
+        values = np.clip(values, grid[0], grid[-1])
+        lower = np.clip(np.searchsorted(grid, values, side='right') - 1, 0, grid.size - 2)
+        weight = (values - grid[lower]) / (grid[lower + 1] - grid[lower])
+        return lower, weight
+
+    def profiles(self, tilts, azimuths):
+        """
+        Interpolate the profiles of several orientations.
+
+        Parameters:
+        - tilts, azimuths: Array-likes of length N (scalars are broadcast).
+
+        Returns:
+        - float32 array of shape (N, T) with the PV power in kW for 1 kWp.
+        """
+        tilts, azimuths = np.broadcast_arrays(np.atleast_1d(np.asarray(tilts, dtype=float)),
+                                              np.atleast_1d(np.asarray(azimuths, dtype=float)))
+        i, u = self._weights(self.tilts, tilts)
+        j, v = self._weights(self.azimuths, azimuths)
+        u = u[:, np.newaxis].astype(np.float32)
+        v = v[:, np.newaxis].astype(np.float32)
+        return ((1 - u) * (1 - v) * self.values[i, j] + u * (1 - v) * self.values[i + 1, j]
+                + (1 - u) * v * self.values[i, j + 1] + u * v * self.values[i + 1, j + 1])
+
+    def profile(self, tilt, azimuth):
+        """Interpolated profile (kW/kWp) of one orientation as a 1-D array."""
+        return self.profiles(tilt, azimuth)[0]
+
+    def errorReport(self, tilts=None, azimuths=None, samples=50, seed=0, **kwargs):
+        """
+        Compare interpolated with exactly computed profiles.
+
+        Parameters:
+        - tilts, azimuths: Orientations to check (default: samples random orientations within the grid).
+        - **kwargs: Further arguments of getPVPowerProfiles, must match the table options.
+
+        Returns:
+        - DataFrame with tilt, azimuth, maximal absolute error and RMSE (kW/kWp) and the relative deviation of the
+          annual yield for each orientation.
+        """
+        if tilts is None or azimuths is None:
+            generator = np.random.default_rng(seed)
+            tilts = generator.uniform(self.tilts[0], self.tilts[-1], samples)
+            azimuths = generator.uniform(self.azimuths[0], self.azimuths[-1], samples)
+        options = dict(self.meta['options'], **kwargs)
+        exact = getPVPowerProfiles(tilts, azimuths, latitude=self.meta['latitude'],
+                                   longitude=self.meta['longitude'], start=self.meta['start'], end=self.meta['end'],
+                                   **options)
+        interpolated = self.profiles(tilts, azimuths)
+        error = interpolated - exact
+        return pd.DataFrame({'tilt': np.broadcast_to(tilts, len(exact)),
+                             'azimuth': np.broadcast_to(azimuths, len(exact)),
+                             'maxAbsError': np.abs(error).max(axis=1),
+                             'RMSE': np.sqrt((error ** 2).mean(axis=1)),
+                             'relativeYieldDeviation': error.sum(axis=1) / exact.sum(axis=1)})
+
+
+def getOrientationTable(latitude=52, longitude=13.5, start=2014, end=2014, tilts=DEFAULT_TILTS,
+                        azimuths=DEFAULT_AZIMUTHS, directory=None, **kwargs):
+    """
+    Load the orientation table of a site or build it if it does not exist yet.
+
+    Parameters:
+    - directory: Directory of the tables (default: 'orientationTables' in the PV profile cache directory).
+    - Further parameters: see OrientationTable.build.
+
+    Returns:
+    - OrientationTable
+    """
+    if directory is None:
+        directory = os.path.join(getDefaultCache().directory, 'orientationTables')
+    os.makedirs(directory, exist_ok=True)
+    key = profileKey({'latitude': latitude, 'longitude': longitude, 'start': start, 'end': end,
+                      'tilts': list(np.asarray(tilts, dtype=float)), 'azimuths': list(np.asarray(azimuths, dtype=float)),
+                      **{name: value for name, value in kwargs.items() if name != 'cache'}})
+    path = os.path.join(directory, key + '.npy')
+    if os.path.exists(path) and os.path.exists(os.path.splitext(path)[0] + '.json'):
+        return OrientationTable(path)
+    return OrientationTable.build(path, latitude, longitude, start, end, tilts=tilts, azimuths=azimuths, **kwargs)
+
+
+if __name__ == "__main__":
+    import time
+
+    table = getOrientationTable(52.5, 13.5, 2014, 2014)
+    started = time.perf_counter()
+    for _ in range(1000):
+        table.profile(37.2, 151.0)
+    print(f"interpolated query: {(time.perf_counter() - started) * 1e3:.1f} µs")
+    print(table.errorReport().describe())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Asynchronous bulk prefetcher for PVGIS requests.
+
+Fills the profile cache ahead of an optimisation run, so that getPVPowerProfile / getWeatherComponents only read from
+disk afterwards. Requests are issued with bounded concurrency and a token-bucket rate limiter below the PVGIS limit of
+30 calls/s per IP address; rate limit answers (HTTP 429), server errors and connection problems are retried with
+exponential backoff.
+
+Usage:
+    requests = [profileRequest(52.5, 13.5, 2014, 2014, surface_tilt=tilt, surface_azimuth=azimuth)
+                for tilt, azimuth in designs]
+    stats = prefetch(requests)
+"""
+
+import asyncio
+import random
+import time
+
+import requests as http
+
+from getPVPowerprofile import fetchPVGIS, profileRequest
+from pvCache import getDefaultCache
+
+PVGIS_RATE_LIMIT = 30  # calls per second and IP address
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter for asyncio tasks.
+
+    Parameters:
+    - rate: Tokens added per second (= sustained requests per second).
+    - capacity: Maximal number of tokens (= burst size, default: rate).
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def _isRetryable(error):
+    """Rate limit, server errors, timeouts and connection problems are retried; invalid requests are not."""
+    if isinstance(error, (http.ConnectionError, http.Timeout)):
+        return True
+    if isinstance(error, http.HTTPError):
+        # pvlib raises HTTPError without response for PVGIS error messages (invalid parameters)
+        response = error.response
+        return response is not None and (response.status_code == 429 or response.status_code >= 500)
+    return False
+
+
+async def _prefetchOne(params, cache, limiter, semaphore, stats, url, maxRetries, baseDelay, maxDelay):
+    if params in cache:
+        stats['cached'] += 1
+        return
+    for attempt in range(maxRetries + 1):
+        async with semaphore:
+            await limiter.acquire()
+            try:
+                data = await asyncio.to_thread(fetchPVGIS, **params, url=url)
+            except Exception as error:
+                if not _isRetryable(error) or attempt == maxRetries:
+                    stats['failed'] += 1
+                    stats['errors'].append((params, repr(error)))
+                    return
+                stats['retries'] += 1
+                delay = min(maxDelay, baseDelay * 2 ** attempt) * (0.5 + random.random())  # jitter
+            else:
+                await asyncio.to_thread(cache.put, params, data)
+                stats['fetched'] += 1
+                return
+        await asyncio.sleep(delay)  # back off outside the semaphore, other requests may proceed
+
+
+async def prefetchAsync(requests, cache=None, rate=25, concurrency=10, url=None, maxRetries=5, baseDelay=0.5,
+                        maxDelay=30):
+    """
+    Fetch all requests that are not cached yet and store them in the cache.
+
+    Parameters:
+    - requests: Iterable of request dictionaries (profileRequest or pvLocalModel.componentsRequest).
+    - cache: PVProfileCache (default: pvCache.getDefaultCache()).
+    - rate: Sustained requests per second (default: 25, below the PVGIS limit of 30).
+    - concurrency: Maximal number of simultaneous requests (default: 10).
+    - url: PVGIS API base url (default: pvlib default, e.g. a pvgisStandIn url for offline tests).
+    - maxRetries: Retries per request (default: 5).
+    - baseDelay, maxDelay: Backoff delay before the first retry and upper bound of the delay in seconds.
+
+    Returns:
+    - Dictionary with the counts 'requested', 'cached', 'fetched', 'retries', 'failed', the list of 'errors'
+      and the wall-clock 'seconds'.
+    """
+    if cache is None:
+        cache = getDefaultCache()
+    if rate > PVGIS_RATE_LIMIT:
+        raise ValueError(f"rate must not exceed the PVGIS limit of {PVGIS_RATE_LIMIT} calls per second.")
+
+    # identical requests are fetched once
+    unique = {}
+    for params in requests:
+        unique.setdefault(tuple(sorted(params.items())), params)
+
+    stats = {'requested': len(unique), 'cached': 0, 'fetched': 0, 'retries': 0, 'failed': 0, 'errors': []}
+    limiter = TokenBucket(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+    await asyncio.gather(*(_prefetchOne(params, cache, limiter, semaphore, stats, url, maxRetries, baseDelay,
+                                        maxDelay)
+                           for params in unique.values()))
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+
+def prefetch(requests, **kwargs):
+    """Blocking wrapper of prefetchAsync (parameters and return value see there)."""
+    return asyncio.run(prefetchAsync(requests, **kwargs))
+
+
+if __name__ == "__main__":
+    # offline throughput and backoff test against the local stand-in server
+    import tempfile
+
+    from pvCache import PVProfileCache
+    from pvgisStandIn import startStandIn
+
+    server, url = startStandIn(failureRate=0.2, latency=0.05)
+    with tempfile.TemporaryDirectory() as directory:
+        testCache = PVProfileCache(directory)
+        designs = [profileRequest(52.5, 13.5, 2014, 2014, surface_tilt=tilt, surface_azimuth=azimuth)
+                   for tilt in range(5, 85, 10) for azimuth in range(90, 271, 30)]
+        stats = prefetch(designs, cache=testCache, url=url, baseDelay=0.1)
+        print(f"fetched {stats['fetched']} of {stats['requested']} profiles in {stats['seconds']:.1f} s "
+              f"({stats['fetched'] / stats['seconds']:.1f} profiles/s), {stats['retries']} retries, "
+              f"{stats['failed']} failed, server saw {server.RequestHandlerClass.requestCount} requests")
+        stats = prefetch(designs, cache=testCache, url=url)
+        print(f"second pass: {stats['cached']} of {stats['requested']} already cached")
+    server.shutdown()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Local HTTP stand-in for the PVGIS 'seriescalc' endpoint.
+
+Answers requests with synthetic clear-sky-like hourly data in the PVGIS JSON format, so that
+pvlib.iotools.get_pvgis_hourly (and thus fetchPVGIS / the prefetcher) can be tested without network access.
+A fraction of the requests can be answered with HTTP 429 (rate limit) or 503 to exercise retries and backoff.
+
+Usage:
+    server, url = startStandIn(failureRate=0.2)
+    fetchPVGIS(52.5, 13.5, 2014, 2014, 20, 180, url=url)
+    server.shutdown()
+"""
+
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _hourlyRecords(latitude, startYear, endYear, tilt, aspect, pvcalculation, loss):
+    """Synthetic hourly records (PVGIS field names, time stamps at HH:10 UTC)."""
+    records = []
+    timestamp = datetime(startYear, 1, 1, 0, 10)
+    last = datetime(endYear, 12, 31, 23, 10)
+    while timestamp <= last:
+        dayOfYear = timestamp.timetuple().tm_yday
+        declination = 23.45 * math.sin(math.radians(360 / 365 * (284 + dayOfYear)))
+        hourAngle = 15 * (timestamp.hour + timestamp.minute / 60 - 12)
+        sinElevation = (math.sin(math.radians(latitude)) * math.sin(math.radians(declination))
+                        + math.cos(math.radians(latitude)) * math.cos(math.radians(declination))
+                        * math.cos(math.radians(hourAngle)))
+        elevation = math.degrees(math.asin(max(-1.0, min(1.0, sinElevation))))
+        beam = max(0.0, 850 * sinElevation) * 0.7
+        diffuse = max(0.0, 120 * sinElevation)
+        # crude orientation factor, PVGIS aspect: 0 = south, -90 = east, 90 = west
+        orientation = max(0.0, math.cos(math.radians(tilt)) + math.sin(math.radians(tilt))
+                          * math.cos(math.radians(hourAngle - aspect)) * 0.5)
+        record = {'time': timestamp.strftime('%Y%m%d:%H%M'),
+                  'Gb(i)': round(beam * orientation, 2),
+                  'Gd(i)': round(diffuse * (1 + math.cos(math.radians(tilt))) / 2, 2),
+                  'Gr(i)': round(0.2 * (beam + diffuse) * (1 - math.cos(math.radians(tilt))) / 2, 2),
+                  'H_sun': round(elevation, 2),
+                  'T2m': round(10 + 10 * math.sin(math.radians(dayOfYear - 100)), 2),
+                  'WS10m': 3.0,
+                  'Int': 0}
+        if pvcalculation:
+            irradiance = record['Gb(i)'] + record['Gd(i)'] + record['Gr(i)']
+            record['P'] = round(irradiance * 0.95 * (1 - loss / 100), 2)
+        records.append(record)
+        timestamp += timedelta(hours=1)
+    return records
+
+
+# descriptions of the inputs and outputs (pvlib.iotools.get_pvgis_hourly returns them as metadata)
+_META = {'inputs': {'location': {'description': 'Selected location', 'variables': {
+                        'latitude': {'description': 'Latitude', 'units': 'decimal degree'},
+                        'longitude': {'description': 'Longitude', 'units': 'decimal degree'},
+                        'elevation': {'description': 'Elevation', 'units': 'm'}}},
+                    'meteo_data': {'description': 'Sources of meteorological data', 'variables': {
+                        'radiation_db': {'description': 'Solar radiation database'},
+                        'year_min': {'description': 'First year of the calculations'},
+                        'year_max': {'description': 'Last year of the calculations'}}},
+                    'mounting_system': {'description': 'Mounting system', 'choices': 'fixed',
+                                        'fields': {'slope': {'description': 'Inclination angle from the horizontal',
+                                                             'units': 'degree'},
+                                                   'azimuth': {'description': 'Orientation (azimuth) angle of the '
+                                                                              '(fixed) PV system (0 = S, 90 = W, '
+                                                                              '-90 = E)', 'units': 'degree'}}},
+                    'pv_module': {'description': 'PV module parameters', 'variables': {
+                        'peak_power': {'description': 'Nominal (peak) power of the PV module', 'units': 'kW'},
+                        'system_loss': {'description': 'Sum of system losses', 'units': '%'}}}},
+         'outputs': {'hourly': {'type': 'time series', 'timestamp': 'hourly averages', 'variables': {
+                        'P': {'description': 'PV system power', 'units': 'W'},
+                        'Gb(i)': {'description': 'Direct irradiance on the inclined plane', 'units': 'W/m2'},
+                        'Gd(i)': {'description': 'Diffuse irradiance on the inclined plane', 'units': 'W/m2'},
+                        'Gr(i)': {'description': 'Reflected irradiance on the inclined plane', 'units': 'W/m2'},
+                        'H_sun': {'description': 'Sun height', 'units': 'degree'},
+                        'T2m': {'description': '2-m air temperature', 'units': 'C'},
+                        'WS10m': {'description': '10-m total wind speed', 'units': 'm/s'},
+                        'Int': {'description': '1 means solar radiation values are reconstructed'}}}},
+         'source': 'AMDO PVGIS stand-in'}
+
+
+def _inputs(query, latitude, startYear, endYear, tilt, aspect, pvcalculation, loss):
+    """'inputs' section of a PVGIS seriescalc response."""
+    inputs = {'location': {'latitude': latitude, 'longitude': float(query.get('lon', 13.5)), 'elevation': 50.0},
+              'meteo_data': {'radiation_db': query.get('raddatabase', 'PVGIS-SARAH2'), 'meteo_db': 'ERA5',
+                             'year_min': startYear, 'year_max': endYear,
+                             'use_horizon': query.get('usehorizon', '1') in ('1', 'True', 'true'),
+                             'horizon_db': 'DEM-calculated'},
+              'mounting_system': {'fixed': {'slope': {'value': tilt, 'optimal': False},
+                                            'azimuth': {'value': aspect, 'optimal': False},
+                                            'type': query.get('mountingplace', 'free')}}}
+    if pvcalculation:
+        inputs['pv_module'] = {'technology': query.get('pvtechchoice', 'crystSi'),
+                               'peak_power': float(query.get('peakpower', 1)), 'system_loss': loss}
+    return inputs
+
+
+class PVGISStandInHandler(BaseHTTPRequestHandler):
+    # configured by startStandIn
+    failureRate = 0.0
+    latency = 0.0
+    requestCount = 0
+    failureCount = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if not parsed.path.endswith('seriescalc'):
+            self.send_error(404)
+            return
+        with self.lock:
+            type(self).requestCount += 1
+            fail = random.random() < self.failureRate
+            if fail:
+                type(self).failureCount += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            # non-JSON body like the PVGIS rate limiter, pvlib then raises requests.HTTPError with the response
+            status = random.choice((429, 503))
+            body = b'Too many requests' if status == 429 else b'Service unavailable'
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        latitude = float(query.get('lat', 52))
+        startYear = int(query.get('startyear', 2014))
+        endYear = int(query.get('endyear', startYear))
+        tilt = float(query.get('angle', 0))
+        aspect = float(query.get('aspect', 0))
+        pvcalculation = query.get('pvcalculation', '0') in ('1', 'True', 'true')
+        loss = float(query.get('loss', 0))
+        response = {'inputs': _inputs(query, latitude, startYear, endYear, tilt, aspect, pvcalculation, loss),
+                    'outputs': {'hourly': _hourlyRecords(latitude, startYear, endYear, tilt, aspect, pvcalculation,
+                                                         loss)},
+                    'meta': _META}
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def startStandIn(port=0, failureRate=0.0, latency=0.0):
+    """
+    Start the stand-in server in a daemon thread.
+
+    Parameters:
+    - port: TCP port (default: 0, any free port).
+    - failureRate: Fraction of requests answered with HTTP 429/503 (default: 0).
+    - latency: Artificial response delay in seconds (default: 0).
+
+    Returns:
+    - Tuple (server, url). url is the API base url for fetchPVGIS(url=...); stop with server.shutdown().
+    """
+    handler = type('ConfiguredStandInHandler', (PVGISStandInHandler,),
+                   {'failureRate': failureRate, 'latency': latency, 'requestCount': 0, 'failureCount': 0,
+                    'lock': threading.Lock()})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/'
+
+
+if __name__ == "__main__":
+    server, url = startStandIn()
+    print(f"PVGIS stand-in listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
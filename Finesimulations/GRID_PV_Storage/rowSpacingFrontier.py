@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Row spacing trade-off explorer: land-use efficiency (areaUsage, η_Fläche) versus annual shading loss.
+
+For a site and a range of tilts, areaUsage and the annual inter-row shading loss are computed over a dense grid of
+moduleRowSpacing and module_width values. The shading loss of every time step comes from
+calculate_shadingTimeSeries and is weighted with the PV output, all designs of one tilt are evaluated in one
+broadcast NumPy pass. The non-dominated designs (maximal areaUsage, minimal loss) form the frontier to which the
+geometry variables of the optimiser can be restricted.
+
+Usage:
+    table = exploreRowSpacing(52.5, 13.5)
+    frontier = paretoFrontier(table)
+"""
+
+import numpy as np
+import pandas as pd
+
+from getPVPowerprofile import calculate_shadingTimeSeries
+from solarPosition import getSolarPosition
+
+
+def exploreRowSpacing(latitude=52.5, longitude=13.5, year=2014, tilts=np.arange(10, 61, 5), surface_azimuth=180,
+                      moduleRowSpacings=np.linspace(0.5, 10, 39), moduleWidths=np.linspace(1.5, 4, 11),
+                      weighting='pv'):
+    """
+    Evaluate areaUsage and annual shading loss on a grid of row geometries.
+
+    Parameters:
+    - latitude, longitude, year: Site and weather year.
+    - tilts: Tilt angles in degrees.
+    - surface_azimuth: Azimuth of the rows in degrees (default: 180).
+    - moduleRowSpacings: Horizontal gaps between the rows in m.
+    - moduleWidths: Module widths in m.
+    - weighting: 'pv' weights the shading loss of every hour with the PV output of the tilt (local PV model,
+      cached weather components), 'geometric' with the sine of the solar elevation (no weather data needed).
+
+    Returns:
+    - DataFrame with one row per (tilt, module_width, moduleRowSpacing) and the columns 'areaUsage',
+      'annualShadingLoss' (fraction of the unshaded annual yield) and 'specificYield' (kWh/kWp after shading,
+      NaN for geometric weighting).
+    """
+    tilts = np.atleast_1d(np.asarray(tilts, dtype=float))
+    widths = np.asarray(moduleWidths, dtype=float)[:, np.newaxis, np.newaxis]
+    spacings = np.asarray(moduleRowSpacings, dtype=float)[np.newaxis, :, np.newaxis]
+
+    position = getSolarPosition(latitude, longitude, year)
+    daylight = position['solar_elevation'].to_numpy() > 0
+    elevation = position['solar_elevation'].to_numpy()[daylight]
+    azimuth = position['solar_azimuth'].to_numpy()[daylight]
+
+    if weighting == 'pv':
+        from pvLocalModel import getPVPowerProfiles
+        profiles = getPVPowerProfiles(tilts, surface_azimuth, latitude=latitude, longitude=longitude, start=year,
+                                      end=year)
+        # PVGIS and the local solar position share the HH:10 time stamps
+        weights = profiles[:, :daylight.size][:, daylight]
+    elif weighting == 'geometric':
+        weights = np.broadcast_to(np.sin(np.radians(elevation)), (tilts.size, elevation.size))
+    else:
+        raise ValueError(f"Unknown weighting '{weighting}', expected 'pv' or 'geometric'.")
+
+    tables = []
+    for tilt, weight in zip(tilts, weights):
+        damping = calculate_shadingTimeSeries(elevation, azimuth, surface_tilt=tilt, surface_azimuth=surface_azimuth,
+                                              module_width=widths, moduleRowSpacing=spacings)
+        annualLoss = (damping @ weight) / weight.sum()
+        areaUsage = widths / (spacings + np.cos(np.radians(tilt)) * widths)
+        widthGrid, spacingGrid = np.broadcast_arrays(widths[..., 0], spacings[..., 0])
+        tables.append(pd.DataFrame({'tilt': tilt,
+                                    'module_width': widthGrid.ravel(),
+                                    'moduleRowSpacing': spacingGrid.ravel(),
+                                    'areaUsage': np.broadcast_to(areaUsage[..., 0], widthGrid.shape).ravel(),
+                                    'annualShadingLoss': annualLoss.ravel(),
+                                    'specificYield': (weight.sum() * (1 - annualLoss)).ravel()
+                                    if weighting == 'pv' else np.nan}))
+    return pd.concat(tables, ignore_index=True)
+
+
+def paretoFrontier(table, maximize='areaUsage', minimize='annualShadingLoss', by=None):
+    """
+    Extract the non-dominated rows (maximal `maximize`, minimal `minimize`).
+
+    Parameters:
+    - table: Result of exploreRowSpacing.
+    - maximize, minimize: Column names of the two objectives.
+    - by: Optional column (e.g. 'tilt') to compute one frontier per group.
+
+    Returns:
+    - DataFrame of the frontier rows, sorted by decreasing `maximize`.
+    """
+    if by is not None:
+        return pd.concat([paretoFrontier(group, maximize, minimize) for _, group in table.groupby(by)],
+                         ignore_index=True)
+    ordered = table.sort_values([maximize, minimize], ascending=[False, True], ignore_index=True)
+    losses = ordered[minimize].to_numpy()
+    # a row is non-dominated if its loss is below the loss of every row with a larger objective value
+    previousMinimum = np.concatenate(([np.inf], np.minimum.accumulate(losses)[:-1]))
+    return ordered[losses < previousMinimum].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    grid = exploreRowSpacing(52.5, 13.5, weighting='geometric')
+    frontier = paretoFrontier(grid)
+    print(f"{len(frontier)} of {len(grid)} geometries are non-dominated")
+    print(frontier.to_string(index=False))
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Scenario batching: several independent energySystemsStats scenarios solved as unconnected locations of one model.
+
+Every energySystemsStats call pays the fixed Python, model build, clustering and solver start-up overhead for a
+small single-location LP. energySystemsStatsBatch packs up to batchSize scenarios (own PV profile, load scaling,
+capacity bounds and costs) into one EnergySystemModel with one location per scenario and without transmission,
+solves once and splits the optimization summaries back into one KPI record per scenario.
+
+Without temporal aggregation the batched LP separates into the scenario LPs, so the KPIs equal those of single
+runs. With aggregation the typical periods are clustered from the time series of all scenarios of a batch and
+differ slightly from the typical periods of a single run. The storage charge rate is defined model wide
+(750 kW / maxCapacityST), so scenarios are batched per maxCapacityST.
+
+Usage:
+    kpis = energySystemsStatsBatch([{'tilt': 20, 'azimuth': 180}, {'tilt': 40, 'azimuth': 110, 'scale_sink': 5}],
+                                   fixCapacityST=5, maxCapacityST=5)
+    python scenarioBatch.py [solver]    # throughput versus batch size, Results/BenchmarkBatch.csv
+"""
+
+import inspect
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from pvLocalModel import getPVPowerProfiles
+from simulationsmodel import (buildEnergySystemModel, energySystemsStats, mergeComponents, preparePVProfile,
+                              summarizeResults, toTimeSteps, variableComponents)
+from timeSeriesStore import getLoadProfile
+
+# arguments of energySystemsStats and their defaults
+DEFAULTS = {name: parameter.default for name, parameter in inspect.signature(energySystemsStats).parameters.items()}
+PV_PARAMETERS = ('tilt', 'azimuth', 'longitude', 'latitude', 'start', 'end', 'module_width', 'moduleRowSpacing',
+                 'pvProfile', 'orientations', 'shading')
+COMPONENT_PARAMETERS = ('relEmissionCosts', 'fixCapacityPV', 'maxCapacityPV', 'investPerCapacityPV',
+                        'fixCapacityST', 'maxCapacityST', 'investPerCapacityST', 'module_width')
+SCENARIO_PARAMETERS = set(PV_PARAMETERS) | set(COMPONENT_PARAMETERS) | {'scale_sink', 'sinkProfile', 'sinkPath'}
+
+
+def completeScenarios(scenarios, common=None):
+    """
+    Check scenario arguments and fill in the defaults of energySystemsStats.
+
+    Args:
+        scenarios (list or pd.DataFrame): One dictionary (or row) of SCENARIO_PARAMETERS per scenario.
+        common (dict, optional): Arguments shared by all scenarios (overridden by the scenarios).
+
+    Returns:
+    - List of dictionaries with all SCENARIO_PARAMETERS (and the DEFAULTS of the other arguments).
+    """
+    if isinstance(scenarios, pd.DataFrame):
+        scenarios = scenarios.to_dict('records')
+    scenarios = [{**(common or {}), **scenario} for scenario in scenarios]
+    unknown = set().union(*scenarios) - SCENARIO_PARAMETERS
+    if unknown:
+        raise ValueError(f"Parameters {sorted(unknown)} cannot be set per scenario, only "
+                         f"{sorted(SCENARIO_PARAMETERS)} (hoursPerTimeStep, timeSeriesAggregation, "
+                         f"numberOfTypicalPeriods and solver are model wide).")
+    return [{**DEFAULTS, **scenario} for scenario in scenarios]
+
+
+def prepareScenario(scenario, location, hoursPerTimeStep=1):
+    """
+    PV profile and variableComponents of one scenario as a location of a multi-location model.
+
+    Args:
+        scenario (dict): All SCENARIO_PARAMETERS (energySystemsStats defaults filled in).
+        location (str): Location name of the scenario.
+        hoursPerTimeStep (float, optional): Length of a time step in hours. Defaults to 1.
+
+    Returns:
+    - Tuple (PV profile in kW/kWp named location, components dictionary of variableComponents).
+    """
+    if scenario['sinkProfile'] is None:
+        sinkProfile = getLoadProfile(scenario['sinkPath'], scenario['scale_sink'])
+    else:
+        sinkProfile = scenario['sinkProfile'] * scenario['scale_sink']
+    sinkProfile = toTimeSteps(sinkProfile, int(round(8760 / hoursPerTimeStep)))
+    dataPVgis, _, _, _ = preparePVProfile(hoursPerTimeStep=hoursPerTimeStep, location=location,
+                                          **{name: scenario[name] for name in PV_PARAMETERS})
+    components = variableComponents(sinkProfile, dataPVgis,
+                                    **{name: scenario[name] for name in COMPONENT_PARAMETERS})
+    return dataPVgis, components
+
+
+def _solveBatch(scenarios, hoursPerTimeStep, timeSeriesAggregation, numberOfTypicalPeriods, solver):
+    """Solve {position: scenario} as one model; returns {position: KPI dictionary}."""
+    locations = {f'scenario{position:04d}': position for position in scenarios}
+    profiles, components = {}, {}
+    for location, position in locations.items():
+        profiles[location], components[location] = prepareScenario(scenarios[position], location, hoursPerTimeStep)
+
+    esM = buildEnergySystemModel(int(round(8760 / hoursPerTimeStep)), hoursPerTimeStep, mergeComponents(components),
+                                 locations=list(locations))
+    if timeSeriesAggregation:
+        esM.aggregateTemporally(numberOfTypicalPeriods=numberOfTypicalPeriods)
+    esM.optimize(timeSeriesAggregation=timeSeriesAggregation, solver=solver)
+
+    return {position: summarizeResults(esM, profiles[location], hoursPerTimeStep, location)[0].iloc[:, 0].to_dict()
+            for location, position in locations.items()}
+
+
+def energySystemsStatsBatch(scenarios, batchSize=16, hoursPerTimeStep=1, timeSeriesAggregation=True,
+                            numberOfTypicalPeriods=7, solver='GLPK', **common):
+    """
+    Evaluate many independent scenarios with one optimization per batch.
+
+    Args:
+        scenarios (list or pd.DataFrame): One dictionary (or row) of energySystemsStats arguments per scenario, e.g.
+            tilt, azimuth, latitude, longitude, scale_sink, capacity bounds, costs or a precomputed pvProfile.
+        batchSize (int, optional): Maximal number of scenarios (locations) per model. Defaults to 16.
+        hoursPerTimeStep, timeSeriesAggregation, numberOfTypicalPeriods, solver: Model wide settings, see
+            energySystemsStats.
+        **common: Arguments of energySystemsStats shared by all scenarios (overridden by the scenarios).
+
+    Returns:
+    - DataFrame with one row of KPIs (as in energySystemsStats 'tableview') per scenario, in the input order.
+    """
+    scenarios = completeScenarios(scenarios, common)
+    groups = {}
+    for position, scenario in enumerate(scenarios):
+        groups.setdefault(scenario['maxCapacityST'], []).append(position)
+
+    records = {}
+    for positions in groups.values():
+        for first in range(0, len(positions), batchSize):
+            batch = {position: scenarios[position] for position in positions[first:first + batchSize]}
+            records.update(_solveBatch(batch, hoursPerTimeStep, timeSeriesAggregation, numberOfTypicalPeriods,
+                                       solver))
+    return pd.DataFrame.from_dict(records, orient='index').sort_index()
+
+
+def benchmarkBatch(batchSizes=(1, 2, 4, 8, 16, 32), numberOfScenarios=32, seed=0, **common):
+    """
+    Throughput of energySystemsStatsBatch versus the batch size for a random population of designs.
+
+    Returns:
+    - DataFrame with the columns 'batchSize', 'seconds' and 'scenariosPerSecond'.
+    """
+    generator = np.random.default_rng(seed)
+    tilts = generator.uniform(1, 85, numberOfScenarios)
+    azimuths = generator.uniform(90, 270, numberOfScenarios)
+    profiles = getPVPowerProfiles(tilts, azimuths)[:, :8760]
+    scenarios = [{'tilt': tilt, 'azimuth': azimuth, 'pvProfile': profile,
+                  'scale_sink': generator.uniform(5, 15), 'maxCapacityPV': generator.uniform(50, 150)}
+                 for tilt, azimuth, profile in zip(tilts, azimuths, profiles)]
+
+    records = []
+    for batchSize in batchSizes:
+        started = time.perf_counter()
+        energySystemsStatsBatch(scenarios, batchSize=batchSize, **common)
+        seconds = time.perf_counter() - started
+        records.append({'batchSize': batchSize, 'seconds': seconds, 'scenariosPerSecond': numberOfScenarios / seconds})
+    return pd.DataFrame(records)
+
+
+if __name__ == "__main__":
+    table = benchmarkBatch(fixCapacityST=5, maxCapacityST=5, solver=sys.argv[1] if len(sys.argv) > 1 else 'GLPK')
+    print(table.to_string(index=False))
+    table.to_csv("Results/BenchmarkBatch.csv", index=False)
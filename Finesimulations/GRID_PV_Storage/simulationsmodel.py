@@ -2,18 +2,45 @@
 # coding: utf-8
 # autor: Klaus Markgraf // Robert Flassig
 
-import FINE as fn
-import matplotlib.pyplot as plt
+import warnings
+
 import pandas as pd
 import numpy as np
-from tabulate import tabulate
-from getPVPowerprofile import getPVPowerProfile, calculate_moduleRowSpacing, plotSolarElevation
+from getPVPowerprofile import getPVPowerProfile, calculate_moduleRowSpacingBatch, leanFrame, dropLeapDays, \
+    compositeProfile, calculate_shadingTimeSeries, orientationWeights
+from pvLocalModel import getPVPowerProfiles, getWeatherComponents
+from solarPosition import getShadingElevations, getSolarPosition
+from modelSnapshot import getOrBuildModel
+from timeSeriesStore import getLoadProfile
+
+# Define Components of EnergySystemModel
+# 1. Define locations of the energy system model
+LOCATIONS = {'location01'}
+# 2. Define commodities and units of commodities
+COMMODITY_UNITS = {'sink_1_commodity': 'kW_el',
+                   'source_1_commodity': 'kW_el',
+                   'source_2_commodity': 'kW_el',
+                   'storage_1_commodity': 'kW_el',
+                   'environment_commodity': 't_CO2e'
+                   }
+# 3. Abbrevieate commodities
+SINK_1 = "sink_1_commodity"  # electricity load demand profile
+SOURCE_1 = "source_1_commodity"  # Grid
+SOURCE_2 = "source_2_commodity"  # PV
+ENVIRONMENT = "environment_commodity"  # CO2 in kg CO2 equivalent
+STORAGE_1 = "storage_1_commodity"  # Storage, track Storage to sink_1
+
+_templates = {}
 
 
 def energySystemsStats(tilt=20, azimuth=180, longitude=13.5, latitude=52.5, maxCapacityPV=100, fixCapacityPV=None,
                          maxCapacityST=100, fixCapacityST=5,
                          start=2014, end=2014, investPerCapacityPV=800, investPerCapacityST=700, relEmissionCosts=50,
-                         scale_sink=1, module_width=1.5, moduleRowSpacing=3):
+                         scale_sink=1, module_width=1.5, moduleRowSpacing=3, pvProfile=None, sinkProfile=None,
+                         exportResults=True, hoursPerTimeStep=1, timeSeriesAggregation=True,
+                         numberOfTypicalPeriods=7, orientations=None, shading='static',
+                         sinkPath='DataForExample/sink_1.xlsx', reuseModel=False,
+                         snapshotDirectory=None, rowSpacing=None, solver='GLPK'):
     """
    Calculates the statistics of an energy system model based on the given parameters.
 
@@ -34,6 +61,39 @@ def energySystemsStats(tilt=20, azimuth=180, longitude=13.5, latitude=52.5, maxC
        scale_sink (int, optional): Scaling factor for the electricity load demand profile. Defaults to 1.
        module_width (float, optional): Width of the PV module in m. Defaults to 1.5m for 1 module row.
        moduleRowSpacing (int, optional): Spacing between the PV module rows in m. Defaults to 3
+       pvProfile (array-like, optional): Precomputed PV power profile in kW/kWp for tilt/azimuth, e.g. a row of
+           pvLocalModel.getPVPowerProfiles. Skips the per-design PVGIS request. Defaults to None.
+       sinkProfile (pd.DataFrame, optional): Unscaled electricity load demand profile. Defaults to None, i.e.
+           sinkPath is read.
+       exportResults (bool, optional): Write the summaries to Results/*.xlsx and *.csv. Defaults to True.
+       hoursPerTimeStep (float, optional): Time resolution of the model, e.g. 0.25 for 15 minutes (35040 time steps).
+           The hourly PV profile is resampled, the load profile is used at its native resolution if it matches
+           (otherwise it is resampled). Defaults to 1.
+       timeSeriesAggregation (bool, optional): Cluster the time series to typical days before the optimization.
+           Defaults to True.
+       numberOfTypicalPeriods (int, optional): Number of typical days of the aggregation. Defaults to 7.
+       orientations (list, optional): Split the PV source into several orientations, given as (tilt, azimuth, weight)
+           tuples, e.g. [(15, 90, 0.5), (15, 270, 0.5)] for an east-west layout. The weights are the shares of the
+           installed capacity (normalized to 1). tilt and azimuth are ignored then. The profiles of the orientations
+           are computed with the local transposition model (getPVPowerprofile.compositeProfile, mode 'local'), as
+           for energySystemsStatsPopulation. Defaults to None.
+       shading (str, optional): 'static' scales the PV profile by the mean damping at 10:00 on 21 December and
+           21 June, 'timeseries' by the inter-row shading of every time step
+           (calculate_shadingTimeSeries, single weather year only: start == end). Defaults to 'static'.
+       sinkPath (str, optional): Path of the load profile if sinkProfile is None. It is read once per process and
+           kept in memory with its scaled variants (timeSeriesStore.getLoadProfile). Defaults to
+           DataForExample/sink_1.xlsx.
+       reuseModel (bool, optional): Update the EnergySystemModel of the previous call in this process instead of
+           building a new one (EnergySystemTemplate). Only the components whose parameters changed are replaced,
+           the results are identical to a fresh build. The returned 'esM' is then shared and modified by the next
+           call. Defaults to False.
+       snapshotDirectory (str, optional): Load the built and aggregated model from a snapshot in this directory
+           (modelSnapshot.getOrBuildModel), or build it and store the snapshot. Ignored with reuseModel.
+           Defaults to None.
+       rowSpacing (dict, optional): Precomputed getPVPowerprofile.calculate_moduleRowSpacingBatch result of this
+           design, as passed by energySystemsStatsPopulation. Defaults to None (computed per call).
+       solver (str, optional): Solver of esM.optimize (Pyomo solver name, e.g. 'GLPK', 'gurobi', 'appsi_highs').
+           Defaults to 'GLPK'.
    Returns:
    - Dictionary containing the following variables:
        - 'df_transposed': Transposed DataFrame for tabular view.
@@ -41,168 +101,430 @@ def energySystemsStats(tilt=20, azimuth=180, longitude=13.5, latitude=52.5, maxC
        - 'convSummary': Conversion summary.
        - 'storSummary': Storage summary.
        - 'esM': Energy system model.
-       - 'data': Original data.
+       - 'data': PV data ('P' and 'solar_elevation' as float32), shared with other evaluations of the same design.
        - 'alignmentPV': PV alignment result.
    """
-    # Define Components of EnergySystemModel
-    # 1. Define locations of the energy system model
-    locations = {'location01'}
-    # 2. Define commodities and units of commodities
-    commodities = {'sink_1_commodity',
-                   'source_1_commodity',
-                   'source_2_commodity',
-                   'storage_1_commodity',
-                   'environment_commodity'
-                   }
-    commodityUnitDict = {'sink_1_commodity': 'kW_el',
-                         'source_1_commodity': 'kW_el',
-                         'source_2_commodity': 'kW_el',
-                         'storage_1_commodity': 'kW_el',
-                         'environment_commodity': 't_CO2e'
-                         }
-    # 3. Abbrevieate commodities
-    sink_1 = "sink_1_commodity"  # electricity load demand profile
-    source_1 = "source_1_commodity"  # Grid
-    source_2 = "source_2_commodity"  # PV
-    environment = "environment_commodity"  # CO2 in kg CO2 equivalent
-    storage_1 = "storage_1_commodity"  # Storage, track Storage to sink_1
+    if sinkProfile is None:
+        sinkProfile = getLoadProfile(sinkPath, scale_sink)
+    else:
+        sinkProfile = sinkProfile * scale_sink
+    numberOfTimeSteps = int(round(8760 / hoursPerTimeStep))
+    sinkProfile = toTimeSteps(sinkProfile, numberOfTimeSteps)
+
+    dataPVgis, data, alignmentPVlow, alignmentPVHigh = preparePVProfile(
+        tilt=tilt, azimuth=azimuth, longitude=longitude, latitude=latitude, start=start, end=end,
+        module_width=module_width, moduleRowSpacing=moduleRowSpacing, pvProfile=pvProfile,
+        hoursPerTimeStep=hoursPerTimeStep, orientations=orientations, shading=shading, rowSpacing=rowSpacing)
+
+    components = variableComponents(sinkProfile, dataPVgis, relEmissionCosts=relEmissionCosts,
+                                    fixCapacityPV=fixCapacityPV, maxCapacityPV=maxCapacityPV,
+                                    investPerCapacityPV=investPerCapacityPV, fixCapacityST=fixCapacityST,
+                                    maxCapacityST=maxCapacityST, investPerCapacityST=investPerCapacityST,
+                                    module_width=module_width)
+    if reuseModel:
+        template = _templates.get((numberOfTimeSteps, hoursPerTimeStep))
+        if template is None:
+            template = _templates[(numberOfTimeSteps, hoursPerTimeStep)] = EnergySystemTemplate(numberOfTimeSteps,
+                                                                                                hoursPerTimeStep)
+        esM = template.apply(components)
+        aggregated = False
+    elif snapshotDirectory is not None:
+        esM = getOrBuildModel(lambda: buildEnergySystemModel(numberOfTimeSteps, hoursPerTimeStep, components),
+                              # the fixed structure (grid, spot market, conversions, storage constants) is hashed
+                              # through the source of the building functions
+                              inputs=(numberOfTimeSteps, hoursPerTimeStep, COMMODITY_UNITS, components,
+                                      buildEnergySystemModel, _createModel),
+                              numberOfTypicalPeriods=numberOfTypicalPeriods if timeSeriesAggregation else None,
+                              directory=snapshotDirectory)
+        aggregated = timeSeriesAggregation
+    else:
+        esM = buildEnergySystemModel(numberOfTimeSteps, hoursPerTimeStep, components)
+        aggregated = False
+
+    ##Generate Results
+    # 5. Optimize the energy system model
+    # prepare optimization by aggregating time series data
+    # Temporally cluster the time series data of all components
+    # considered in the EnergySystemModel instance and then stores
+    # the clustered data in the respective components. For this, the time series data
+    # is broken down into an ordered sequence of periods (e.g. 365 days) and
+    # to each period a typical period (e.g. 7 typical days with 24 hours) is assigned.
+    if timeSeriesAggregation and not aggregated:
+        esM.aggregateTemporally(numberOfTypicalPeriods=numberOfTypicalPeriods)
+    # set optimizer and solver (GLPK, CPLEX, GUROBI)
+    esM.optimize(timeSeriesAggregation=timeSeriesAggregation, solver=solver)
+
+    tableviewTransposed, srcSnkSummary, convSummary, storSummary = summarizeResults(esM, dataPVgis,
+                                                                                   hoursPerTimeStep)
+
+    if exportResults:
+        ## Export results to Excel
+        [esM.getOptimizationSummary("SourceSinkModel", outputLevel=1).to_excel("Results/SourceSinkModel.xlsx"), ]
+        [esM.getOptimizationSummary("StorageModel", outputLevel=1).to_excel("Results/StorageModel.xlsx"), ]
+        [esM.getOptimizationSummary("ConversionModel", outputLevel=1).to_excel("Results/ConversionModel.xlsx"), ]
+        tableviewTransposed.to_excel("Results/Summary.xlsx")
+
+        ## Export results to CSV
+        esM.getOptimizationSummary("SourceSinkModel", outputLevel=1).to_csv("Results/SourceSinkModel.csv", )
+        esM.getOptimizationSummary("StorageModel", outputLevel=1).to_csv("Results/StorageModel.csv", )
+        esM.getOptimizationSummary("ConversionModel", outputLevel=1).to_csv("Results/ConversionModel.csv", )
+        tableviewTransposed.to_csv("Results/Summary.csv", )
+
+    # Create a dictionary to store the results
+    results = {
+        'tableview': tableviewTransposed,
+        'srcSnkSummary': srcSnkSummary,
+        'convSummary': convSummary,
+        'storSummary': storSummary,
+        'esM': esM,
+        'data': data,
+        'alignmentPVlow': alignmentPVlow,  # list with one entry per orientation group if orientations is given. Store areaUsage as alignmentPV for demonstration purposes
+        'alignmentPVHigh': alignmentPVHigh  # Store areaUsage as alignmentPV for demonstration purposes
+    }
+
+    return results
+
+
+def preparePVProfile(tilt=20, azimuth=180, longitude=13.5, latitude=52.5, start=2014, end=2014, module_width=1.5,
+                     moduleRowSpacing=3, pvProfile=None, hoursPerTimeStep=1, orientations=None, shading='static',
+                     location='location01', rowSpacing=None):
+    """
+    PV profile of energySystemsStats: PVGIS (or precomputed) profile, leap days removed, resampled to the model
+    time steps and corrected for the inter-row shading.
+
+    Args:
+        location (str, optional): Name of the returned profile (location of the model). Defaults to 'location01'.
+        rowSpacing (dict, optional): calculate_moduleRowSpacingBatch result of this design (one entry per
+            orientation group), e.g. computed for a whole population at once. Defaults to None (computed here).
+        Further arguments: See energySystemsStats.
+
+    Returns:
+    - Tuple (PV profile in kW/kWp as pd.Series, PV data, alignmentPVlow, alignmentPVHigh).
+    """
+    if shading == 'timeseries' and start != end:
+        # the solar positions (and the model) cover one year; several weather years: ensembleEvaluation
+        raise ValueError(f"shading='timeseries' needs a single weather year (start == end), got {start}..{end}; "
+                         f"evaluate several years with ensembleEvaluation.energySystemsStatsEnsemble.")
+    # load PV data
+    # dataPV = pd.read_excel("DataForExample/PV_1.xlsx")
+    if orientations is not None:
+        # local transposition of the cached site weather, as in energySystemsStatsPopulation (no PVGIS request per
+        # orientation)
+        dataPVgis, data = compositeProfile(orientations, latitude, longitude, start, end, mode='local')
+    elif pvProfile is None:
+        dataPVgis, data = getPVPowerProfile(latitude, longitude, start, end, surface_tilt=tilt,
+                                               surface_azimuth=azimuth, columns=['P', 'solar_elevation'],
+                                               dtype=np.float32)
+    else:
+        # orientation independent site data (solar elevation for the shading calculation)
+        data = leanFrame(getWeatherComponents(latitude, longitude, start, end), ['solar_elevation'], np.float32)
+        dataPVgis = pd.Series(np.asarray(pvProfile, dtype=float))
+    # leap years: the load profile and the model have 8760 hourly time steps
+    dataPVgis, data = dropLeapDays(dataPVgis, data)
+    dataPVgis = toTimeSteps(dataPVgis, int(round(8760 / hoursPerTimeStep)))
+    dataPVgis.rename(location, inplace=True)
+
+    # Row spacing of all orientation groups in one pass, solar elevation at 10:00 on December 21st and June 21st
+    # (local calculation, cached per site and year)
+    groups = [(tilt, azimuth, 1.0)] if orientations is None else orientations
+    if rowSpacing is None:
+        rowSpacing = calculate_moduleRowSpacingBatch(*getShadingElevations(latitude, longitude, start),
+                                                     surface_tilt=[groupTilt for groupTilt, _, _ in groups],
+                                                     module_width=module_width, moduleRowSpacing=moduleRowSpacing)
+    rowSpacing = {key: np.broadcast_to(value, len(groups)) for key, value in rowSpacing.items()}
+    alignmentPVlow, alignmentPVHigh = ([{'elevationAngleTime': rowSpacing['elevation' + day][group],
+                                         'moduleRowSpacingL': moduleRowSpacing,
+                                         'areaUsage': rowSpacing['areaUsage'][group],
+                                         'damping': rowSpacing['damping' + day][group]}
+                                        for group in range(len(groups))] for day in ('Low', 'High'))
+    # capacity weighted shading of the orientation groups
+    weights = orientationWeights(groups)
+    dampingLow = weights @ rowSpacing['dampingLow']
+    dampingHigh = weights @ rowSpacing['dampingHigh']
+    if orientations is None:
+        alignmentPVlow, alignmentPVHigh = alignmentPVlow[0], alignmentPVHigh[0]
+
+    if shading == 'static':
+        dataPVgis = dataPVgis * (1 - (dampingLow+ dampingHigh) / 2) # correct for power damping due to shading
+    elif shading == 'timeseries':
+        stepMinutes = int(round(hoursPerTimeStep * 60))
+        position = getSolarPosition(latitude, longitude, start, freq=f'{stepMinutes}min',
+                                    minuteOffset=10 if stepMinutes == 60 else stepMinutes // 2)
+        position = position[~((position.index.month == 2) & (position.index.day == 29))]
+        dampingSeries = sum(weight * calculate_shadingTimeSeries(position['solar_elevation'].to_numpy(),
+                                                                 position['solar_azimuth'].to_numpy(),
+                                                                 surface_tilt=groupTilt,
+                                                                 surface_azimuth=groupAzimuth,
+                                                                 module_width=module_width,
+                                                                 moduleRowSpacing=moduleRowSpacing)
+                            for (groupTilt, groupAzimuth, _), weight in zip(groups, weights))
+        dataPVgis = dataPVgis * (1 - dampingSeries) # correct for power damping due to shading per time step
+    else:
+        raise ValueError(f"Unknown shading '{shading}', expected 'static' or 'timeseries'.")
+
+
+    return dataPVgis, data, alignmentPVlow, alignmentPVHigh
+
+
+def _createModel(numberOfTimeSteps, hoursPerTimeStep, locations=LOCATIONS):
+    import FINE as fn
 
     # 4. Define the energy system model instance
-    esM = fn.EnergySystemModel(locations=locations,
-                               commodities=commodities,
-                               numberOfTimeSteps=8760,
-                               commodityUnitsDict=commodityUnitDict,
-                               hoursPerTimeStep=1,
-                               costUnit='1e Euro',
-                               lengthUnit='km',
-                               verboseLogLevel=0)
+    return fn.EnergySystemModel(locations=set(locations),
+                                commodities=set(COMMODITY_UNITS),
+                                numberOfTimeSteps=numberOfTimeSteps,
+                                commodityUnitsDict=COMMODITY_UNITS,
+                                hoursPerTimeStep=hoursPerTimeStep,
+                                costUnit='1e Euro',
+                                lengthUnit='km',
+                                verboseLogLevel=0)
+
+
+def _addLoad(esM, operationRateFix):
+    import FINE as fn
 
-    ## Add Sinks
     # sink_1 Electricity load demand profile
     esM.add(fn.Sink(esM=esM,
                     name='sink_1',
-                    commodity=sink_1,
+                    commodity=SINK_1,
                     hasCapacityVariable=False,
-                    operationRateFix=pd.read_excel("DataForExample/sink_1.xlsx") * scale_sink,
+                    operationRateFix=operationRateFix,
                     ),
             )
 
-    # environment
-    relEmissionCosts = relEmissionCosts  # 50 Euro pro t CO2
+
+def _addEnvironment(esM, opexPerOperation):
+    import FINE as fn
+
+    # environment, opexPerOperation: relEmissionCosts (50 Euro pro t CO2)
     esM.add(fn.Sink(esM=esM,
                     name='environment',
-                    commodity=environment,
+                    commodity=ENVIRONMENT,
                     hasCapacityVariable=False,
-                    opexPerOperation=relEmissionCosts
+                    opexPerOperation=opexPerOperation
                     ),
             )
-    # spot market
 
-    esM.add(fn.Sink(esM=esM,
-                    name='spot',
-                    commodity=source_2,
-                    hasCapacityVariable=False,
-                    commodityRevenue=0.05
-                    ),
-            )
-    ## Add sources
-    # source_1 as Grid
-    esM.add(fn.Source(esM=esM,
-                      name='GRID',
-                      commodity=source_1,
-                      hasCapacityVariable=False,
-                      commodityCost=0.35
-                      )
-            )
-    # source_2 as PV
-    # load PV data
-    # dataPV = pd.read_excel("DataForExample/PV_1.xlsx")
-    dataPVgis, data = getPVPowerProfile(latitude, longitude, start, end, surface_tilt=tilt,
-                                           surface_azimuth=azimuth)
-    dataPVgis.rename("location01", inplace=True)
-
-    # Filter for December 21st
-    december_21_data = data[(data.index.month == 12) & (data.index.day == 21)]
-
-    # Filter for June 21st
-    june_21_data = data[(data.index.month == 6) & (data.index.day == 21)]
-
-    alignmentPVlow = calculate_moduleRowSpacing(december_21_data, module_width=module_width,
-                                                  moduleRowSpacing=moduleRowSpacing,surface_tilt=tilt)
-    alignmentPVHigh = calculate_moduleRowSpacing(june_21_data, module_width=module_width,
-                                                   moduleRowSpacing=moduleRowSpacing,surface_tilt=tilt)
-    dampingLow = alignmentPVlow["damping"]
-    dampingHigh = alignmentPVHigh["damping"]
 
-    dataPVgis = dataPVgis * (1 - (dampingLow+ dampingHigh) / 2) # correct for power damping due to shading
+def _addPV(esM, operationRateMax, capacityFix, capacityMax, investPerCapacity):
+    import FINE as fn
 
+    # source_2 as PV
     esM.add(fn.Source(esM=esM,
                       name='PV',
-                      commodity=source_2,
+                      commodity=SOURCE_2,
                       hasCapacityVariable=True,
-                      capacityFix=fixCapacityPV * module_width / 1.5,  # note: 1 kWp = 1.5m rowminimal capacity to be installed
-                      capacityMax=maxCapacityPV * module_width / 1.5,  # maximal possible capacity
-                      operationRateMax=dataPVgis,
-                      investPerCapacity=investPerCapacityPV,
-                      opexPerCapacity=investPerCapacityPV * 0.015,
+                      capacityFix=capacityFix,
+                      capacityMax=capacityMax,  # maximal possible capacity
+                      operationRateMax=operationRateMax,
+                      investPerCapacity=investPerCapacity,
+                      opexPerCapacity=investPerCapacity * 0.015,
                       interestRate=0.05,
                       economicLifetime=25))
 
-    ## Add storages
+
+def _addStorage(esM, capacityFix, capacityMax, investPerCapacity):
+    import FINE as fn
+
     # storage_1
     esM.add(fn.Storage(esM=esM,
                        name='STORAGE',
-                       commodity=storage_1,
+                       commodity=STORAGE_1,
                        hasCapacityVariable=True,
-                       capacityFix=fixCapacityST,  # minimal capacity to be installed
-                       capacityMax=maxCapacityST,  # maximal possible capacity
+                       capacityFix=capacityFix,  # minimal capacity to be installed
+                       capacityMax=capacityMax,  # maximal possible capacity
                        chargeEfficiency=0.95,  # Verhältnis von eingehender commodity zu gespeicherter commodity
                        dischargeEfficiency=0.95,  # Verhältnis von gespeicherter commodity zu ausgehender commodity
-                       chargeRate=750 / maxCapacityST,  # 750 kW Ladeleistung bezogen auf max. Kapazität
-                       dischargeRate=750 / maxCapacityST,  # 750 kW Entladeleistung bezogen auf max. Kapazität
+                       # chargeRate is model wide: the (equal) capacityMax of all locations
+                       chargeRate=750 / np.max(capacityMax),  # 750 kW Ladeleistung bezogen auf max. Kapazität
+                       dischargeRate=750 / np.max(capacityMax),  # 750 kW Entladeleistung bezogen auf max. Kapazität
                        selfDischarge=0.00003,  # Selbstentladung pro h (entspricht 0,5 %/Woche)
                        cyclicLifetime=7000,  # maximale Ladezyklen
                        stateOfChargeMin=0.1,  # min. Entladetiefe = 10%
-                       investPerCapacity=investPerCapacityST,  # Investitionskosten pro Kapazität
-                       opexPerCapacity=investPerCapacityST * 0.005,
+                       investPerCapacity=investPerCapacity,  # Investitionskosten pro Kapazität
+                       opexPerCapacity=investPerCapacity * 0.005,
                        # sehr geringe bis keine Betriebskosten por Kapazität
                        economicLifetime=20,  # Lebenszeit
                        interestRate=0.08))
 
+
+def variableComponents(sinkProfile, dataPVgis, relEmissionCosts=50, fixCapacityPV=None, maxCapacityPV=100,
+                       investPerCapacityPV=800, fixCapacityST=5, maxCapacityST=100, investPerCapacityST=700,
+                       module_width=1.5):
+    """
+    Parameters of the components that differ between the designs of energySystemsStats.
+
+    Args:
+        sinkProfile (pd.DataFrame): Scaled load profile with the model time steps.
+        dataPVgis (pd.Series): PV profile in kW/kWp after shading, named after the location.
+        Further arguments: See energySystemsStats.
+
+    Returns:
+    - Dictionary component name -> (function adding the component, keyword arguments), in the order of the model.
+    """
+    return {'sink_1': (_addLoad, {'operationRateFix': sinkProfile}),
+            'environment': (_addEnvironment, {'opexPerOperation': relEmissionCosts}),
+            # note: 1 kWp = 1.5m rowminimal capacity to be installed
+            'PV': (_addPV, {'operationRateMax': dataPVgis,
+                            'capacityFix': None if fixCapacityPV is None else fixCapacityPV * module_width / 1.5,
+                            'capacityMax': maxCapacityPV * module_width / 1.5,
+                            'investPerCapacity': investPerCapacityPV}),
+            'STORAGE': (_addStorage, {'capacityFix': fixCapacityST,
+                                      'capacityMax': maxCapacityST,
+                                      'investPerCapacity': investPerCapacityST})}
+
+
+def buildEnergySystemModel(numberOfTimeSteps, hoursPerTimeStep, components, locations=LOCATIONS):
+    """
+    Build the EnergySystemModel of energySystemsStats.
+
+    Args:
+        numberOfTimeSteps (int): Number of time steps of one year.
+        hoursPerTimeStep (float): Length of a time step in hours.
+        components (dict): Result of variableComponents (or of mergeComponents for several locations).
+        locations (iterable, optional): Locations of the model. Defaults to {'location01'}.
+
+    Returns:
+    - fn.EnergySystemModel (not yet aggregated or optimized).
+    """
+    import FINE as fn
+
+    esM = _createModel(numberOfTimeSteps, hoursPerTimeStep, locations)
+    ## Add Sinks
+    for name in ('sink_1', 'environment'):
+        add, kwargs = components[name]
+        add(esM, **kwargs)
+    # spot market
+    esM.add(fn.Sink(esM=esM,
+                    name='spot',
+                    commodity=SOURCE_2,
+                    hasCapacityVariable=False,
+                    commodityRevenue=0.05
+                    ),
+            )
+    ## Add sources
+    # source_1 as Grid
+    esM.add(fn.Source(esM=esM,
+                      name='GRID',
+                      commodity=SOURCE_1,
+                      hasCapacityVariable=False,
+                      commodityCost=0.35
+                      )
+            )
+    ## Add PV and storages
+    for name in ('PV', 'STORAGE'):
+        add, kwargs = components[name]
+        add(esM, **kwargs)
+
     ##Add Conversions
     # conversion_source_1
     esM.add(fn.Conversion(esM=esM,
                           name='conversion_1',
                           physicalUnit='kW_el',
-                          commodityConversionFactors={source_1: -1, sink_1: 1, environment: 0.3},
+                          commodityConversionFactors={SOURCE_1: -1, SINK_1: 1, ENVIRONMENT: 0.3},
                           hasCapacityVariable=False))
 
     # conversion source_2 to storage
     esM.add(fn.Conversion(esM=esM,
                           name='conversion_2',
                           physicalUnit='kW_el',
-                          commodityConversionFactors={source_2: -1, storage_1: 1, environment: 0.01},
+                          commodityConversionFactors={SOURCE_2: -1, STORAGE_1: 1, ENVIRONMENT: 0.01},
                           hasCapacityVariable=False))
 
     # conversion storage to sink_1
     esM.add(fn.Conversion(esM=esM,
                           name='conversion_3',
                           physicalUnit='kW_el',
-                          commodityConversionFactors={storage_1: -1, sink_1: 1, environment: 0.02},
+                          commodityConversionFactors={STORAGE_1: -1, SINK_1: 1, ENVIRONMENT: 0.02},
                           hasCapacityVariable=False))
+    return esM
 
-    ##Generate Results
-    # 5. Optimize the energy system model
-    # prepare optimization by aggregating time series data
-    # Temporally cluster the time series data of all components
-    # considered in the EnergySystemModel instance and then stores
-    # the clustered data in the respective components. For this, the time series data
-    # is broken down into an ordered sequence of periods (e.g. 365 days) and
-    # to each period a typical period (e.g. 7 typical days with 24 hours) is assigned.
-    esM.aggregateTemporally(numberOfTypicalPeriods=7)
-    # set optimizer and solver (GLPK, CPLEX, GUROBI)
-    esM.optimize(timeSeriesAggregation=True, solver='GLPK')
 
+def mergeComponents(componentsByLocation):
+    """
+    Combine the variableComponents of several independent locations into the arguments of one model.
+
+    Profiles become DataFrames with one column per location, scalars location indexed Series.
+
+    Args:
+        componentsByLocation (dict): Location name -> result of variableComponents.
+
+    Returns:
+    - Components dictionary for buildEnergySystemModel(..., locations=componentsByLocation.keys()).
+    """
+    locations = list(componentsByLocation)
+    merged = {}
+    for name, (add, kwargs) in componentsByLocation[locations[0]].items():
+        mergedKwargs = {}
+        for key, first in kwargs.items():
+            values = [componentsByLocation[location][name][1][key] for location in locations]
+            if isinstance(first, (pd.Series, pd.DataFrame)):
+                mergedKwargs[key] = pd.DataFrame({location: np.asarray(value, dtype=float).ravel()
+                                                  for location, value in zip(locations, values)})
+            elif all(value is None for value in values):
+                mergedKwargs[key] = None
+            elif any(value is None for value in values):
+                raise ValueError(f"{name} {key} must be given for all locations or for none.")
+            else:
+                mergedKwargs[key] = pd.Series(values, index=locations, dtype=float)
+        merged[name] = (add, mergedKwargs)
+    return merged
+
+
+def _sameArguments(kwargs, previous):
+    # profiles are compared by identity (memoized load profiles), scalars by value
+    return all(value is previous[key] or (np.ndim(value) == 0 and value == previous[key])
+               for key, value in kwargs.items())
+
+
+class EnergySystemTemplate:
+    """
+    EnergySystemModel of energySystemsStats that is built once and updated in place.
+
+    Between the evaluations of an optimisation only the PV profile, the capacity bounds and a few cost parameters
+    change. apply() builds the model on the first call; afterwards it re-adds only the components of
+    variableComponents whose arguments changed. FINE replaces a component of the same name in place, so the
+    component order and therefore the optimisation problem are identical to buildEnergySystemModel.
+    """
+
+    def __init__(self, numberOfTimeSteps, hoursPerTimeStep=1):
+        self.numberOfTimeSteps = numberOfTimeSteps
+        self.hoursPerTimeStep = hoursPerTimeStep
+        self.esM = None
+        self._applied = {}
+
+    def apply(self, components):
+        """
+        Bring the model to the parameters of components (result of variableComponents).
+
+        Returns:
+        - The updated fn.EnergySystemModel (the same object on every call).
+        """
+        if self.esM is None:
+            self.esM = buildEnergySystemModel(self.numberOfTimeSteps, self.hoursPerTimeStep, components)
+        else:
+            with warnings.catch_warnings():
+                warnings.filterwarnings('ignore', message='.*already exists.*')
+                for name, (add, kwargs) in components.items():
+                    if not _sameArguments(kwargs, self._applied[name]):
+                        add(self.esM, **kwargs)
+        self._applied = {name: kwargs for name, (_, kwargs) in components.items()}
+        return self.esM
+
+
+def summarizeResults(esM, dataPVgis, hoursPerTimeStep=1, location='location01'):
+    """
+    Key performance indicators of an optimized energySystemsStats model.
+
+    Args:
+        esM (fn.EnergySystemModel): Optimized model.
+        dataPVgis (pd.Series): PV profile of location in kW/kWp.
+        hoursPerTimeStep (float, optional): Length of a time step in hours. Defaults to 1.
+        location (str, optional): Location of the KPIs. Defaults to 'location01'.
+
+    Returns:
+    - Tuple (tableview with one column of KPIs, srcSnkSummary, convSummary, storSummary).
+    """
     ## Get the optimization summary
     # 6. Results
     ## Prepare results for export
@@ -213,35 +535,35 @@ def energySystemsStats(tilt=20, azimuth=180, longitude=13.5, latitude=52.5, maxC
     # storage summary
     storSummary = esM.getOptimizationSummary("StorageModel", outputLevel=1)
     # extract optimal capacity of PV source
-    capacityPVOptimum = srcSnkSummary['location01'].loc[('PV', 'capacity', '[kW_el]')]
+    capacityPVOptimum = srcSnkSummary[location].loc[('PV', 'capacity', '[kW_el]')]
     # extract optimal capacity of storage
-    capacityStorageOptimum = storSummary['location01'].loc[('STORAGE', 'capacity', '[kW_el*h]')]
+    capacityStorageOptimum = storSummary[location].loc[('STORAGE', 'capacity', '[kW_el*h]')]
 
     # calculate maximal output of optimal PV source
     operationRateMaxPV = dataPVgis * capacityPVOptimum
 
     # actual total operation, charge and discharge
-    operationTotOptimumGrid = srcSnkSummary['location01'].loc[('GRID', 'operation', '[kW_el*h/a]')]
-    operationTotOptimumPV = srcSnkSummary['location01'].loc[('PV', 'operation', '[kW_el*h/a]')]
-    operationTotOptimumStorageCharge = storSummary['location01'].loc[('STORAGE', 'operationCharge', '[kW_el*h/a]')]
-    operationTotOptimumStorageDischarge = storSummary['location01'].loc[
+    operationTotOptimumGrid = srcSnkSummary[location].loc[('GRID', 'operation', '[kW_el*h/a]')]
+    operationTotOptimumPV = srcSnkSummary[location].loc[('PV', 'operation', '[kW_el*h/a]')]
+    operationTotOptimumStorageCharge = storSummary[location].loc[('STORAGE', 'operationCharge', '[kW_el*h/a]')]
+    operationTotOptimumStorageDischarge = storSummary[location].loc[
         ('STORAGE', 'operationDischarge', '[kW_el*h/a]')]
-    operationTotCO2 = srcSnkSummary['location01'].loc[('environment', 'operation', '[t_CO2e*h/a]')]
-    operationTotSink = srcSnkSummary['location01'].loc[('sink_1', 'operation', '[kW_el*h/a]')]
+    operationTotCO2 = srcSnkSummary[location].loc[('environment', 'operation', '[t_CO2e*h/a]')]
+    operationTotSink = srcSnkSummary[location].loc[('sink_1', 'operation', '[kW_el*h/a]')]
     # calculate selfconsumption and selfsufficiency
     selfconsumption = (
                               operationTotOptimumPV - operationTotOptimumStorageCharge + operationTotOptimumStorageDischarge) / (
-                          operationRateMaxPV.cumsum().iloc[-1])
+                          operationRateMaxPV.cumsum().iloc[-1] * hoursPerTimeStep)
 
     selfsufficiency = (
                               operationTotOptimumPV - operationTotOptimumStorageCharge + operationTotOptimumStorageDischarge) / (
                               operationTotOptimumGrid + operationTotOptimumPV + operationTotOptimumStorageDischarge)
 
     # calculate costs
-    TACPV = srcSnkSummary['location01'].loc[('PV', 'TAC', '[1e Euro/a]')]
-    TACSTORAGE = storSummary['location01'].loc[('STORAGE', 'TAC', '[1e Euro/a]')]
-    TACGRID = srcSnkSummary['location01'].loc[('GRID', 'TAC', '[1e Euro/a]')]
-    TACENV = srcSnkSummary['location01'].loc[('environment', 'TAC', '[1e Euro/a]')]
+    TACPV = srcSnkSummary[location].loc[('PV', 'TAC', '[1e Euro/a]')]
+    TACSTORAGE = storSummary[location].loc[('STORAGE', 'TAC', '[1e Euro/a]')]
+    TACGRID = srcSnkSummary[location].loc[('GRID', 'TAC', '[1e Euro/a]')]
+    TACENV = srcSnkSummary[location].loc[('environment', 'TAC', '[1e Euro/a]')]
     TAC = TACPV + TACSTORAGE + TACGRID + TACENV
     try:
         LCOEPV = TACPV / (operationTotOptimumPV)
@@ -285,37 +607,63 @@ def energySystemsStats(tilt=20, azimuth=180, longitude=13.5, latitude=52.5, maxC
     tableview = pd.DataFrame(dataprint)
     # Transpose the DataFrame
     tableviewTransposed = tableview.T
-    # Format the DataFrame as a table
-    # table: str = tabulate(tableviewTransposed, headers='keys', tablefmt='psql', showindex=True)
+    return tableviewTransposed, srcSnkSummary, convSummary, storSummary
 
-    # Display the table
-    # print(table)
 
-    ## Export results to Excel
-    [esM.getOptimizationSummary("SourceSinkModel", outputLevel=1).to_excel("Results/SourceSinkModel.xlsx"), ]
-    [esM.getOptimizationSummary("StorageModel", outputLevel=1).to_excel("Results/StorageModel.xlsx"), ]
-    [esM.getOptimizationSummary("ConversionModel", outputLevel=1).to_excel("Results/ConversionModel.xlsx"), ]
-    tableviewTransposed.to_excel("Results/Summary.xlsx")
+def toTimeSteps(profile, numberOfTimeSteps):
+    """
+    Resample a profile of one year to numberOfTimeSteps equidistant time steps.
 
-    ## Export results to CSV
-    esM.getOptimizationSummary("SourceSinkModel", outputLevel=1).to_csv("Results/SourceSinkModel.csv", )
-    esM.getOptimizationSummary("StorageModel", outputLevel=1).to_csv("Results/StorageModel.csv", )
-    esM.getOptimizationSummary("ConversionModel", outputLevel=1).to_csv("Results/ConversionModel.csv", )
-    tableviewTransposed.to_csv("Results/Summary.csv", )
+    Finer target resolutions repeat every value (energy conserving for power profiles such as the hourly PVGIS
+    averages), coarser ones average consecutive values.
 
-    # Create a dictionary to store the results
-    results = {
-        'tableview': tableviewTransposed,
-        'srcSnkSummary': srcSnkSummary,  # Replace None with the actual srcSnkSummary calculation
-        'convSummary': convSummary,  # Replace None with the actual convSummary calculation
-        'storSummary': storSummary,  # Replace None with the actual storSummary calculation
-        'esM': esM,  # Replace None with the actual esM calculation
-        'data': data,
-        'alignmentPVlow': alignmentPVlow,  # Store areaUsage as alignmentPV for demonstration purposes
-        'alignmentPVHigh': alignmentPVHigh  # Store areaUsage as alignmentPV for demonstration purposes
-    }
+    Args:
+        profile (pd.Series or pd.DataFrame): Profile with a range index.
+        numberOfTimeSteps (int): Target number of time steps, a multiple or divisor of len(profile).
+
+    Returns:
+    - Profile of the same type with numberOfTimeSteps rows and a range index.
+    """
+    length = len(profile)
+    if length == numberOfTimeSteps:
+        return profile
+    values = profile.to_numpy()
+    if numberOfTimeSteps % length == 0:
+        values = np.repeat(values, numberOfTimeSteps // length, axis=0)
+    elif length % numberOfTimeSteps == 0:
+        values = values.reshape((numberOfTimeSteps, length // numberOfTimeSteps) + values.shape[1:]).mean(axis=1)
+    else:
+        raise ValueError(f"Cannot resample a profile of {length} values to {numberOfTimeSteps} time steps.")
+    if isinstance(profile, pd.DataFrame):
+        return pd.DataFrame(values, columns=profile.columns)
+    return pd.Series(values, name=profile.name)
+
+
+def energySystemsStatsPopulation(tilts, azimuths, longitude=13.5, latitude=52.5, start=2014, end=2014, **kwargs):
+    """
+    Evaluate energySystemsStats for a population of orientations with one vectorized PV profile calculation.
+
+    Args:
+        tilts (array-like): Tilt angles of the designs in degrees.
+        azimuths (array-like): Azimuth angles of the designs in degrees.
+        longitude, latitude, start, end: See energySystemsStats.
+        **kwargs: Further arguments of energySystemsStats, identical for all designs.
+
+    Returns:
+    - List with the results dictionary of energySystemsStats for each design.
+    """
+    profiles = getPVPowerProfiles(tilts, azimuths, latitude=latitude, longitude=longitude, start=start, end=end)
+    tilts, azimuths = np.broadcast_to(tilts, len(profiles)), np.broadcast_to(azimuths, len(profiles))
+    # row spacing and shading damping of the whole population in one pass
+    rowSpacing = calculate_moduleRowSpacingBatch(*getShadingElevations(latitude, longitude, start), surface_tilt=tilts,
+                                                 module_width=kwargs.get('module_width', 1.5),
+                                                 moduleRowSpacing=kwargs.get('moduleRowSpacing', 3))
+    return [energySystemsStats(tilt=tilt, azimuth=azimuth, longitude=longitude, latitude=latitude, start=start,
+                               end=end, pvProfile=profile,
+                               rowSpacing=None if kwargs.get('orientations') is not None else
+                               {key: value[position] for key, value in rowSpacing.items()}, **kwargs)
+            for position, (tilt, azimuth, profile) in enumerate(zip(tilts, azimuths, profiles))]
 
-    return results
 
 if __name__ == "__main__":
     tilt = 40
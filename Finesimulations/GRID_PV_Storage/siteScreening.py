@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Screening of candidate sites before the full FINE optimisation.
+
+For every site the PV profiles of an orientation grid are computed with the vectorized local PV model from the cached
+weather components. The yield, the match with the load profile and a simple self-consumption estimate of a fixed
+PV capacity without storage are evaluated, and the best orientation per site is kept. The sites are ranked, and
+energySystemsStats only needs to run for the top-k sites (optimizeTopSites).
+
+Usage:
+    sites = pd.DataFrame({'latitude': [...], 'longitude': [...]})
+    ranked = screenSites(sites)
+    results = optimizeTopSites(ranked, k=5, fixCapacityST=5, maxCapacityST=5)
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pvCache import snapCoordinates
+from pvLocalModel import componentsRequest, getPVPowerProfiles, getWeatherComponents
+from simulationsmodel import toTimeSteps
+from timeSeriesStore import getLoadProfile
+
+_workerLoad = None
+
+
+def _initWorker(sinkPath, scale_sink):
+    global _workerLoad
+    # one year of load at the hourly resolution of the PV profiles (e.g. 15 minute load profiles are averaged)
+    _workerLoad = toTimeSteps(getLoadProfile(sinkPath, scale_sink).iloc[:, 0], 8760).to_numpy(dtype=float)
+
+
+def _screenSite(task):
+    """Evaluate the orientation grid of one site (runs in a worker process)."""
+    position, latitude, longitude, tilts, azimuths, capacityPV, start, end, snapResolution = task
+    components = getWeatherComponents(latitude, longitude, start, end, snapResolution=snapResolution)
+    profiles = getPVPowerProfiles(tilts, azimuths, latitude=latitude, longitude=longitude, start=start, end=end,
+                                  snapResolution=snapResolution)
+    leapDay = (components.index.month == 2) & (components.index.day == 29)
+    if leapDay.any():
+        profiles = profiles[:, ~leapDay]
+    years = end - start + 1
+    if profiles.shape[1] != 8760 * years:
+        raise ValueError(f"PV profiles of {start}..{end} have {profiles.shape[1]} hourly values, expected "
+                         f"{8760 * years} (8760 per year without leap days).")
+    load = np.tile(_workerLoad, years)  # the same load in every weather year
+
+    power = profiles * capacityPV
+    annualYield = profiles.sum(axis=1) / years  # kWh/kWp
+    selfConsumed = np.minimum(power, load).sum(axis=1)
+    selfConsumption = selfConsumed / np.maximum(power.sum(axis=1), 1e-9)
+    selfSufficiency = selfConsumed / load.sum()
+    # Pearson correlation of every orientation profile with the load
+    centered = profiles - profiles.mean(axis=1, keepdims=True)
+    loadCentered = load - load.mean()
+    loadCorrelation = (centered @ loadCentered) / np.maximum(
+        np.linalg.norm(centered, axis=1) * np.linalg.norm(loadCentered), 1e-9)
+
+    best = int(np.argmax(selfConsumed))
+    return {'position': position,
+            'tilt': tilts[best],
+            'azimuth': azimuths[best],
+            'annualYield': annualYield[best],
+            'loadCorrelation': loadCorrelation[best],
+            'selfConsumedEnergy': selfConsumed[best] / years,  # kWh per year
+            'selfConsumption': selfConsumption[best],
+            'selfSufficiency': selfSufficiency[best]}
+
+
+def screenSites(sites, tiltBounds=(1, 85), azimuthBounds=(90, 270), numberOfTilts=9, numberOfAzimuths=10,
+                capacityPV=100, scale_sink=10, sinkPath='DataForExample/sink_1.xlsx', start=2014, end=2014,
+                processes=None, rankBy='selfConsumedEnergy', snapResolution=0.05, prefetchData=True):
+    """
+    Rank candidate sites by a quick PV and load evaluation.
+
+    Args:
+        sites (pd.DataFrame): Table with 'latitude' and 'longitude' columns (further columns are kept).
+        tiltBounds, azimuthBounds (tuple, optional): Bounds of the orientation grid in degrees.
+        numberOfTilts, numberOfAzimuths (int, optional): Size of the orientation grid. Defaults to 9 x 10.
+        capacityPV (float, optional): PV capacity in kWp for the self-consumption estimate. Defaults to 100.
+        scale_sink (float, optional): Scaling factor of the load profile as in energySystemsStats. Defaults to 10.
+        sinkPath (str, optional): Path of the load profile. Defaults to DataForExample/sink_1.xlsx.
+        start, end (int, optional): Weather years. Defaults to 2014.
+        processes (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        rankBy (str, optional): Column to rank by (descending). Defaults to 'selfConsumedEnergy'.
+        snapResolution (float, optional): Snap the coordinates to the PVGIS grid. Defaults to 0.05 degrees.
+        prefetchData (bool, optional): Fetch missing weather components with the rate limited prefetcher before
+            the evaluation. Defaults to True.
+
+    Returns:
+    - Copy of sites with the best orientation and its KPIs, sorted by rankBy with a 'rank' column (1 = best).
+    """
+    tiltGrid, azimuthGrid = np.meshgrid(np.linspace(*tiltBounds, numberOfTilts),
+                                        np.linspace(*azimuthBounds, numberOfAzimuths), indexing='ij')
+    tilts, azimuths = tiltGrid.ravel(), azimuthGrid.ravel()
+
+    if prefetchData:
+        from pvPrefetch import prefetch
+
+        prefetch([componentsRequest(*snapCoordinates(latitude, longitude, snapResolution), start, end)
+                  if snapResolution else componentsRequest(latitude, longitude, start, end)
+                  for latitude, longitude in zip(sites['latitude'], sites['longitude'])])
+
+    tasks = [(position, latitude, longitude, tilts, azimuths, capacityPV, start, end, snapResolution)
+             for position, (latitude, longitude) in enumerate(zip(sites['latitude'], sites['longitude']))]
+    with ProcessPoolExecutor(max_workers=processes, initializer=_initWorker,
+                             initargs=(os.path.abspath(sinkPath), scale_sink)) as executor:
+        records = list(executor.map(_screenSite, tasks, chunksize=max(1, len(tasks) // (4 * (os.cpu_count() or 1)))))
+
+    metrics = pd.DataFrame(records).set_index('position').sort_index()
+    ranked = sites.reset_index(drop=True).join(metrics)
+    ranked = ranked.sort_values(rankBy, ascending=False, ignore_index=True)
+    ranked['rank'] = np.arange(1, len(ranked) + 1)
+    return ranked
+
+
+def optimizeTopSites(ranked, k=5, **kwargs):
+    """
+    Run the full energySystemsStats optimisation for the k best screened sites.
+
+    Args:
+        ranked (pd.DataFrame): Result of screenSites.
+        k (int, optional): Number of sites. Defaults to 5.
+        **kwargs: Further arguments of energySystemsStats (e.g. capacity bounds, scale_sink).
+
+    Returns:
+    - The top k rows of ranked with the KPIs of energySystemsStats appended.
+    """
+    from simulationsmodel import energySystemsStats
+
+    top = ranked.head(k).copy()
+    tables = []
+    for _, site in top.iterrows():
+        results = energySystemsStats(tilt=site['tilt'], azimuth=site['azimuth'], latitude=site['latitude'],
+                                     longitude=site['longitude'], exportResults=False, **kwargs)
+        tables.append(results['tableview'].iloc[:, 0])
+    return top.join(pd.DataFrame(tables, index=top.index))
+
+
+if __name__ == "__main__":
+    generator = np.random.default_rng(0)
+    candidates = pd.DataFrame({'latitude': generator.uniform(51.5, 53.5, 200),
+                               'longitude': generator.uniform(12.0, 14.5, 200)})
+    ranking = screenSites(candidates)
+    print(ranking.head(10))
+    print(optimizeTopSites(ranking, k=3, fixCapacityST=5, maxCapacityST=5, scale_sink=10))
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Vectorized local solar position calculation (NOAA solar calculator equations).
+
+Solar elevation and azimuth are computed for whole years in one NumPy pass, independently of any PVGIS request, so
+that the shading geometry (calculate_moduleRowSpacing) does not depend on a weather fetch. The yearly positions
+are cached per (latitude, longitude, year, resolution) in process memory. The geometric (unrefracted) elevation is
+returned; the accuracy is about 0.01° for the years 1800-2100, well below the needs of the row shading geometry.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+def solarPosition(index, latitude, longitude):
+    """
+    Calculate the solar position for arbitrary timestamps.
+
+    Parameters:
+    - index: DatetimeIndex (tz-aware or UTC).
+    - latitude, longitude: Coordinates in degrees (east positive).
+
+    Returns:
+    - Tuple of arrays (elevation, azimuth) in degrees, azimuth clockwise from north.
+    """
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    nanoseconds = index.asi8
+    julianDay = nanoseconds / 86400e9 + 2440587.5
+    julianCentury = (julianDay - 2451545) / 36525
+
+    meanLongitude = np.radians((280.46646 + julianCentury * (36000.76983 + julianCentury * 0.0003032)) % 360)
+    meanAnomaly = np.radians(357.52911 + julianCentury * (35999.05029 - 0.0001537 * julianCentury))
+    eccentricity = 0.016708634 - julianCentury * (0.000042037 + 0.0000001267 * julianCentury)
+    equationOfCenter = (np.sin(meanAnomaly) * (1.914602 - julianCentury * (0.004817 + 0.000014 * julianCentury))
+                        + np.sin(2 * meanAnomaly) * (0.019993 - 0.000101 * julianCentury)
+                        + np.sin(3 * meanAnomaly) * 0.000289)
+    omega = np.radians(125.04 - 1934.136 * julianCentury)
+    apparentLongitude = np.radians(np.degrees(meanLongitude) + equationOfCenter - 0.00569 - 0.00478 * np.sin(omega))
+    meanObliquity = 23 + (26 + (21.448 - julianCentury * (46.815 + julianCentury * (0.00059 - julianCentury
+                                                                                       * 0.001813))) / 60) / 60
+    obliquity = np.radians(meanObliquity + 0.00256 * np.cos(omega))
+    declination = np.arcsin(np.sin(obliquity) * np.sin(apparentLongitude))
+
+    y = np.tan(obliquity / 2) ** 2
+    equationOfTime = 4 * np.degrees(y * np.sin(2 * meanLongitude)
+                                    - 2 * eccentricity * np.sin(meanAnomaly)
+                                    + 4 * eccentricity * y * np.sin(meanAnomaly) * np.cos(2 * meanLongitude)
+                                    - 0.5 * y ** 2 * np.sin(4 * meanLongitude)
+                                    - 1.25 * eccentricity ** 2 * np.sin(2 * meanAnomaly))  # minutes
+    minutesOfDay = (nanoseconds % 86400e9) / 60e9
+    trueSolarTime = (minutesOfDay + equationOfTime + 4 * longitude) % 1440
+    hourAngle = np.radians(trueSolarTime / 4 - 180)
+
+    phi = np.radians(latitude)
+    cosZenith = np.clip(np.sin(phi) * np.sin(declination) + np.cos(phi) * np.cos(declination) * np.cos(hourAngle),
+                        -1, 1)
+    zenith = np.arccos(cosZenith)
+    cosAzimuth = np.clip((np.sin(phi) * cosZenith - np.sin(declination))
+                         / np.maximum(np.cos(phi) * np.sin(zenith), 1e-12), -1, 1)
+    azimuthAngle = np.degrees(np.arccos(cosAzimuth))
+    azimuth = np.where(hourAngle > 0, (azimuthAngle + 180) % 360, (540 - azimuthAngle) % 360)
+    return 90 - np.degrees(zenith), azimuth
+
+
+@lru_cache(maxsize=256)
+def _yearlySolarPosition(latitude, longitude, year, freq, minuteOffset):
+    index = pd.date_range(pd.Timestamp(year=year, month=1, day=1, minute=minuteOffset),
+                          pd.Timestamp(year=year, month=12, day=31, hour=23, minute=59), freq=freq, tz='UTC')
+    elevation, azimuth = solarPosition(index, latitude, longitude)
+    elevation.flags.writeable = False
+    azimuth.flags.writeable = False
+    return pd.DataFrame({'solar_elevation': elevation, 'solar_azimuth': azimuth}, index=index, copy=False)
+
+
+def getSolarPosition(latitude=52, longitude=13.5, year=2014, freq='1h', minuteOffset=10):
+    """
+    Solar position of a whole year, cached per site, year and resolution.
+
+    Parameters:
+    - latitude, longitude: Coordinates in degrees.
+    - year: Year (int).
+    - freq: Time resolution, e.g. '1h' or '15min' (default: '1h').
+    - minuteOffset: Minutes after the full hour of the first time stamp (default: 10, as the PVGIS hourly data).
+
+    Returns:
+    - DataFrame with UTC DatetimeIndex and the columns 'solar_elevation' and 'solar_azimuth' in degrees.
+      The frame is shared between calls and must not be modified.
+    """
+    return _yearlySolarPosition(round(float(latitude), 6), round(float(longitude), 6), int(year), freq,
+                                int(minuteOffset))
+
+
+@lru_cache(maxsize=256)
+def _shadingDays(latitude, longitude, year, freq, minuteOffset):
+    position = _yearlySolarPosition(latitude, longitude, year, freq, minuteOffset)
+    december21 = position[(position.index.month == 12) & (position.index.day == 21)]
+    june21 = position[(position.index.month == 6) & (position.index.day == 21)]
+    return december21, june21
+
+
+def getShadingDays(latitude=52, longitude=13.5, year=2014, freq='1h', minuteOffset=10):
+    """
+    Solar position of 21 December and 21 June (input of calculate_moduleRowSpacing), cached.
+
+    Returns:
+    - Tuple (December 21 DataFrame, June 21 DataFrame), see getSolarPosition.
+    """
+    return _shadingDays(round(float(latitude), 6), round(float(longitude), 6), int(year), freq, int(minuteOffset))
+
+
+def getShadingElevations(latitude=52, longitude=13.5, year=2014, time='10:00:00'):
+    """
+    Solar elevation at the reference time of 21 December and 21 June (as selected by calculate_moduleRowSpacing).
+
+    Returns:
+    - Tuple (elevation on 21 December, elevation on 21 June) in degrees.
+    """
+    hour = pd.to_datetime(time).hour
+    december21, june21 = getShadingDays(latitude, longitude, year)
+    return (december21['solar_elevation'].to_numpy()[np.argmax(december21.index.hour == hour)],
+            june21['solar_elevation'].to_numpy()[np.argmax(june21.index.hour == hour)])
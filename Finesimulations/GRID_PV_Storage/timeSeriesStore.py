@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Binary store for the time series in DataForExample/*.xlsx.
+
+pd.read_excel parses the workbook XML on every call. loadTimeSeries converts a workbook once into a .npy file in a
+'.tscache' directory next to it and afterwards reads (or memory-maps) the binary file. A .json manifest entry next
+to every binary file records the columns, shape, size/modification time and SHA-256 hash of the source workbook; if
+the workbook changes, the binary file is refreshed from Excel on the next load. Every workbook has its own entry
+file (written atomically), so parallel workers converting different workbooks of a directory do not overwrite
+each other's entries.
+
+Usage:
+    sink = loadTimeSeries("DataForExample/sink_1.xlsx")      # DataFrame backed by a read-only memory map
+    python timeSeriesStore.py DataForExample ../Validierungsbeispiel_5/DataForExample   # convert all workbooks
+
+getLoadProfile additionally keeps the loaded (and scaled) profiles in process memory, keyed by path, modification
+time and size, so that a worker process reads a load profile once instead of once per evaluation.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIRECTORY = '.tscache'
+MAX_LOAD_PROFILES = 32
+_loadProfiles = OrderedDict()
+_loadProfileStats = {'hits': 0, 'misses': 0}
+
+
+def _fileHash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cachePaths(path):
+    directory = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIRECTORY)
+    name = os.path.splitext(os.path.basename(path))[0]
+    return directory, os.path.join(directory, name + '.npy'), os.path.join(directory, name + '.json')
+
+
+def _readEntry(entryPath):
+    try:
+        with open(entryPath) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _writeEntry(entryPath, entry):
+    handle, tmpPath = tempfile.mkstemp(dir=os.path.dirname(entryPath), suffix='.tmp')
+    with os.fdopen(handle, 'w') as file:
+        json.dump(entry, file, indent=1)
+    os.replace(tmpPath, entryPath)
+
+
+def convertExcel(path):
+    """
+    Convert a workbook (first sheet, numeric columns) into the binary store.
+
+    Parameters:
+    - path: Path of the .xlsx file.
+
+    Returns:
+    - Manifest entry (dict) of the converted file.
+    """
+    directory, binaryPath, entryPath = _cachePaths(path)
+    os.makedirs(directory, exist_ok=True)
+    frame = pd.read_excel(path)
+    values = np.ascontiguousarray(frame.to_numpy(dtype=float))
+
+    handle, tmpPath = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(handle, 'wb') as file:
+        np.save(file, values)
+    os.replace(tmpPath, binaryPath)
+
+    status = os.stat(path)
+    entry = {'source': os.path.basename(path),
+             'sha256': _fileHash(path),
+             'size': status.st_size,
+             'mtime_ns': status.st_mtime_ns,
+             'columns': [str(column) for column in frame.columns],
+             'shape': list(values.shape),
+             'dtype': values.dtype.str}
+    _writeEntry(entryPath, entry)
+    return entry
+
+
+def _currentEntry(path):
+    """Manifest entry of a workbook if the binary file is up to date, else None."""
+    _, binaryPath, entryPath = _cachePaths(path)
+    entry = _readEntry(entryPath)
+    if entry is None or not os.path.exists(binaryPath):
+        return None
+    if not os.path.exists(path):
+        return entry  # binary store shipped without the workbook
+    status = os.stat(path)
+    if status.st_size == entry['size'] and status.st_mtime_ns == entry['mtime_ns']:
+        return entry
+    if status.st_size == entry['size'] and _fileHash(path) == entry['sha256']:
+        # touched but unchanged: remember the new modification time
+        entry['mtime_ns'] = status.st_mtime_ns
+        _writeEntry(entryPath, entry)
+        return entry
+    return None
+
+
+def loadTimeSeries(path, mmap=True):
+    """
+    Load a workbook time series from the binary store (converting or refreshing it from Excel if needed).
+
+    Parameters:
+    - path: Path of the .xlsx file.
+    - mmap: Memory-map the binary file read-only instead of reading it into memory (default: True).
+
+    Returns:
+    - DataFrame with the columns of the workbook and a range index. With mmap=True the frame is a zero-copy view of
+      the read-only memory map; arithmetic on it (e.g. scaling) returns new frames.
+    """
+    entry = _currentEntry(path)
+    if entry is None:
+        entry = convertExcel(path)
+    _, binaryPath, _ = _cachePaths(path)
+    values = np.load(binaryPath, mmap_mode='r' if mmap else None)
+    if list(values.shape) != entry['shape']:
+        # binary file replaced by a concurrent conversion after the entry was read
+        entry = convertExcel(path)
+        values = np.load(binaryPath, mmap_mode='r' if mmap else None)
+    return pd.DataFrame(values, columns=entry['columns'], copy=False)
+
+
+def getLoadProfile(path, scale=1):
+    """
+    Load profile from process memory, read through loadTimeSeries on the first call or after the file changed.
+
+    Parameters:
+    - path: Path of the .xlsx file.
+    - scale: Scaling factor (e.g. scale_sink of energySystemsStats). scale=1 returns the memory mapped frame itself,
+      other factors are computed once per (file, factor).
+
+    Returns:
+    - DataFrame shared between calls (read-only, must not be modified).
+    """
+    path = os.path.abspath(path)
+    try:
+        status = os.stat(path)
+        version = (status.st_mtime_ns, status.st_size)
+    except FileNotFoundError:
+        version = None  # binary store shipped without the workbook
+    key = (path, version, float(scale))
+    profile = _loadProfiles.get(key)
+    if profile is not None:
+        _loadProfiles.move_to_end(key)
+        _loadProfileStats['hits'] += 1
+        return profile
+
+    _loadProfileStats['misses'] += 1
+    base = _loadProfiles.get((path, version, 1.0))
+    if base is None:
+        base = loadTimeSeries(path)
+        _loadProfiles[(path, version, 1.0)] = base
+    if scale == 1:
+        profile = base
+    else:
+        values = base.to_numpy() * scale
+        values.flags.writeable = False
+        profile = pd.DataFrame(values, columns=base.columns, copy=False)
+        _loadProfiles[key] = profile
+    while len(_loadProfiles) > MAX_LOAD_PROFILES:
+        _loadProfiles.popitem(last=False)
+    return profile
+
+
+def loadProfileStats():
+    """Hit and miss counts of getLoadProfile and the number of profiles held in memory."""
+    return dict(_loadProfileStats, entries=len(_loadProfiles))
+
+
+def clearLoadProfiles():
+    """Drop the profiles held by getLoadProfile and reset its statistics."""
+    _loadProfiles.clear()
+    _loadProfileStats.update(hits=0, misses=0)
+
+
+def convertDirectory(directory):
+    """Convert every workbook in directory; returns the list of converted file names."""
+    converted = []
+    for fileName in sorted(os.listdir(directory)):
+        if fileName.endswith('.xlsx') and not fileName.startswith('~$'):
+            path = os.path.join(directory, fileName)
+            if _currentEntry(path) is None:
+                convertExcel(path)
+            converted.append(fileName)
+    return converted
+
+
+if __name__ == "__main__":
+    for dataDirectory in sys.argv[1:] or ['DataForExample']:
+        print(dataDirectory, convertDirectory(dataDirectory))
@@ -0,0 +1,429 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Declarative topology specification (JSON or YAML) of an EnergySystemModel.
+
+The Validierungsbeispiel scripts build their models with hand-written commodity dictionaries and esM.add calls. A
+topology file describes the same flow graph as data:
+
+    {"name": "GRID_PV_Storage",
+     "locations": ["location01"],
+     "model": {"numberOfTimeSteps": 8760, "hoursPerTimeStep": 1, "costUnit": "1e Euro", "lengthUnit": "km"},
+     "commodities": {"source_1_commodity": "kW_el", "sink_1_commodity": "kW_el", ...},
+     "parameters": {"scale_sink": 1, "maxCapacityST": 100, ...},
+     "components": [
+        {"type": "Sink", "name": "sink_1", "commodity": "sink_1_commodity", "hasCapacityVariable": false,
+         "operationRateFix": {"timeSeries": "DataForExample/sink_1.xlsx", "scale": {"parameter": "scale_sink"}}},
+        {"type": "Storage", "name": "STORAGE", "capacityMax": {"parameter": "maxCapacityST"},
+         "chargeRate": {"expression": "750 / maxCapacityST"}, ...},
+        {"type": "Conversion", "name": "conversion_1", "physicalUnit": "kW_el",
+         "commodityConversionFactors": {"source_1_commodity": -1, "sink_1_commodity": 1}, ...}]}
+
+Component entries hold the keyword arguments of the FINE component class given by 'type'. Values can be
+    {"parameter": name}                      a parameter (default from 'parameters', overridable per build)
+    {"expression": "750 / maxCapacityST"}    arithmetic (+ - * /) of parameters
+    {"timeSeries": path, "scale": value}     a time series workbook (relative to the topology file), read through
+                                             timeSeriesStore.getLoadProfile
+    {"locations": {location: value}}         a location indexed pd.Series
+    {"matrix": {location: {location: value}}}  a locations x locations pd.DataFrame (missing entries 0)
+
+compileTopology validates a specification once and keeps the compiled topology in process memory under the SHA-256
+hash of its content, buildModel creates an EnergySystemModel from it for a set of parameter values. Scenario batches
+share one compiled topology and only pass different parameters. YAML files need PyYAML, JSON always works.
+
+Usage:
+    topology = loadTopology("topologies/gridPVStorage.json")
+    esM = buildModel(topology, {'maxCapacityST': 5, 'fixCapacityST': 5})
+    esM = buildModel(topology, snapshotDirectory='ModelSnapshots', numberOfTypicalPeriods=7)   # snapshot, aggregated
+    python topologySpec.py ../Validierungsbeispiel_5/topology.json [periods] [solver]    # build (or load), optimize
+"""
+
+import ast
+import hashlib
+import json
+import os
+import warnings
+
+import pandas as pd
+
+from modelSnapshot import getOrBuildModel
+from timeSeriesStore import getLoadProfile
+
+COMPONENT_TYPES = ('Source', 'Sink', 'Conversion', 'Storage', 'Transmission')
+MODEL_DEFAULTS = {'numberOfTimeSteps': 8760, 'hoursPerTimeStep': 1, 'costUnit': '1e Euro', 'lengthUnit': 'km',
+                  'verboseLogLevel': 0}
+REFERENCE_KEYS = ('parameter', 'expression', 'timeSeries', 'locations', 'matrix')
+_ARITHMETIC = {ast.Add: lambda a, b: a + b, ast.Sub: lambda a, b: a - b, ast.Mult: lambda a, b: a * b,
+               ast.Div: lambda a, b: a / b}
+
+_compiled = {}
+
+
+class TopologyError(ValueError):
+    """Raised when a topology specification is invalid; lists all problems found."""
+
+
+class CompiledTopology:
+    """
+    Validated topology specification.
+
+    Attributes:
+    - key: SHA-256 hash of the specification and its base directory.
+    - name, locations, commodities (name -> unit), model (EnergySystemModel arguments), parameters (defaults).
+    - components: List of dictionaries {'type', 'name', 'arguments'} in the order of the specification.
+    - baseDirectory: Directory the time series paths are relative to.
+    - warnings: Non-fatal findings of the validation (e.g. commodities without producer).
+    """
+
+    def __init__(self, key, name, locations, commodities, model, parameters, components, baseDirectory,
+                 warnings=()):
+        self.key = key
+        self.name = name
+        self.locations = locations
+        self.commodities = commodities
+        self.model = model
+        self.parameters = parameters
+        self.components = components
+        self.baseDirectory = baseDirectory
+        self.warnings = list(warnings)
+
+    def __repr__(self):
+        return (f"CompiledTopology({self.name!r}, {len(self.locations)} locations, {len(self.commodities)} "
+                f"commodities, {len(self.components)} components)")
+
+
+def _expressionNames(expression):
+    """Parameter names of an arithmetic expression; raises ValueError for anything else."""
+    tree = ast.parse(expression, mode='eval')
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif not isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.USub, ast.UAdd, ast.Constant,
+                                   ast.Load) + tuple(_ARITHMETIC)):
+            raise ValueError(f"'{expression}' is not an arithmetic expression of parameters")
+    return names
+
+
+def _evaluate(node, values):
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, values)
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        return values[node.id]
+    if isinstance(node, ast.UnaryOp):
+        operand = _evaluate(node.operand, values)
+        return -operand if isinstance(node.op, ast.USub) else operand
+    return _ARITHMETIC[type(node.op)](_evaluate(node.left, values), _evaluate(node.right, values))
+
+
+def _isReference(value):
+    return isinstance(value, dict) and len(value.keys() & set(REFERENCE_KEYS)) == 1
+
+
+def _references(value):
+    """Parameter names a (nested) parameter value or component argument refers to."""
+    if _isReference(value):
+        if 'parameter' in value:
+            return {value['parameter']}
+        if 'expression' in value:
+            try:
+                return _expressionNames(value['expression'])
+            except (SyntaxError, ValueError):
+                return set()
+        if 'timeSeries' in value:
+            return _references(value.get('scale', 1))
+        if 'locations' in value:
+            return set().union(*map(_references, value['locations'].values()))
+        return set().union(*(_references(item) for row in value['matrix'].values() for item in row.values()))
+    if isinstance(value, dict):
+        return set().union(*map(_references, value.values()))
+    return set()
+
+
+def _parameterCycles(parameters):
+    """Reference cycles among parameter values, each as a list of names (first name repeated at the end)."""
+    dependencies = {name: sorted(_references(value) & set(parameters)) for name, value in parameters.items()}
+    cycles, state = [], {}
+    for start in parameters:
+        if start in state:
+            continue
+        state[start] = 'open'
+        stack = [(start, iter(dependencies[start]))]
+        while stack:
+            name, pending = stack[-1]
+            following = next(pending, None)
+            if following is None:
+                state[name] = 'done'
+                stack.pop()
+            elif state.get(following) == 'open':
+                path = [entry for entry, _ in stack]
+                cycles.append(path[path.index(following):] + [following])
+            elif following not in state:
+                state[following] = 'open'
+                stack.append((following, iter(dependencies[following])))
+    return cycles
+
+
+def _checkValue(value, where, parameters, locations, baseDirectory, problems):
+    """Validate the references in a component argument (recursively)."""
+    if _isReference(value):
+        kind = (value.keys() & set(REFERENCE_KEYS)).pop()
+        if kind == 'parameter':
+            if value['parameter'] not in parameters:
+                problems.append(f"{where}: unknown parameter '{value['parameter']}'")
+        elif kind == 'expression':
+            try:
+                unknown = _expressionNames(value['expression']) - set(parameters)
+            except (SyntaxError, ValueError) as error:
+                problems.append(f"{where}: {error}")
+            else:
+                if unknown:
+                    problems.append(f"{where}: unknown parameters {sorted(unknown)} in '{value['expression']}'")
+        elif kind == 'timeSeries':
+            path = os.path.join(baseDirectory, value['timeSeries'])
+            if not os.path.exists(path):
+                problems.append(f"{where}: time series file '{path}' not found")
+            _checkValue(value.get('scale', 1), where, parameters, locations, baseDirectory, problems)
+        elif kind == 'locations':
+            unknown = set(value['locations']) - set(locations)
+            if unknown:
+                problems.append(f"{where}: unknown locations {sorted(unknown)}")
+        elif kind == 'matrix':
+            unknown = (set(value['matrix']) | set().union(*value['matrix'].values())) - set(locations)
+            if unknown:
+                problems.append(f"{where}: unknown locations {sorted(unknown)}")
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _checkValue(item, f"{where}.{key}", parameters, locations, baseDirectory, problems)
+
+
+def _flows(component):
+    """(consumed, produced) commodities of a component."""
+    kind = component['type']
+    arguments = component['arguments']
+    if kind == 'Conversion':
+        factors = arguments.get('commodityConversionFactors', {})
+        consumed = {commodity for commodity, factor in factors.items()
+                    if isinstance(factor, (int, float)) and factor < 0}
+        return consumed, set(factors) - consumed
+    commodity = {arguments.get('commodity')}
+    if kind == 'Source':
+        return set(), commodity
+    if kind == 'Sink':
+        return commodity, set()
+    return commodity, commodity  # Storage, Transmission
+
+
+def compileTopology(spec, baseDirectory='.'):
+    """
+    Validate a topology specification (memoized by content hash).
+
+    Parameters:
+    - spec: Specification as loaded from JSON or YAML (dict).
+    - baseDirectory: Directory the time series paths are relative to (default: current directory).
+
+    Returns:
+    - CompiledTopology (shared between calls, must not be modified).
+
+    Raises:
+    - TopologyError listing all problems of an invalid specification.
+    """
+    baseDirectory = os.path.abspath(baseDirectory)
+    key = hashlib.sha256(json.dumps([spec, baseDirectory], sort_keys=True, default=str).encode()).hexdigest()
+    topology = _compiled.get(key)
+    if topology is not None:
+        return topology
+
+    problems = []
+    locations = list(spec.get('locations') or [])
+    commodities = dict(spec.get('commodities') or {})
+    parameters = dict(spec.get('parameters') or {})
+    unknownModel = set(spec.get('model') or {}) - set(MODEL_DEFAULTS)
+    if not locations:
+        problems.append("'locations' must list at least one location")
+    if not commodities:
+        problems.append("'commodities' must map at least one commodity to its unit")
+    if unknownModel:
+        problems.append(f"model: unknown arguments {sorted(unknownModel)}")
+    for name, default in parameters.items():
+        _checkValue(default, f"parameters.{name}", parameters, locations, baseDirectory, problems)
+    for cycle in _parameterCycles(parameters):
+        problems.append(f"parameters: reference cycle {' -> '.join(cycle)}")
+
+    components, names = [], set()
+    for position, entry in enumerate(spec.get('components') or []):
+        entry = dict(entry)
+        kind, name = entry.pop('type', None), entry.pop('name', None)
+        where = f"components[{position}] ({name})"
+        if kind not in COMPONENT_TYPES:
+            problems.append(f"{where}: type must be one of {COMPONENT_TYPES}, not {kind!r}")
+        if not isinstance(name, str) or not name:
+            problems.append(f"{where}: missing name")
+        elif name in names:
+            problems.append(f"{where}: duplicate component name")
+        names.add(name)
+        if kind == 'Conversion':
+            factors = entry.get('commodityConversionFactors')
+            if not factors:
+                problems.append(f"{where}: missing commodityConversionFactors")
+            else:
+                unknown = set(factors) - set(commodities)
+                if unknown:
+                    problems.append(f"{where}: unknown commodities {sorted(unknown)}")
+            if 'physicalUnit' not in entry:
+                problems.append(f"{where}: missing physicalUnit")
+        elif kind in COMPONENT_TYPES and entry.get('commodity') not in commodities:
+            problems.append(f"{where}: unknown commodity {entry.get('commodity')!r}")
+        for argument, value in entry.items():
+            _checkValue(value, f"{where}.{argument}", parameters, locations, baseDirectory, problems)
+        components.append({'type': kind, 'name': name, 'arguments': entry})
+    if not components:
+        problems.append("'components' must list at least one component")
+    if problems:
+        raise TopologyError("Invalid topology specification:\n  " + "\n  ".join(problems))
+
+    consumed, produced = set(), set()
+    for component in components:
+        inflow, outflow = _flows(component)
+        consumed |= inflow
+        produced |= outflow
+    findings = ([f"commodity '{commodity}' is not used" for commodity in commodities
+                 if commodity not in consumed | produced]
+                + [f"commodity '{commodity}' is consumed but never produced"
+                   for commodity in sorted(consumed - produced)]
+                + [f"commodity '{commodity}' is produced but never consumed"
+                   for commodity in sorted(produced - consumed)])
+    for finding in findings:
+        warnings.warn(f"Topology {spec.get('name', '')}: {finding}")
+
+    topology = CompiledTopology(key, spec.get('name', ''), locations, commodities,
+                                dict(MODEL_DEFAULTS, **(spec.get('model') or {})), parameters, components,
+                                baseDirectory, findings)
+    _compiled[key] = topology
+    return topology
+
+
+def loadTopology(path):
+    """
+    Read and compile a topology file (.json, or .yaml/.yml with PyYAML installed).
+
+    Returns:
+    - CompiledTopology, time series paths relative to the directory of the file.
+    """
+    with open(path, encoding='utf-8') as file:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("Reading YAML topologies requires PyYAML (pip install pyyaml); "
+                                  "JSON topologies work without it.") from None
+            spec = yaml.safe_load(file)
+        else:
+            spec = json.load(file)
+    return compileTopology(spec, os.path.dirname(os.path.abspath(path)))
+
+
+def _resolve(value, values, topology):
+    """Replace the references of a component argument by their values."""
+    if _isReference(value):
+        if 'parameter' in value:
+            return _resolve(values[value['parameter']], values, topology)
+        if 'expression' in value:
+            return _evaluate(ast.parse(value['expression'], mode='eval'),
+                             {name: _resolve(values[name], values, topology)
+                              for name in _expressionNames(value['expression'])})
+        if 'timeSeries' in value:
+            return getLoadProfile(os.path.join(topology.baseDirectory, value['timeSeries']),
+                                  _resolve(value.get('scale', 1), values, topology))
+        if 'locations' in value:
+            return pd.Series({location: _resolve(item, values, topology)
+                              for location, item in value['locations'].items()})
+        matrix = pd.DataFrame(0.0, index=topology.locations, columns=topology.locations)
+        for source, row in value['matrix'].items():
+            for target, item in row.items():
+                matrix.loc[source, target] = _resolve(item, values, topology)
+        return matrix
+    if isinstance(value, dict):
+        return {key: _resolve(item, values, topology) for key, item in value.items()}
+    return value
+
+
+def resolveComponents(topology, parameters=None):
+    """
+    Component arguments of a compiled topology with all references resolved.
+
+    Parameters:
+    - topology: CompiledTopology.
+    - parameters: Parameter values overriding the defaults of the specification.
+
+    Returns:
+    - List of (FINE class name, component name, keyword arguments).
+    """
+    unknown = set(parameters or {}) - set(topology.parameters)
+    if unknown:
+        raise TopologyError(f"Unknown parameters {sorted(unknown)} for topology {topology.name!r}.")
+    values = dict(topology.parameters, **(parameters or {}))
+    cycles = _parameterCycles(values)
+    if cycles:
+        raise TopologyError(f"Parameter reference cycles {[' -> '.join(cycle) for cycle in cycles]} "
+                            f"for topology {topology.name!r}.")
+    return [(component['type'], component['name'], _resolve(component['arguments'], values, topology))
+            for component in topology.components]
+
+
+def buildModel(topology, parameters=None, snapshotDirectory=None, numberOfTypicalPeriods=None):
+    """
+    Build an EnergySystemModel from a compiled topology.
+
+    Parameters:
+    - topology: CompiledTopology (compileTopology / loadTopology).
+    - parameters: Parameter values overriding the defaults of the specification.
+    - snapshotDirectory: Load the model from a snapshot in this directory or build and store it
+      (modelSnapshot.getOrBuildModel, keyed by the topology and the resolved component arguments including the
+      time series). Default: None, always build.
+    - numberOfTypicalPeriods: Run aggregateTemporally with this number of typical periods (before the snapshot is
+      taken, default: None).
+
+    Returns:
+    - fn.EnergySystemModel (not yet optimized; aggregated if numberOfTypicalPeriods is given).
+    """
+    components = resolveComponents(topology, parameters)
+    if snapshotDirectory is not None:
+        return getOrBuildModel(lambda: _build(topology, components),
+                               inputs=(topology.key, components, _build),
+                               numberOfTypicalPeriods=numberOfTypicalPeriods, directory=snapshotDirectory)
+    esM = _build(topology, components)
+    if numberOfTypicalPeriods is not None:
+        esM.aggregateTemporally(numberOfTypicalPeriods=numberOfTypicalPeriods)
+    return esM
+
+
+def _build(topology, components):
+    import FINE as fn
+
+    esM = fn.EnergySystemModel(locations=set(topology.locations),
+                               commodities=set(topology.commodities),
+                               commodityUnitsDict=topology.commodities,
+                               **topology.model)
+    for kind, name, arguments in components:
+        esM.add(getattr(fn, kind)(esM=esM, name=name, **arguments))
+    return esM
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from modelSnapshot import SNAPSHOT_DIRECTORY
+
+    # e.g. python topologySpec.py ../Validierungsbeispiel_5/topology.json 7
+    topology = loadTopology(sys.argv[1])
+    numberOfTypicalPeriods = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    solver = sys.argv[3] if len(sys.argv) > 3 else 'GLPK'
+    started = time.perf_counter()
+    esM = buildModel(topology, snapshotDirectory=SNAPSHOT_DIRECTORY, numberOfTypicalPeriods=numberOfTypicalPeriods)
+    print(f"model ready after {time.perf_counter() - started:.2f} s (snapshot in {SNAPSHOT_DIRECTORY})")
+    esM.optimize(timeSeriesAggregation=True, solver=solver)
+    print(esM.getOptimizationSummary("SourceSinkModel", outputLevel=1))
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Sparse transmission input: transmission lines as an edge list instead of dense locations x locations matrices.
+
+Validierungsbeispiel_Transmission passes capacityMax and distances as N x N DataFrames. FINE converts them into
+Series indexed by '<location1>_<location2>' with one entry per non-zero element, visiting all N^2 cells of every
+matrix. For hundreds of substations with a few lines each, transmissionArguments builds these Series (and the
+locationalEligibility) directly from the lines that exist, so memory and setup time grow with the number of
+lines instead of N^2.
+
+Usage:
+    lines = pd.DataFrame({'from': ['Nord'], 'to': ['Süd'], 'capacityMax': [1], 'distance': [10]})
+    addTransmission(esM, 'AC cables', 'electricityCable', lines, losses=0.001)
+    python transmissionNetwork.py    # setup time and memory dense versus sparse, Results/BenchmarkTransmission.csv
+"""
+
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from pvCache import haversineDistance
+
+# per line attributes, handed to fn.Transmission as Series indexed by '<from>_<to>'
+EDGE_ATTRIBUTES = {'capacityMax': 'capacityMax', 'capacityFix': 'capacityFix', 'distance': 'distances',
+                   'losses': 'losses'}
+
+
+def edgeList(edges, symmetric=True, coordinates=None):
+    """
+    Check and complete an edge list.
+
+    Parameters:
+    - edges: DataFrame or list of dictionaries with the columns 'from', 'to' and optionally 'capacityMax',
+      'capacityFix', 'distance' (km) and 'losses' (relative losses per km).
+    - symmetric: Every line connects both directions, the reverse edges are added (default: True).
+    - coordinates: DataFrame with 'latitude' and 'longitude' per location, used for the great circle distance of
+      lines without 'distance'.
+
+    Returns:
+    - DataFrame with one row per directed edge, indexed by '<from>_<to>'.
+    """
+    edges = pd.DataFrame(edges).reset_index(drop=True)
+    missing = {'from', 'to'} - set(edges.columns)
+    if missing:
+        raise ValueError(f"Edge list needs the columns {sorted(missing)}.")
+    unknown = set(edges.columns) - {'from', 'to'} - set(EDGE_ATTRIBUTES)
+    if unknown:
+        raise ValueError(f"Unknown edge attributes {sorted(unknown)}, expected {sorted(EDGE_ATTRIBUTES)}.")
+    edges['from'], edges['to'] = edges['from'].astype(str), edges['to'].astype(str)
+    if (edges['from'] == edges['to']).any():
+        loops = sorted(set(edges.loc[edges['from'] == edges['to'], 'from']))
+        raise ValueError(f"Edges from a location to itself: {loops}.")
+
+    if coordinates is not None:
+        if 'distance' not in edges:
+            edges['distance'] = np.nan
+        unset = edges['distance'].isna().to_numpy()
+        if unset.any():
+            first = coordinates.loc[edges.loc[unset, 'from']]
+            second = coordinates.loc[edges.loc[unset, 'to']]
+            edges.loc[unset, 'distance'] = haversineDistance(first['latitude'].to_numpy(dtype=float),
+                                                             first['longitude'].to_numpy(dtype=float),
+                                                             second['latitude'].to_numpy(dtype=float),
+                                                             second['longitude'].to_numpy(dtype=float))
+
+    if symmetric:
+        edges = pd.concat([edges, edges.rename(columns={'from': 'to', 'to': 'from'})], ignore_index=True)
+    edges.index = edges['from'] + '_' + edges['to']
+    duplicated = edges.index[edges.index.duplicated()]
+    if len(duplicated):
+        raise ValueError(f"Edges defined more than once: {sorted(set(duplicated))}.")
+    return edges
+
+
+def transmissionArguments(edges, locations=None, symmetric=True, coordinates=None):
+    """
+    Keyword arguments of fn.Transmission for the lines of an edge list.
+
+    Parameters:
+    - edges, symmetric, coordinates: See edgeList.
+    - locations: Locations of the model, checked against the edge list (default: no check).
+
+    Returns:
+    - Dictionary with 'locationalEligibility' and the given edge attributes ('capacityMax', 'capacityFix',
+      'distances', 'losses') as Series indexed by '<from>_<to>'.
+    """
+    edges = edgeList(edges, symmetric, coordinates)
+    if locations is not None:
+        unknown = (set(edges['from']) | set(edges['to'])) - set(locations)
+        if unknown:
+            raise ValueError(f"Unknown locations {sorted(unknown)} in the edge list.")
+    arguments = {'locationalEligibility': pd.Series(1, index=edges.index)}
+    for column, argument in EDGE_ATTRIBUTES.items():
+        if column in edges:
+            arguments[argument] = edges[column].astype(float)
+    return arguments
+
+
+def denseArguments(edges, locations, symmetric=True, coordinates=None):
+    """The edge attributes as locations x locations DataFrames (as in Validierungsbeispiel_Transmission)."""
+    edges = edgeList(edges, symmetric, coordinates)
+    arguments = {}
+    for column, argument in EDGE_ATTRIBUTES.items():
+        if column in edges:
+            matrix = np.zeros((len(locations), len(locations)))
+            matrix[pd.Index(locations).get_indexer(edges['from']),
+                   pd.Index(locations).get_indexer(edges['to'])] = edges[column].to_numpy(dtype=float)
+            arguments[argument] = pd.DataFrame(matrix, index=locations, columns=locations)
+    return arguments
+
+
+def addTransmission(esM, name, commodity, edges, symmetric=True, coordinates=None, **kwargs):
+    """
+    Add a fn.Transmission component for the lines of an edge list.
+
+    Parameters:
+    - esM: fn.EnergySystemModel.
+    - name, commodity: Name and commodity of the transmission component.
+    - edges, symmetric, coordinates: See edgeList.
+    - **kwargs: Further arguments of fn.Transmission (e.g. losses for all lines, investPerCapacity,
+      hasCapacityVariable); per line attributes of the edge list take precedence.
+    """
+    import FINE as fn
+
+    arguments = {'hasCapacityVariable': True, **kwargs,
+                 **transmissionArguments(edges, esM.locations, symmetric, coordinates)}
+    esM.add(fn.Transmission(esM=esM, name=name, commodity=commodity, **arguments))
+
+
+def syntheticNetwork(numberOfLocations=200, neighbours=3, seed=0):
+    """
+    Random substations in northern Germany, each connected to its nearest neighbours.
+
+    Returns:
+    - Tuple (coordinates DataFrame with 'latitude' and 'longitude' per location, edge list with one row per line).
+    """
+    generator = np.random.default_rng(seed)
+    locations = [f'node{position:04d}' for position in range(numberOfLocations)]
+    coordinates = pd.DataFrame({'latitude': generator.uniform(51.5, 53.5, numberOfLocations),
+                                'longitude': generator.uniform(8.0, 14.5, numberOfLocations)}, index=locations)
+    latitude = coordinates['latitude'].to_numpy()
+    longitude = coordinates['longitude'].to_numpy()
+    distances = haversineDistance(latitude[:, np.newaxis], longitude[:, np.newaxis], latitude[np.newaxis, :],
+                                  longitude[np.newaxis, :])
+    np.fill_diagonal(distances, np.inf)
+    lines = {tuple(sorted((first, second))) for first in range(numberOfLocations)
+             for second in np.argsort(distances[first])[:neighbours].tolist()}
+    edges = pd.DataFrame([{'from': locations[first], 'to': locations[second], 'distance': distances[first, second],
+                           'capacityMax': generator.uniform(50, 500)} for first, second in sorted(lines)])
+    return coordinates, edges
+
+
+def _measure(setup):
+    tracemalloc.start()
+    started = time.perf_counter()
+    setup()
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def benchmarkTransmission(numbersOfLocations=(25, 50, 100, 200), neighbours=3, losses=0.001):
+    """
+    Setup time and peak memory of a transmission component from dense matrices versus the edge list.
+
+    Returns:
+    - DataFrame with one row per number of locations.
+    """
+    import FINE as fn
+
+    records = []
+    for numberOfLocations in numbersOfLocations:
+        coordinates, edges = syntheticNetwork(numberOfLocations, neighbours)
+        locations = list(coordinates.index)
+
+        def model():
+            return fn.EnergySystemModel(locations=set(locations), commodities={'electricity'},
+                                        commodityUnitsDict={'electricity': 'kW_el'}, numberOfTimeSteps=8760,
+                                        hoursPerTimeStep=1, costUnit='1e Euro', lengthUnit='km', verboseLogLevel=2)
+
+        denseModel, sparseModel = model(), model()
+
+        def dense():
+            denseModel.add(fn.Transmission(esM=denseModel, name='AC cables', commodity='electricity',
+                                           hasCapacityVariable=True, losses=losses,
+                                           **denseArguments(edges, locations)))
+
+        def sparse():
+            addTransmission(sparseModel, 'AC cables', 'electricity', edges, losses=losses)
+
+        denseSeconds, densePeak = _measure(dense)
+        sparseSeconds, sparsePeak = _measure(sparse)
+        records.append({'locations': numberOfLocations, 'lines': len(edges),
+                        'denseSeconds': denseSeconds, 'sparseSeconds': sparseSeconds,
+                        'denseMB': densePeak / 2 ** 20, 'sparseMB': sparsePeak / 2 ** 20})
+    return pd.DataFrame(records).set_index('locations')
+
+
+if __name__ == "__main__":
+    table = benchmarkTransmission()
+    print(table)
+    table.to_csv("Results/BenchmarkTransmission.csv")
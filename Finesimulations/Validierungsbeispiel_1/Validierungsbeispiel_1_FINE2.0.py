@@ -15,7 +15,12 @@
 
 
 import FINE as fn
-import pandas as pd
+import os
+import sys
+
+# binary store of the DataForExample workbooks (GRID_PV_Storage/timeSeriesStore.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GRID_PV_Storage'))
+from timeSeriesStore import loadTimeSeries
 
 
 ## Aufbau EMS
@@ -56,7 +61,7 @@ esM.add(fn.Sink(esM=esM,
                 name='sink_1',
                 commodity='sink_1_commodity',
                 hasCapacityVariable=False,
-                operationRateFix=pd.read_excel("DataForExample/sink_1.xlsx"),
+                operationRateFix=loadTimeSeries("DataForExample/sink_1.xlsx"),
                 ),
         )
 
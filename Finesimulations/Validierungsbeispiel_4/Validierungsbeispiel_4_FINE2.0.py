@@ -3,7 +3,12 @@
 # autor: Klaus Markgraf
 
 import FINE as fn
-import pandas as pd
+import os
+import sys
+
+# binary store of the DataForExample workbooks (GRID_PV_Storage/timeSeriesStore.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GRID_PV_Storage'))
+from timeSeriesStore import loadTimeSeries
 
 # Energiesystem:
 sink_1 = "sink_1_commodity"
@@ -61,7 +66,7 @@ esM.add(fn.Sink(esM=esM,
                 name='sink_1',
                 commodity='sink_1_commodity',
                 hasCapacityVariable=False,
-                operationRateFix=pd.read_excel("DataForExample/sink_1.xlsx"),
+                operationRateFix=loadTimeSeries("DataForExample/sink_1.xlsx"),
                 ),
         )
 
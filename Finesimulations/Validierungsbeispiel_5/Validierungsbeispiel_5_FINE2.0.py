@@ -3,7 +3,12 @@
 # autor: Klaus Markgraf
 
 import FINE as fn
-import pandas as pd
+import os
+import sys
+
+# binary store of the DataForExample workbooks (GRID_PV_Storage/timeSeriesStore.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GRID_PV_Storage'))
+from timeSeriesStore import loadTimeSeries
 
 # Energiesystem:
 sink_1 = "sink_1_commodity"
@@ -99,7 +104,7 @@ esM.add(fn.Sink(esM=esM,
                 name='sink_1',
                 commodity='sink_1_commodity',
                 hasCapacityVariable=False,
-                operationRateFix=pd.read_excel("DataForExample/sink_1.xlsx"),
+                operationRateFix=loadTimeSeries("DataForExample/sink_1.xlsx"),
                 ),
         )
 
@@ -108,7 +113,7 @@ esM.add(fn.Sink(esM=esM,
                 name='sink_2',
                 commodity='sink_2_commodity',
                 hasCapacityVariable=False,
-                operationRateFix=pd.read_excel("DataForExample/sink_2.xlsx"),
+                operationRateFix=loadTimeSeries("DataForExample/sink_2.xlsx"),
                 ),
         )
 
@@ -140,7 +145,7 @@ esM.add(fn.Source(esM=esM,
                   commodity=source_2,
                   hasCapacityVariable=True,
                   #capacityMax= 5,
-                  operationRateMax=pd.read_excel("DataForExample/PV_1.xlsx"),
+                  operationRateMax=loadTimeSeries("DataForExample/PV_1.xlsx"),
                   investPerCapacity=investPerCapacity,
                   opexPerCapacity= investPerCapacity * 0.015,
                   interestRate=0.05,
@@ -152,7 +157,7 @@ esM.add(fn.Source(esM=esM,
                   commodity=source_3,
                   hasCapacityVariable=True,
                   commodityCost=0.12,
-                  operationRateMax=pd.read_excel("DataForExample/WP.xlsx"),
+                  operationRateMax=loadTimeSeries("DataForExample/WP.xlsx"),
                   ))
 
 #storage
@@ -15,6 +15,12 @@ Aufbau:
 import FINE as fn
 import pandas as pd
 import numpy as np
+import os
+import sys
+
+# binary store of the DataForExample workbooks (GRID_PV_Storage/timeSeriesStore.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GRID_PV_Storage'))
+from timeSeriesStore import loadTimeSeries
 
 loc=2
 columns=['Nord','Süd'] #column-Liste für die dataframes
@@ -54,7 +60,7 @@ esM.add(fn.Source(esM=esM,
                   name='PV',
                   commodity='electricityPV',
                   hasCapacityVariable=True,
-                  operationRateMax=pd.read_excel("DataForExample/PV_1.xlsx"),
+                  operationRateMax=loadTimeSeries("DataForExample/PV_1.xlsx"),
                   capacityFix=pd.Series(cMaxWind,index=index),
                   investPerCapacity=investPerCapacityWind,
                   opexPerCapacity=investPerCapacityWind * 0.025,
@@ -65,13 +71,13 @@ esM.add(fn.Source(esM=esM,
 #4.1 Strombedarf
 
 
-opRateStrom = pd.read_excel("DataForExample/sink_1.xlsx"),
+opRateStrom = loadTimeSeries("DataForExample/sink_1.xlsx"),
 
 esM.add(fn.Sink(esM=esM,
                 name="Electricity demand",
                 commodity="electricity",
                 hasCapacityVariable=False,
-                operationRateFix=pd.read_excel("DataForExample/sink_1.xlsx")))
+                operationRateFix=loadTimeSeries("DataForExample/sink_1.xlsx")))
 
 
 #5. Transmission